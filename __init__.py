@@ -8,28 +8,49 @@ import sys
 sys.path.append(os.path.dirname(__file__))
 
 from extension.routes import (
-    list_data_folders, list_images, view_file,
+    list_data_folders, list_images, view_file, index_stats, storage_stats,
+    view_thumbnail, thumbnail_stats, view_workflow, workflow_stats,
     save_diff_route, list_diffs_route, load_diff_route, delete_diff_route,
+    list_diff_versions_route, load_diff_version_route,
     save_remaps_route, list_remaps_route, load_remaps_route, delete_remaps_route,
+    submit_jobs_route, list_jobs_route, get_job_route, cancel_job_route, retry_job_route,
+    start_job_dispatcher, stop_job_dispatcher,
+    get_working_route, update_working_route, clear_working_route, working_stats, flush_working_state,
 )
 
+from extension.metrics import metrics_middleware, metrics_route, record_prepared_response
+from extension.profiling import profiling_middleware, list_profiles_route, get_profile_route
+from extension.event_stream import stream_events_route, event_stream_stats, start_event_stream, stop_event_stream
+
 from extension.socket_events import (
-    forward_to_websocket, forward_reset_request
+    forward_to_websocket, forward_batch_to_websocket, forward_reset_request,
+    queue_status, list_templates, coalesce_settings, acknowledge_event,
 )
 
 logger = logging.getLogger(__name__)
 
 # API for rebase-specific functionality
-rebase_app = web.Application()
+rebase_app = web.Application(middlewares=[metrics_middleware, profiling_middleware])
 rebase_app.add_routes([
     web.get("/data/folders", list_data_folders),
     web.get("/data/images", list_images),
     web.get("/data/view", view_file),  # Add route to view files
+    web.get("/data/thumb", view_thumbnail),
+    web.get("/data/thumb/stats", thumbnail_stats),
+    web.get("/data/workflow", view_workflow),
+    web.get("/data/workflow/stats", workflow_stats),
+    web.get("/data/index/stats", index_stats),
+    web.get("/storage/stats", storage_stats),
+    web.get("/metrics", metrics_route),
+    web.get("/profiles", list_profiles_route),
+    web.get("/profiles/{filename}", get_profile_route),
 
     web.post("/diff/save", save_diff_route),
     web.get("/diff/list", list_diffs_route),
     web.get("/diff/load/{filename}", load_diff_route),
     web.delete("/diff/delete/{filename}", delete_diff_route),
+    web.get("/diff/versions/{filename}", list_diff_versions_route),
+    web.get("/diff/versions/{filename}/{version}", load_diff_version_route),
 
     web.post("/remaps/save", save_remaps_route),
     web.get("/remaps/list", list_remaps_route),
@@ -37,8 +58,33 @@ rebase_app.add_routes([
     web.delete("/remaps/delete/{filename}", delete_remaps_route),
 
     web.post("/forward", forward_to_websocket),
+    web.post("/forward/batch", forward_batch_to_websocket),
+    web.post("/forward/ack", acknowledge_event),
+    web.get("/forward/coalesce", coalesce_settings),
+    web.post("/forward/coalesce", coalesce_settings),
+    web.get("/queue", queue_status),
     web.post("/reset", forward_reset_request),
+    web.get("/templates", list_templates),
+    web.get("/events", stream_events_route),
+    web.get("/events/stats", event_stream_stats),
+
+    web.get("/working", get_working_route),
+    web.post("/working", update_working_route),
+    web.delete("/working", clear_working_route),
+    web.get("/working/stats", working_stats),
+
+    web.post("/jobs", submit_jobs_route),
+    web.get("/jobs", list_jobs_route),
+    web.get("/jobs/{job_id}", get_job_route),
+    web.post("/jobs/{job_id}/cancel", cancel_job_route),
+    web.post("/jobs/{job_id}/retry", retry_job_route),
 ])
+rebase_app.on_startup.append(start_job_dispatcher)
+rebase_app.on_cleanup.append(stop_job_dispatcher)
+rebase_app.on_cleanup.append(flush_working_state)
+rebase_app.on_response_prepare.append(record_prepared_response)
+rebase_app.on_startup.append(start_event_stream)
+rebase_app.on_cleanup.append(stop_event_stream)
 server.PromptServer.instance.app.add_subapp("/rebase/", rebase_app)
 
 WEB_DIRECTORY = "./web/js"
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Compare the record codecs used for saved diffs and remaps.
+
+Builds a synthetic diff shaped like the ones the frontend saves (a node
+map with long prompt widgets), then reports encoded size and median
+encode/decode latency for every codec. With orjson installed, the compact
+and gzip codecs are measured with and without it.
+
+    python benchmarks/bench_codecs.py --nodes 400 --runs 50
+    python benchmarks/bench_codecs.py --json
+"""
+
+import os
+import sys
+import json
+import random
+import argparse
+import statistics
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from extension import record_codecs
+from extension.record_codecs import CODECS, decode
+
+
+def make_diff(nodes: int, seed: int = 0):
+    rng = random.Random(seed)
+    words = ["astronaut", "koi", "watercolor", "portrait", "cinematic", "lighting", "detailed", "forest", "neon"]
+    diff = {}
+    for node_id in range(nodes):
+        diff[str(node_id)] = {
+            "type": rng.choice(["CLIPTextEncode", "KSampler", "LoraLoader", "EmptyLatentImage"]),
+            "mode": 0,
+            "values": {
+                "text": " ".join(rng.choice(words) for _ in range(rng.randint(20, 120))),
+                "seed": rng.randint(0, 2**48),
+                "steps": rng.randint(10, 50),
+                "cfg": round(rng.uniform(1, 12), 2),
+                "sampler_name": rng.choice(["euler", "dpmpp_2m", "ddim"]),
+            },
+        }
+    return diff
+
+
+def median_ms(fn, runs: int) -> float:
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def measure(record, runs: int):
+    results = []
+    backends = [record_codecs.fast_json_backend()]
+    if record_codecs.orjson is not None:
+        backends.append("json")
+
+    for backend in backends:
+        saved = record_codecs.orjson
+        if backend == "json":
+            record_codecs.orjson = None
+        try:
+            for name, codec in CODECS.items():
+                if name == "json" and backend != backends[0]:
+                    continue  # the pretty codec always encodes with the stdlib
+                data = codec.encode(record)
+                assert decode(data) == record
+                results.append({
+                    "codec": name,
+                    "backend": backend,
+                    "bytes": len(data),
+                    "encode_ms": round(median_ms(lambda: codec.encode(record), runs), 3),
+                    "decode_ms": round(median_ms(lambda: decode(data), runs), 3),
+                })
+        finally:
+            record_codecs.orjson = saved
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark record codecs for saved diffs and remaps")
+    parser.add_argument("--nodes", type=int, default=200, help="Nodes in the synthetic diff (default: 200)")
+    parser.add_argument("--runs", type=int, default=30, help="Timed runs per measurement (default: 30)")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    record = {"name": "benchmark", "created": 0, "diff": make_diff(args.nodes)}
+    results = measure(record, args.runs)
+
+    if args.json:
+        print(json.dumps({"nodes": args.nodes, "runs": args.runs, "results": results}, indent=2))
+        return
+
+    baseline = next(r["bytes"] for r in results if r["codec"] == "json")
+    print(f"{'codec':<10}{'backend':<10}{'bytes':>12}{'ratio':>8}{'encode ms':>12}{'decode ms':>12}")
+    for r in results:
+        print(
+            f"{r['codec']:<10}{r['backend']:<10}{r['bytes']:>12}{r['bytes'] / baseline:>8.2f}"
+            f"{r['encode_ms']:>12.3f}{r['decode_ms']:>12.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
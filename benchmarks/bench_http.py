@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for the rebase HTTP surface.
+
+Runs the real route handlers behind an aiohttp test server, against the
+dummy PromptServer from tests/conftest.py, with all data in a temporary
+directory:
+
+  - list_images: GET /rebase/data/images on folders of 10k and 100k files
+  - list_diffs:  GET /rebase/diff/list with thousands of saved diffs, per storage backend
+  - view_file:   GET /rebase/data/view on a large file
+  - forward:     POST /rebase/forward throughput, sequential and concurrent
+
+Results are printed (or written with --output) as JSON. Pass --compare
+with an earlier result file to flag latencies that got slower and
+throughputs that dropped.
+
+    python benchmarks/bench_http.py --output bench.json
+    python benchmarks/bench_http.py --quick --compare bench.json
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import platform
+import statistics
+import subprocess
+import tempfile
+import importlib.util
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+# Install the dummy PromptServer before any extension module imports 'server'
+_spec = importlib.util.spec_from_file_location("rebase_test_conftest", ROOT / "tests" / "conftest.py")
+conftest = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(conftest)
+
+from aiohttp import web
+from aiohttp.test_utils import TestClient, TestServer
+
+from extension import routes, socket_events
+from extension.dir_index import DirectoryIndex, RACY_WINDOW_NS
+from extension.diff_manager import DiffManager
+from extension.record_codecs import get_codec
+from extension.workflow_meta import WorkflowCache
+
+FULL = {"image_counts": [10_000, 100_000], "diff_count": 5_000, "view_mb": 64, "forward_requests": 2_000}
+QUICK = {"image_counts": [1_000, 10_000], "diff_count": 1_000, "view_mb": 8, "forward_requests": 300}
+
+
+class FakeWebSocket:
+    """Accepts frames instantly, like a browser tab on localhost."""
+
+    def __init__(self):
+        self.received = 0
+
+    async def send_str(self, message):
+        self.received += 1
+
+    async def close(self):
+        pass
+
+
+def summarize(samples_ms):
+    samples = sorted(samples_ms)
+    return {
+        "runs": len(samples),
+        "median_ms": round(statistics.median(samples), 3),
+        "p95_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 3),
+        "min_ms": round(samples[0], 3),
+    }
+
+
+async def time_requests(client, method, url, runs, **kwargs):
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        async with client.request(method, url, **kwargs) as resp:
+            assert resp.status == 200, f"{method} {url} -> {resp.status}"
+            await resp.read()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def build_app():
+    app = web.Application()
+    app.add_routes([
+        web.get("/rebase/data/images", routes.list_images),
+        web.get("/rebase/data/view", routes.view_file),
+        web.get("/rebase/diff/list", routes.list_diffs_route),
+        web.post("/rebase/forward", socket_events.forward_to_websocket),
+    ])
+    return app
+
+
+def make_image_folder(base: Path, count: int) -> str:
+    folder = f"images_{count}"
+    path = base / "data" / "evals" / folder
+    path.mkdir(parents=True)
+    # Backdated past DirectoryIndex's racy window, which would otherwise
+    # make the index distrust (and rescan) a folder this fresh
+    settled = time.time() - 2 * RACY_WINDOW_NS / 1e9
+    for i in range(count):
+        # The listing only looks at names; a few sidecar files keep the filter honest
+        name = path / (f"img_{i:06d}.png" if i % 10 else f"img_{i:06d}.txt")
+        name.touch()
+        os.utime(name, (settled, settled))
+    os.utime(path, (settled, settled))
+    return folder
+
+
+async def bench_list_images(client, base: Path, counts, runs):
+    results = {}
+    for count in counts:
+        folder = make_image_folder(base, count)
+        url = f"/rebase/data/images?type=evals&folder={folder}"
+
+        routes.dir_index = DirectoryIndex()
+        routes.workflow_cache = WorkflowCache()
+        cold = await time_requests(client, "GET", url, 1)
+        warm = await time_requests(client, "GET", url, runs)
+        index = routes.dir_index.stats()
+        # Only the cold request may scan, or "warm" is not measuring the cached path
+        assert index["misses"] == 1, f"directory index rescanned during warm runs: {index}"
+        results[str(count)] = {
+            "files": count,
+            "cold_ms": round(cold[0], 3),
+            **summarize(warm),
+            "index_hit_rate": round(index["hits"] / (index["hits"] + index["misses"]), 3),
+        }
+    return results
+
+
+def write_diffs(directory: Path, count: int) -> None:
+    directory.mkdir(parents=True)
+    codec = get_codec("compact")
+    for i in range(count):
+        record = {
+            "name": f"diff {i:05d}",
+            "created": 1_700_000_000 + i,
+            "diff": {str(n): {"text": {"old": "a cat", "new": f"a dog {i}"}} for n in range(5)},
+        }
+        (directory / f"diff_{i:05d}_{1_700_000_000 + i}.json").write_bytes(codec.encode(record))
+
+
+async def bench_list_diffs(client, base: Path, count, runs):
+    diffs_dir = base / "data" / "diffs"
+    write_diffs(diffs_dir, count)
+
+    results = {}
+    for backend in ("files", "sqlite"):
+        start = time.perf_counter()
+        routes.diff_manager = DiffManager(diffs_dir, backend=backend, db_path=base / "data" / "rebase.sqlite3")
+        setup_ms = (time.perf_counter() - start) * 1000
+
+        cold = await time_requests(client, "GET", "/rebase/diff/list", 1)
+        warm = await time_requests(client, "GET", "/rebase/diff/list", runs)
+        page = await time_requests(client, "GET", "/rebase/diff/list?limit=50&prefix=diff%2004", runs)
+        results[backend] = {
+            "diffs": count,
+            # For sqlite this includes the one-time migration of the files
+            "setup_ms": round(setup_ms, 3),
+            "cold_ms": round(cold[0], 3),
+            **summarize(warm),
+            "prefix_page": summarize(page),
+        }
+    return results
+
+
+async def bench_view_file(client, base: Path, size_mb, runs):
+    folder = base / "data" / "evals" / "large"
+    folder.mkdir(parents=True)
+    chunk = os.urandom(1024 * 1024)
+    with open(folder / "large.png", "wb") as f:
+        for _ in range(size_mb):
+            f.write(chunk)
+
+    samples = await time_requests(client, "GET", "/rebase/data/view?type=evals&folder=large&filename=large.png", runs)
+    result = summarize(samples)
+    result["bytes"] = size_mb * 1024 * 1024
+    result["mb_per_s"] = round(size_mb / (result["median_ms"] / 1000), 1)
+    return result
+
+
+async def bench_forward(client, requests, concurrency):
+    instance = conftest.dummy_server
+    instance.sockets = {f"tab{i}": FakeWebSocket() for i in range(3)}
+    payload = {"event": "prompt_replace", "data": {"positive_prompt": "Astronaut riding a koi"}}
+
+    async def send(n):
+        samples = []
+        for _ in range(n):
+            start = time.perf_counter()
+            async with client.post("/rebase/forward", json=payload) as resp:
+                assert resp.status == 200
+                await resp.read()
+            samples.append((time.perf_counter() - start) * 1000)
+        return samples
+
+    results = {}
+    for workers in (1, concurrency):
+        per_worker = max(1, requests // workers)
+        start = time.perf_counter()
+        batches = await asyncio.gather(*(send(per_worker) for _ in range(workers)))
+        elapsed = time.perf_counter() - start
+        samples = [s for batch in batches for s in batch]
+        results[f"concurrency_{workers}"] = {
+            "requests": len(samples),
+            "requests_per_s": round(len(samples) / elapsed, 1),
+            **summarize(samples),
+        }
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run(params, runs, concurrency):
+    with tempfile.TemporaryDirectory(prefix="rebase-bench-") as tmp:
+        base = Path(tmp)
+        routes.get_parent_path = lambda: base
+        # Keep the benchmark free of coalescing delays regardless of the environment
+        socket_events.coalescer = socket_events.PromptReplaceCoalescer()
+
+        client = TestClient(TestServer(build_app()))
+        await client.start_server()
+        try:
+            return {
+                "list_images": await bench_list_images(client, base, params["image_counts"], runs),
+                "list_diffs": await bench_list_diffs(client, base, params["diff_count"], runs),
+                "view_file": await bench_view_file(client, base, params["view_mb"], runs),
+                "forward": await bench_forward(client, params["forward_requests"], concurrency),
+            }
+        finally:
+            await client.close()
+
+
+# Compared against a baseline: latencies regress upwards, throughput downwards
+LATENCY_METRICS = ("median_ms", "cold_ms")
+THROUGHPUT_METRICS = ("requests_per_s",)
+
+
+def flatten(results, metrics, prefix=""):
+    """Map 'list_images.10000.median_ms'-style keys to the values of the given metrics."""
+    flat = {}
+    for key, value in results.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten(value, metrics, name + "."))
+        elif key in metrics:
+            flat[name] = value
+    return flat
+
+
+def compare(current, baseline, threshold, min_delta_ms):
+    """
+    Return (metric, before, after) for latencies that grew, and throughputs
+    that dropped, by more than threshold.
+    """
+    regressions = []
+    before = flatten(baseline["results"], LATENCY_METRICS)
+    for key, value in flatten(current["results"], LATENCY_METRICS).items():
+        old = before.get(key)
+        if old and value > old * (1 + threshold) and value - old > min_delta_ms:
+            regressions.append((key, old, value))
+
+    before = flatten(baseline["results"], THROUGHPUT_METRICS)
+    for key, value in flatten(current["results"], THROUGHPUT_METRICS).items():
+        old = before.get(key)
+        if old and value < old / (1 + threshold):
+            regressions.append((key, old, value))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the rebase HTTP routes")
+    parser.add_argument("--quick", action="store_true", help="Smaller data sets, for a fast sanity run")
+    parser.add_argument("--runs", type=int, default=20, help="Timed requests per measurement (default: 20)")
+    parser.add_argument("--concurrency", type=int, default=16, help="Concurrent clients for the forward benchmark (default: 16)")
+    parser.add_argument("--output", help="Write results to this file instead of stdout")
+    parser.add_argument("--compare", help="Earlier result file to compare latencies and throughput against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Relative slowdown reported as a regression (default: 0.2)")
+    parser.add_argument("--min-delta-ms", type=float, default=1.0, help="Ignore slowdowns smaller than this, which are mostly noise (default: 1.0)")
+    args = parser.parse_args()
+
+    params = QUICK if args.quick else FULL
+    results = asyncio.run(run(params, args.runs, args.concurrency))
+    report = {
+        "commit": git_commit(),
+        "timestamp": time.time(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "params": {**params, "runs": args.runs, "concurrency": args.concurrency},
+        "results": results,
+    }
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(text + "\n", encoding="utf-8")
+    else:
+        print(text)
+
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text(encoding="utf-8"))
+        regressions = compare(report, baseline, args.threshold, args.min_delta_ms)
+        for key, old, new in regressions:
+            unit = "req/s" if key.endswith("requests_per_s") else "ms"
+            print(f"REGRESSION {key}: {old:.3f}{unit} -> {new:.3f}{unit}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+import uuid
+import asyncio
+import logging
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Keys added to the data of an event that waits for acknowledgement
+ACK_ID_KEY = 'rebase_id'
+ACK_REQUEST_KEY = 'rebase_ack'
+
+
+class AckRegistry:
+    """
+    Pending acknowledgements for forwarded events, keyed by correlation ID.
+
+    register() hands out an ID to send along with the event; the browser
+    posts it back once its handler has finished, which resolves the
+    waiting request. The first acknowledgement wins, so with several tabs
+    open the caller resumes as soon as one of them has applied the event.
+    Entries are removed once their waiter is done, so late, repeated or
+    unknown acknowledgements are simply ignored.
+    """
+
+    def __init__(self):
+        self._pending: Dict[str, asyncio.Future] = {}
+        self.acked = 0
+        self.timed_out = 0
+        self.unknown = 0
+
+    def register(self) -> str:
+        ack_id = uuid.uuid4().hex
+        self._pending[ack_id] = asyncio.get_running_loop().create_future()
+        return ack_id
+
+    def resolve(self, ack_id: str, ok: bool = True, error: Optional[str] = None, result: Any = None) -> bool:
+        """
+        Record an acknowledgement; returns False if nobody is waiting for it.
+        result is whatever the browser's handler returned, e.g. prompt ids.
+        """
+        # Left in place for the waiter, which may not have started waiting yet
+        future = self._pending.get(ack_id)
+        if future is None or future.done():
+            self.unknown += 1
+            return False
+        self.acked += 1
+        future.set_result({'id': ack_id, 'ok': ok, 'error': error, 'result': result})
+        return True
+
+    def discard(self, ack_id: str) -> None:
+        future = self._pending.pop(ack_id, None)
+        if future is not None and not future.done():
+            future.cancel()
+
+    async def wait(self, ack_id: str, timeout: float) -> Optional[Dict[str, Any]]:
+        """Wait for the acknowledgement; returns None on timeout."""
+        future = self._pending.get(ack_id)
+        if future is None:
+            raise KeyError(ack_id)
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            logger.warning(f"No acknowledgement for event {ack_id} within {timeout}s")
+            return None
+        finally:
+            self.discard(ack_id)
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+
+acks = AckRegistry()
@@ -1,23 +1,53 @@
-import json
 import time
 import logging
 from pathlib import Path
 from typing import Dict, List, Any, Optional
 
+from .json_delta import apply_delta, content_hash, make_delta
+from .record_codecs import get_codec
+from .record_store import create_store, storage_backend
+
 logger = logging.getLogger(__name__)
 
 class DiffManager:
-    """Manages saving, loading, and listing of diff files."""
-
-    def __init__(self, diffs_dir: Optional[Path] = None):
+    """
+    Manages saving, loading, and listing of diff files.
+
+    Saves under the same name form a version chain in a single record: the
+    latest content is stored in full under "diff", and each older version
+    keeps only the delta that turns its successor back into it. Saving
+    content identical to the latest version (by content hash) adds nothing.
+    """
+
+    def __init__(
+        self,
+        diffs_dir: Optional[Path] = None,
+        backend: Optional[str] = None,
+        db_path: Optional[Path] = None,
+        codec: Optional[str] = None,
+    ):
         if diffs_dir is None:
             # Default to a 'diffs' subdirectory in the extension root
             self.diffs_dir = Path(__file__).parent.parent / "data" / "diffs"
         else:
             self.diffs_dir = diffs_dir
 
-        # Ensure the directory exists
-        self.diffs_dir.mkdir(parents=True, exist_ok=True)
+        self._store = create_store(
+            backend or storage_backend(), self.diffs_dir, "diffs", self._summarize, db_path,
+            get_codec(codec) if codec else None,
+        )
+
+    @staticmethod
+    def _summarize(filepath: Path, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Extract the listing fields stored in the manifest."""
+        created = data.get("created")
+        if created is None:
+            created = filepath.stat().st_mtime
+        return {
+            "name": data.get("name", filepath.stem),
+            "created": created,
+            "versions": len(data.get("versions", ())) or 1,
+        }
 
     def save_diff(self, name: str, diff_data: Dict[str, Any]) -> str:
         """
@@ -32,66 +62,97 @@ class DiffManager:
         safe_name = safe_name.replace(' ', '_')
 
         timestamp = int(time.time())
-        filename = f"{safe_name}_{timestamp}.json"
-        filepath = self.diffs_dir / filename
+        digest = content_hash(diff_data)
+
+        filename = self._find_by_name(name)
+        if filename is None:
+            filename = f"{safe_name}_{timestamp}.json"
+            versions = [{"version": 1, "created": timestamp, "hash": digest}]
+        else:
+            previous = self._store.load(filename)
+            versions = self._versions(previous)
+            if versions[-1]["hash"] == digest:
+                # Identical to the latest version; nothing new to store
+                return filename
+            # Keep only what is needed to rebuild the previous version
+            versions[-1]["delta"] = make_delta(diff_data, previous.get("diff", {}))
+            versions.append({"version": versions[-1]["version"] + 1, "created": timestamp, "hash": digest})
 
         # Prepare the data to save
         save_data = {
             "name": name,
             "created": timestamp,
-            "diff": diff_data
+            "diff": diff_data,
+            "versions": versions,
         }
 
-        # Save to file
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(save_data, f, indent=2)
-
+        self._store.save(filename, save_data)
         return filename
 
+    def _find_by_name(self, name: str) -> Optional[str]:
+        """Filename of the newest record saved under exactly this name."""
+        for summary in self._store.list(prefix=name):
+            if summary["name"] == name:
+                return summary["filename"]
+        return None
+
+    @staticmethod
+    def _versions(data: Dict[str, Any]) -> List[Dict[str, Any]]:
+        versions = data.get("versions")
+        if versions:
+            return versions
+        # Saved before version history existed: a single version
+        return [{"version": 1, "created": data.get("created"), "hash": content_hash(data.get("diff", {}))}]
+
     def load_diff(self, filename: str) -> Dict[str, Any]:
         """Load a diff by filename."""
-        filepath = self.diffs_dir / filename
+        try:
+            data = self._store.load(filename)
+        except FileNotFoundError:
+            raise FileNotFoundError(f"Diff file not found: {filename}")
+
+        return data.get("diff", {})
 
-        if not filepath.exists():
+    def list_versions(self, filename: str) -> List[Dict[str, Any]]:
+        """List the versions of a diff, oldest first, without their deltas."""
+        try:
+            data = self._store.load(filename)
+        except FileNotFoundError:
             raise FileNotFoundError(f"Diff file not found: {filename}")
 
-        with open(filepath, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        return [
+            {key: value for key, value in version.items() if key != "delta"}
+            for version in self._versions(data)
+        ]
 
-        return data.get("diff", {})
+    def load_version(self, filename: str, version: int) -> Dict[str, Any]:
+        """Rebuild a specific version of a diff. Raises KeyError for unknown versions."""
+        try:
+            data = self._store.load(filename)
+        except FileNotFoundError:
+            raise FileNotFoundError(f"Diff file not found: {filename}")
 
-    def list_diffs(self) -> List[Dict[str, Any]]:
-        """List all available diffs."""
-        diffs = []
-
-        for filepath in self.diffs_dir.glob("*.json"):
-            try:
-                with open(filepath, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-
-                diffs.append({
-                    "filename": filepath.name,
-                    "name": data.get("name", filepath.stem),
-                    "created": data.get("created", filepath.stat().st_mtime)
-                })
-            except (json.JSONDecodeError, IOError) as e:
-                # Skip corrupted files
-                logger.warning(f"Warning: Could not read diff file {filepath}: {e}")
-                continue
-
-        # Sort by creation time, newest first
-        diffs.sort(key=lambda x: x["created"], reverse=True)
-        return diffs
+        versions = self._versions(data)
+        numbers = [v["version"] for v in versions]
+        if version not in numbers:
+            raise KeyError(version)
 
-    def delete_diff(self, filename: str) -> bool:
-        """Delete a diff by filename. Returns True if successful."""
-        filepath = self.diffs_dir / filename
+        # Walk back from the latest version, undoing one save at a time
+        diff = data.get("diff", {})
+        for entry in reversed(versions[:-1]):
+            if entry["version"] < version:
+                break
+            diff = apply_delta(diff, entry["delta"])
+        return diff
 
-        if not filepath.exists():
-            return False
+    def list_diffs(self, limit: Optional[int] = None, offset: int = 0, prefix: Optional[str] = None) -> List[Dict[str, Any]]:
+        """List available diffs, newest first, optionally paginated and filtered by name prefix."""
+        return self._store.list(limit, offset, prefix)
 
-        try:
-            filepath.unlink()
-            return True
-        except OSError:
-            return False
+    def count_diffs(self, prefix: Optional[str] = None) -> int:
+        """Count diffs, optionally only those whose name starts with prefix."""
+        return self._store.count(prefix)
+
+    def delete_diff(self, filename: str) -> bool:
+        """Delete a diff by filename. Returns True if successful."""
+        return self._store.delete(filename)
@@ -0,0 +1,114 @@
+import os
+import time
+import logging
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# A listing taken within this many seconds of the directory's mtime may have
+# raced a change that landed in the same mtime tick, so it is never trusted.
+RACY_WINDOW_NS = 2_000_000_000
+
+
+@dataclass
+class DirectoryListing:
+    """Snapshot of a single directory's entries."""
+    mtime_ns: int
+    files: List[str]
+    dirs: List[str]
+    stable: bool = True
+    filtered: Dict[Tuple[str, ...], List[str]] = field(default_factory=dict)
+
+    def files_with_ext(self, filter_ext: Tuple[str, ...]) -> List[str]:
+        """Return files matching the given extensions, memoized per filter."""
+        cached = self.filtered.get(filter_ext)
+        if cached is None:
+            cached = [f for f in self.files if f.lower().endswith(filter_ext)]
+            self.filtered[filter_ext] = cached
+        return cached
+
+
+class DirectoryIndex:
+    """
+    In-process cache of directory listings keyed by path.
+
+    Each listing is rebuilt only when the directory's mtime changes, so
+    repeated requests against a large, unchanged folder are served from memory.
+    """
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._listings: Dict[str, DirectoryListing] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, path: Path) -> Optional[DirectoryListing]:
+        """Return the listing for a directory, or None if it does not exist."""
+        key = str(path)
+        try:
+            st = os.stat(path)
+        except (FileNotFoundError, NotADirectoryError):
+            with self._lock:
+                self._listings.pop(key, None)
+            return None
+
+        with self._lock:
+            listing = self._listings.get(key)
+            if listing is not None and listing.stable and listing.mtime_ns == st.st_mtime_ns:
+                self.hits += 1
+                return listing
+            self.misses += 1
+
+        listing = self._scan(path, st.st_mtime_ns)
+        if listing is None:
+            return None
+
+        with self._lock:
+            if key not in self._listings and len(self._listings) >= self.max_entries:
+                # Evict the oldest inserted listing
+                self._listings.pop(next(iter(self._listings)))
+            self._listings[key] = listing
+        return listing
+
+    def _scan(self, path: Path, mtime_ns: int) -> Optional[DirectoryListing]:
+        started_ns = time.time_ns()
+        files: List[str] = []
+        dirs: List[str] = []
+        try:
+            with os.scandir(path) as it:
+                for entry in it:
+                    try:
+                        if entry.is_file():
+                            files.append(entry.name)
+                        elif entry.is_dir():
+                            dirs.append(entry.name)
+                    except OSError as e:
+                        logger.warning(f"Could not stat {entry.path}: {e}")
+        except NotADirectoryError:
+            return None
+
+        files.sort()
+        dirs.sort()
+        stable = started_ns - mtime_ns > RACY_WINDOW_NS
+        return DirectoryListing(mtime_ns=mtime_ns, files=files, dirs=dirs, stable=stable)
+
+    def invalidate(self, path: Optional[Path] = None) -> None:
+        """Drop one cached listing, or all of them."""
+        with self._lock:
+            if path is None:
+                self._listings.clear()
+            else:
+                self._listings.pop(str(path), None)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self._listings),
+                "files": sum(len(l.files) for l in self._listings.values()),
+            }
@@ -0,0 +1,258 @@
+import json
+import asyncio
+import logging
+import functools
+from collections import deque
+from typing import Any, Deque, Dict, FrozenSet, Optional, Set, Tuple
+
+import server
+from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+# ComfyUI events relayed to subscribers; binary previews and UI chatter are not
+EXECUTION_EVENTS = frozenset([
+    'status',
+    'execution_start',
+    'execution_cached',
+    'executing',
+    'progress',
+    'executed',
+    'execution_success',
+    'execution_error',
+    'execution_interrupted',
+])
+
+# Events after which a prompt will not report anything else
+FINISHED_EVENTS = frozenset(['execution_success', 'execution_error', 'execution_interrupted'])
+
+HEARTBEAT_INTERVAL = 15.0
+
+
+def prompt_finished(event: str, data: Any) -> Optional[str]:
+    """The prompt_id an event marks as finished, if any."""
+    if not isinstance(data, dict):
+        return None
+    # Older ComfyUI versions only signal the end with executing(node=None)
+    if event in FINISHED_EVENTS or (event == 'executing' and data.get('node') is None):
+        return data.get('prompt_id')
+    return None
+
+
+class Subscriber:
+    """
+    One SSE client: a bounded buffer of (id, event, data) plus its filters.
+
+    When the client reads slower than events arrive, the oldest buffered
+    events are discarded and counted, so a stalled reader costs at most
+    `maxsize` events of memory and never slows ComfyUI down.
+    """
+
+    def __init__(self, prompt_ids: Optional[FrozenSet[str]] = None, events: Optional[FrozenSet[str]] = None, maxsize: int = 256):
+        self.prompt_ids = prompt_ids
+        self.events = events
+        self.buffer: Deque[Tuple[int, str, Any]] = deque(maxlen=maxsize)
+        self.dropped = 0
+        self._ready = asyncio.Event()
+
+    def wants(self, event: str, data: Any) -> bool:
+        if self.events is not None and event not in self.events:
+            return False
+        if self.prompt_ids is not None:
+            prompt_id = data.get('prompt_id') if isinstance(data, dict) else None
+            return prompt_id in self.prompt_ids
+        return True
+
+    def put(self, item: Tuple[int, str, Any]) -> None:
+        if len(self.buffer) == self.buffer.maxlen:
+            self.dropped += 1
+        self.buffer.append(item)
+        self._ready.set()
+
+    async def wait(self, timeout: float) -> bool:
+        """Wait until something is buffered; returns False on timeout."""
+        if self.buffer:
+            return True
+        self._ready.clear()
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+
+class ExecutionEventStream:
+    """
+    Relays ComfyUI's execution events to SSE subscribers.
+
+    install() wraps PromptServer.instance.send, which every event for the
+    browser goes through (send_sync included), so nothing else in ComfyUI
+    has to change. Publishing only appends to the subscribers' buffers and
+    to a short history, which lets a client that subscribes late (or
+    reconnects) replay what it missed.
+    """
+
+    def __init__(self, max_subscribers: int = 16, buffer_size: int = 256, history_size: int = 512):
+        self.max_subscribers = max_subscribers
+        self.buffer_size = buffer_size
+        self.subscribers: Set[Subscriber] = set()
+        self.history: Deque[Tuple[int, str, Any]] = deque(maxlen=history_size)
+        self._seq = 0
+        self._original_send = None
+
+    def install(self) -> bool:
+        instance = server.PromptServer.instance
+        send = getattr(instance, 'send', None)
+        if send is None:
+            logger.warning("PromptServer has no send(); execution events will not be relayed")
+            return False
+        if self._original_send is not None:
+            return True
+
+        @functools.wraps(send)
+        async def relaying_send(event, data, sid=None):
+            try:
+                self.publish(event, data)
+            except Exception as e:
+                logger.error(f"Failed to relay {event} event: {e}")
+            return await send(event, data, sid)
+
+        self._original_send = send
+        instance.send = relaying_send
+        return True
+
+    def uninstall(self) -> None:
+        if self._original_send is not None:
+            server.PromptServer.instance.send = self._original_send
+            self._original_send = None
+
+    def publish(self, event: Any, data: Any) -> None:
+        if event not in EXECUTION_EVENTS:
+            return
+        self._seq += 1
+        item = (self._seq, event, data)
+        self.history.append(item)
+        for subscriber in self.subscribers:
+            if subscriber.wants(event, data):
+                subscriber.put(item)
+
+    def subscribe(
+        self,
+        prompt_ids: Optional[FrozenSet[str]] = None,
+        events: Optional[FrozenSet[str]] = None,
+        since: Optional[int] = None,
+    ) -> Optional[Subscriber]:
+        """
+        Add a subscriber; with `since`, the events after that id still in
+        the history are buffered for it first.
+        """
+        if len(self.subscribers) >= self.max_subscribers:
+            return None
+        subscriber = Subscriber(prompt_ids, events, self.buffer_size)
+        if since is not None:
+            for item in self.history:
+                if item[0] > since and subscriber.wants(item[1], item[2]):
+                    subscriber.put(item)
+        self.subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        self.subscribers.discard(subscriber)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'installed': self._original_send is not None,
+            'subscribers': len(self.subscribers),
+            'published': self._seq,
+            'history': len(self.history),
+            'buffered': sum(len(s.buffer) for s in self.subscribers),
+            'dropped': sum(s.dropped for s in self.subscribers),
+        }
+
+
+def _csv(value: Optional[str]) -> Optional[FrozenSet[str]]:
+    if not value:
+        return None
+    items = frozenset(v.strip() for v in value.split(',') if v.strip())
+    return items or None
+
+
+def _sse(seq: Optional[int], event: str, data: Any) -> bytes:
+    head = f"id: {seq}\n" if seq is not None else ""
+    return f"{head}event: {event}\ndata: {json.dumps(data)}\n\n".encode('utf-8')
+
+
+async def stream_events_route(request):
+    """
+    Server-sent events of ComfyUI execution progress.
+
+    ?prompt_id=a,b only relays events for those prompts (status has no
+    prompt and is skipped then); ?events=executing,progress picks event
+    types. With prompt IDs, ?until=finished ends the stream once all of
+    them have finished. ?since=<id> (or a Last-Event-ID header, which
+    browsers send when reconnecting) first replays the recent events after
+    that id, so a stream opened after queueing a prompt misses nothing.
+    A 'dropped' event reports events discarded because the client fell
+    behind.
+    """
+    events = _csv(request.query.get('events'))
+    if events is not None and not events <= EXECUTION_EVENTS:
+        unknown = ', '.join(sorted(events - EXECUTION_EVENTS))
+        return web.json_response({'error': f'Unknown events: {unknown}'}, status=400)
+
+    since = request.query.get('since', request.headers.get('Last-Event-ID'))
+    if since is not None:
+        try:
+            since = int(since)
+        except ValueError:
+            return web.json_response({'error': f'Invalid event id: {since}'}, status=400)
+
+    prompt_ids = _csv(request.query.get('prompt_id'))
+    remaining = set(prompt_ids) if prompt_ids and request.query.get('until') == 'finished' else None
+
+    subscriber = event_stream.subscribe(prompt_ids, events, since)
+    if subscriber is None:
+        return web.json_response({'error': 'Too many event stream subscribers'}, status=503)
+
+    response = web.StreamResponse(headers={
+        'Content-Type': 'text/event-stream',
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',
+    })
+    try:
+        await response.prepare(request)
+        await response.write(b": connected\n\n")
+        reported_dropped = 0
+        while True:
+            if not await subscriber.wait(HEARTBEAT_INTERVAL):
+                await response.write(b": keepalive\n\n")
+                continue
+            if subscriber.dropped > reported_dropped:
+                await response.write(_sse(None, 'dropped', {'count': subscriber.dropped - reported_dropped}))
+                reported_dropped = subscriber.dropped
+            items = [subscriber.buffer.popleft() for _ in range(len(subscriber.buffer))]
+            await response.write(b"".join(_sse(*item) for item in items))
+            if remaining is not None:
+                remaining.difference_update(prompt_finished(event, data) for _, event, data in items)
+                if not remaining:
+                    break
+    except ConnectionResetError:
+        pass
+    finally:
+        event_stream.unsubscribe(subscriber)
+    return response
+
+
+async def event_stream_stats(request):
+    """Report subscribers and relayed/dropped event counts"""
+    return web.json_response(event_stream.stats())
+
+
+async def start_event_stream(app):
+    event_stream.install()
+
+async def stop_event_stream(app):
+    event_stream.uninstall()
+
+
+event_stream = ExecutionEventStream()
@@ -0,0 +1,108 @@
+import asyncio
+import functools
+import logging
+from contextvars import ContextVar
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, asdict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Per-operation concurrency limits. Writes are kept narrow so a burst of saves
+# cannot starve listings; anything not listed uses default_limit.
+DEFAULT_LIMITS = {
+    "diff.save": 1,
+    "diff.delete": 1,
+    "remap.save": 1,
+    "remap.delete": 1,
+    "jobs.submit": 1,
+}
+
+# Set by a request to wrap the calls it sends to the pool (the profiler uses
+# this to follow a request into the worker threads)
+call_wrapper: ContextVar[Optional[Callable[[Callable], Callable]]] = ContextVar("rebase_call_wrapper", default=None)
+
+
+@dataclass
+class OperationStats:
+    waiting: int = 0
+    running: int = 0
+    completed: int = 0
+    failed: int = 0
+    max_waiting: int = 0
+
+
+class StorageExecutor:
+    """
+    Bounded thread pool for the blocking disk work done by rebase routes.
+
+    Handlers await run() instead of calling storage code directly, so a slow
+    disk never stalls ComfyUI's event loop. Each operation name gets its own
+    concurrency limit, and waiting/running counts are kept for reporting.
+    """
+
+    def __init__(self, max_workers: int = 4, limits: Optional[Dict[str, int]] = None, default_limit: int = 2):
+        self.max_workers = max_workers
+        self.limits = dict(DEFAULT_LIMITS if limits is None else limits)
+        self.default_limit = default_limit
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="rebase-io")
+        self._semaphores: Dict[str, Tuple[asyncio.AbstractEventLoop, asyncio.Semaphore]] = {}
+        self._stats: Dict[str, OperationStats] = {}
+
+    def _semaphore(self, op: str) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        entry = self._semaphores.get(op)
+        if entry is None or entry[0] is not loop:
+            entry = (loop, asyncio.Semaphore(self.limits.get(op, self.default_limit)))
+            self._semaphores[op] = entry
+        return entry[1]
+
+    async def run(self, op: str, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """Run fn(*args, **kwargs) on the pool under the limit for op."""
+        stats = self._stats.setdefault(op, OperationStats())
+        semaphore = self._semaphore(op)
+
+        stats.waiting += 1
+        stats.max_waiting = max(stats.max_waiting, stats.waiting)
+        acquired = False
+        try:
+            async with semaphore:
+                acquired = True
+                stats.waiting -= 1
+                stats.running += 1
+                try:
+                    loop = asyncio.get_running_loop()
+                    call = functools.partial(fn, *args, **kwargs)
+                    wrap = call_wrapper.get()
+                    if wrap is not None:
+                        call = wrap(call)
+                    result = await loop.run_in_executor(self._pool, call)
+                except Exception:
+                    stats.failed += 1
+                    raise
+                finally:
+                    stats.running -= 1
+                stats.completed += 1
+                return result
+        finally:
+            if not acquired:
+                stats.waiting -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        operations = {
+            op: {"limit": self.limits.get(op, self.default_limit), **asdict(s)}
+            for op, s in sorted(self._stats.items())
+        }
+        return {
+            "max_workers": self.max_workers,
+            "waiting": sum(s["waiting"] for s in operations.values()),
+            "running": sum(s["running"] for s in operations.values()),
+            "operations": operations,
+        }
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._pool.shutdown(wait=wait)
+
+
+# Shared by every rebase route module
+storage = StorageExecutor()
@@ -0,0 +1,101 @@
+import json
+import time
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+import server
+
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class FanoutResult:
+    delivered: int = 0
+    timed_out: int = 0
+    failed: int = 0
+    dropped: int = 0
+    duration: float = 0.0
+
+    def to_json(self) -> Dict[str, Any]:
+        return {
+            'delivered': self.delivered,
+            'timed_out': self.timed_out,
+            'failed': self.failed,
+            'dropped': self.dropped,
+            'duration_ms': round(self.duration * 1000, 3),
+        }
+
+
+class WebsocketFanout:
+    """
+    Broadcast events to every connected ComfyUI websocket.
+
+    Unlike PromptServer.send_json, the message is encoded once and written
+    to all sockets concurrently, so one slow tab cannot hold up the rest.
+    A write that misses send_timeout keeps running in the background but
+    counts as a strike against its socket; after drop_after consecutive
+    strikes the socket is closed and removed from the server.
+    """
+
+    def __init__(self, send_timeout: float = 2.0, drop_after: int = 3):
+        self.send_timeout = send_timeout
+        self.drop_after = drop_after
+        self._strikes: Dict[str, int] = {}
+
+    async def broadcast(self, event: str, data: Any = None, message: Optional[str] = None) -> FanoutResult:
+        """Send an event to all sockets; pass a pre-encoded message to skip serialization."""
+        if message is None:
+            message = json.dumps({"type": event, "data": data})
+
+        instance = server.PromptServer.instance
+        sockets = list(instance.sockets.items())
+        # Sockets that disconnected on their own never reach _drop
+        for sid in self._strikes.keys() - instance.sockets.keys():
+            del self._strikes[sid]
+        result = FanoutResult()
+        start = time.perf_counter()
+
+        outcomes = await asyncio.gather(*(self._send(sid, ws, message) for sid, ws in sockets))
+        for outcome in outcomes:
+            setattr(result, outcome, getattr(result, outcome) + 1)
+
+        result.duration = time.perf_counter() - start
+        metrics.observe_fanout(event, result)
+        return result
+
+    async def _send(self, sid: str, ws: Any, message: str) -> str:
+        # Shield the write: cancelling it midway could leave a partial frame
+        send = asyncio.ensure_future(ws.send_str(message))
+        send.add_done_callback(lambda t: t.cancelled() or t.exception())
+        try:
+            await asyncio.wait_for(asyncio.shield(send), self.send_timeout)
+        except asyncio.TimeoutError:
+            strikes = self._strikes.get(sid, 0) + 1
+            self._strikes[sid] = strikes
+            if strikes >= self.drop_after:
+                self._drop(sid, ws)
+                return 'dropped'
+            logger.warning(f"Websocket {sid} slow to receive event ({strikes}/{self.drop_after})")
+            return 'timed_out'
+        except Exception as e:
+            # Same policy as ComfyUI: a broken socket is cleaned up by its own handler
+            logger.warning(f"Websocket {sid} send failed: {e}")
+            return 'failed'
+
+        self._strikes.pop(sid, None)
+        return 'delivered'
+
+    def _drop(self, sid: str, ws: Any) -> None:
+        logger.warning(f"Dropping websocket {sid} after {self.drop_after} stalled sends")
+        self._strikes.pop(sid, None)
+        sockets = server.PromptServer.instance.sockets
+        if sockets.get(sid) is ws:
+            del sockets[sid]
+        asyncio.ensure_future(ws.close())
+
+
+fanout = WebsocketFanout()
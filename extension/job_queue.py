@@ -0,0 +1,311 @@
+import json
+import time
+import asyncio
+import logging
+import sqlite3
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import server
+
+from .executor import storage
+from .socket_events import dispatch_event, get_queue_depth
+
+logger = logging.getLogger(__name__)
+
+JOB_STATUSES = ("queued", "dispatching", "dispatched", "failed", "cancelled")
+MAX_COUNT = 8
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    detail TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    created REAL NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, id);
+"""
+
+
+@dataclass
+class Job:
+    id: int
+    detail: Dict[str, Any]
+    count: int
+    status: str
+    attempts: int
+    error: Optional[str]
+    created: float
+    updated: float
+
+    @classmethod
+    def from_row(cls, row: Tuple) -> "Job":
+        id_, detail, count, status, attempts, error, created, updated = row
+        return cls(id_, json.loads(detail), count, status, attempts, error, created, updated)
+
+    def to_json(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "detail": self.detail,
+            "count": self.count,
+            "status": self.status,
+            "attempts": self.attempts,
+            "error": self.error,
+            "created": self.created,
+            "updated": self.updated,
+        }
+
+
+def validate_job(item: Any) -> Tuple[Dict[str, Any], int]:
+    """Check a submitted job, returning (detail, count). Raises ValueError."""
+    if not isinstance(item, dict):
+        raise ValueError("Job must be an object")
+    detail = item.get("detail", {})
+    count = item.get("count", 1)
+    if not isinstance(detail, dict):
+        raise ValueError("Job detail must be an object")
+    if not isinstance(count, int) or isinstance(count, bool) or not 1 <= count <= MAX_COUNT:
+        raise ValueError(f"Job count must be an integer between 1 and {MAX_COUNT}")
+    return detail, count
+
+
+class JobQueue:
+    """
+    Automation jobs (a prompt_replace detail plus a generation count) stored
+    in SQLite so queued work survives a crash of either the client or ComfyUI.
+
+    Jobs move queued -> dispatching -> dispatched, or end up failed or
+    cancelled. A job caught in 'dispatching' by a restart is queued again.
+    """
+
+    _COLUMNS = "id, detail, count, status, attempts, error, created, updated"
+
+    def __init__(self, db_path: Optional[Path] = None):
+        if db_path is None:
+            db_path = Path(__file__).parent.parent / "data" / "jobs.sqlite3"
+        self.db_path = db_path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.db_path), check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+            recovered = conn.execute(
+                "UPDATE jobs SET status = 'queued', updated = ? WHERE status = 'dispatching'",
+                (time.time(),),
+            ).rowcount
+            if recovered:
+                logger.info(f"Requeued {recovered} job(s) interrupted mid-dispatch")
+            self._conn = conn
+        return self._conn
+
+    def submit(self, jobs: List[Tuple[Dict[str, Any], int]]) -> List[int]:
+        """Queue jobs in one transaction; returns their ids in order."""
+        now = time.time()
+        with self._lock:
+            db = self._db()
+            ids = []
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                for detail, count in jobs:
+                    cur = db.execute(
+                        "INSERT INTO jobs (detail, count, status, created, updated) VALUES (?, ?, 'queued', ?, ?)",
+                        (json.dumps(detail), count, now, now),
+                    )
+                    ids.append(cur.lastrowid)
+                db.execute("COMMIT")
+            except Exception:
+                db.execute("ROLLBACK")
+                raise
+            return ids
+
+    def get(self, job_id: int) -> Optional[Job]:
+        with self._lock:
+            row = self._db().execute(f"SELECT {self._COLUMNS} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return Job.from_row(row) if row else None
+
+    def list(self, status: Optional[str] = None, limit: int = 100, offset: int = 0) -> List[Job]:
+        """List jobs oldest first, optionally filtered by status."""
+        query = f"SELECT {self._COLUMNS} FROM jobs"
+        params: List[Any] = []
+        if status is not None:
+            query += " WHERE status = ?"
+            params.append(status)
+        query += " ORDER BY id LIMIT ? OFFSET ?"
+        params += [limit, offset]
+        with self._lock:
+            rows = self._db().execute(query, params).fetchall()
+        return [Job.from_row(row) for row in rows]
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._db().execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        counts = {status: 0 for status in JOB_STATUSES}
+        counts.update(dict(rows))
+        return counts
+
+    def claim_next(self) -> Optional[Job]:
+        """Mark the oldest queued job as dispatching and return it."""
+        with self._lock:
+            db = self._db()
+            row = db.execute(
+                f"SELECT {self._COLUMNS} FROM jobs WHERE status = 'queued' ORDER BY id LIMIT 1"
+            ).fetchone()
+            if row is None:
+                return None
+            job = Job.from_row(row)
+            job.status, job.attempts, job.updated = "dispatching", job.attempts + 1, time.time()
+            db.execute(
+                "UPDATE jobs SET status = ?, attempts = ?, updated = ? WHERE id = ?",
+                (job.status, job.attempts, job.updated, job.id),
+            )
+            return job
+
+    def _transition(self, job_id: int, status: str, from_statuses: Tuple[str, ...], error: Optional[str] = None) -> bool:
+        placeholders = ", ".join("?" for _ in from_statuses)
+        with self._lock:
+            cur = self._db().execute(
+                f"UPDATE jobs SET status = ?, error = ?, updated = ? WHERE id = ? AND status IN ({placeholders})",
+                (status, error, time.time(), job_id, *from_statuses),
+            )
+            return cur.rowcount > 0
+
+    def mark_dispatched(self, job_id: int) -> bool:
+        return self._transition(job_id, "dispatched", ("dispatching",))
+
+    def mark_failed(self, job_id: int, error: str) -> bool:
+        return self._transition(job_id, "failed", ("dispatching",), error)
+
+    def cancel(self, job_id: int) -> bool:
+        """Cancel a job that has not been dispatched yet."""
+        return self._transition(job_id, "cancelled", ("queued",))
+
+    def retry(self, job_id: int) -> bool:
+        """Queue a failed, cancelled or already dispatched job again."""
+        return self._transition(job_id, "queued", ("failed", "cancelled", "dispatched"))
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+class JobDispatcher:
+    """
+    Background task that feeds queued jobs to the browser as ComfyUI's
+    queue drains.
+
+    A job is sent as a prompt_replace followed by a generate whenever a
+    browser is connected and the queue is below target_depth. As with
+    pkg.client.QueuePacer, generations that have been forwarded but not yet
+    counted in the server's 'submitted' counter are treated as in transit
+    for up to settle_timeout seconds.
+    """
+
+    def __init__(
+        self,
+        queue: JobQueue,
+        target_depth: int = 2,
+        poll_interval: float = 0.5,
+        settle_timeout: float = 15.0,
+    ):
+        self.queue = queue
+        self.target_depth = target_depth
+        self.poll_interval = poll_interval
+        self.settle_timeout = settle_timeout
+        self._expected_submitted: Optional[int] = None
+        self._submitted_at = 0.0
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> None:
+        if not self.running:
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def wake(self) -> None:
+        """Check for work now instead of at the next poll."""
+        self.start()
+        self._wakeup.set()
+
+    def depth(self) -> int:
+        """Current queue depth plus generations still in transit from the browser."""
+        status = get_queue_depth()
+        submitted = status.get("submitted")
+        in_transit = 0
+        if self._expected_submitted is not None and submitted is not None:
+            if time.monotonic() - self._submitted_at < self.settle_timeout:
+                in_transit = max(0, self._expected_submitted - submitted)
+        return status["remaining"] + in_transit
+
+    def _record_submitted(self, count: int) -> None:
+        submitted = get_queue_depth().get("submitted")
+        if submitted is None:
+            return
+        base = submitted
+        if self._expected_submitted is not None and time.monotonic() - self._submitted_at < self.settle_timeout:
+            base = max(base, self._expected_submitted)
+        self._expected_submitted = base + count
+        self._submitted_at = time.monotonic()
+
+    async def dispatch_next(self) -> bool:
+        """Send one job if there is room for it; returns whether a job was claimed."""
+        if not server.PromptServer.instance.sockets or self.depth() >= self.target_depth:
+            return False
+        job = await storage.run("jobs.claim", self.queue.claim_next)
+        if job is None:
+            return False
+
+        try:
+            await dispatch_event("prompt_replace", job.detail)
+            result = await dispatch_event("generate", {"count": job.count})
+        except Exception as e:
+            logger.warning(f"Dispatching job {job.id} failed: {e}")
+            await storage.run("jobs.update", self.queue.mark_failed, job.id, str(e))
+            return True
+
+        if not result.delivered:
+            await storage.run("jobs.update", self.queue.mark_failed, job.id, "Job was not delivered to any browser")
+            return True
+
+        self._record_submitted(job.count)
+        await storage.run("jobs.update", self.queue.mark_dispatched, job.id)
+        return True
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                if await self.dispatch_next():
+                    continue
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Job dispatcher error: {e}")
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
@@ -0,0 +1,70 @@
+import copy
+import json
+import hashlib
+from typing import Any, Dict
+
+
+def canonical_json(value: Any) -> str:
+    """Serialize value the same way regardless of key order or whitespace."""
+    return json.dumps(value, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+
+
+def content_hash(value: Any) -> str:
+    """sha256 of the canonical JSON form; equal payloads always hash the same."""
+    return hashlib.sha256(canonical_json(value).encode("utf-8")).hexdigest()
+
+
+def _same(a: Any, b: Any) -> bool:
+    # Plain == treats 1, 1.0 and True as equal, which JSON does not
+    return type(a) is type(b) and canonical_json(a) == canonical_json(b)
+
+
+def make_delta(src: Any, dst: Any) -> Dict[str, Any]:
+    """
+    Describe how to turn src into dst.
+
+    Objects are compared key by key and nested objects are patched
+    recursively; any other changed value is stored whole. An empty delta
+    means the two values are identical.
+    """
+    if not (isinstance(src, dict) and isinstance(dst, dict)):
+        return {} if _same(src, dst) else {"$replace": dst}
+
+    unset = [key for key in src if key not in dst]
+    set_: Dict[str, Any] = {}
+    patch: Dict[str, Any] = {}
+    for key, value in dst.items():
+        if key not in src:
+            set_[key] = value
+        elif isinstance(src[key], dict) and isinstance(value, dict):
+            sub = make_delta(src[key], value)
+            if sub:
+                patch[key] = sub
+        elif not _same(src[key], value):
+            set_[key] = value
+
+    delta: Dict[str, Any] = {}
+    if set_:
+        delta["$set"] = set_
+    if unset:
+        delta["$unset"] = unset
+    if patch:
+        delta["$patch"] = patch
+    return delta
+
+
+def apply_delta(src: Any, delta: Dict[str, Any]) -> Any:
+    """Apply a delta from make_delta without modifying src."""
+    if "$replace" in delta:
+        return copy.deepcopy(delta["$replace"])
+    if not delta:
+        return copy.deepcopy(src)
+
+    result = dict(src)
+    for key in delta.get("$unset", ()):
+        result.pop(key, None)
+    for key, value in delta.get("$set", {}).items():
+        result[key] = copy.deepcopy(value)
+    for key, sub in delta.get("$patch", {}).items():
+        result[key] = apply_delta(result.get(key, {}), sub)
+    return result
@@ -0,0 +1,151 @@
+import os
+import json
+import time
+import logging
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from .dir_index import RACY_WINDOW_NS
+from .record_codecs import decode
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = ".manifest.json"
+MANIFEST_VERSION = 1
+
+Summarizer = Callable[[Path, Dict[str, Any]], Dict[str, Any]]
+
+
+class DirectoryManifest:
+    """
+    Persistent listing metadata for a directory of JSON records.
+
+    The manifest stores a small summary per file together with the file's
+    size and mtime. Saves and deletes update it incrementally; files added,
+    changed or removed behind our back are picked up by comparing directory
+    entries against the manifest, and only those files are parsed again.
+    While the directory mtime is unchanged only the known files are stat'ed,
+    which still catches records rewritten in place.
+    """
+
+    def __init__(self, directory: Path, summarize: Summarizer):
+        self.directory = directory
+        self.path = directory / MANIFEST_NAME
+        self.summarize = summarize
+        self._entries: Optional[Dict[str, Dict[str, Any]]] = None
+        self._dir_mtime_ns: Optional[int] = None
+        self._lock = threading.RLock()
+
+    def record(self, filename: str, data: Dict[str, Any]) -> None:
+        """Add or replace the entry for a file that was just written."""
+        with self._lock:
+            entries = self._load()
+            filepath = self.directory / filename
+            entries[filename] = self._make_entry(filepath, os.stat(filepath), data)
+            self._save()
+
+    def remove(self, filename: str) -> None:
+        """Drop the entry for a deleted file."""
+        with self._lock:
+            entries = self._load()
+            if entries.pop(filename, None) is not None:
+                self._save()
+
+    def summaries(self) -> List[Dict[str, Any]]:
+        """Return the summary of every readable file, reconciling with disk first."""
+        with self._lock:
+            self._sync()
+            return [
+                {"filename": filename, **entry["summary"]}
+                for filename, entry in self._entries.items()
+                if entry["summary"] is not None
+            ]
+
+    def _make_entry(self, filepath: Path, st: os.stat_result, data: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        return {
+            "mtime_ns": st.st_mtime_ns,
+            "size": st.st_size,
+            "summary": self.summarize(filepath, data) if data is not None else None,
+        }
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        if self._entries is not None:
+            return self._entries
+
+        self._entries = {}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+            if manifest.get("version") == MANIFEST_VERSION:
+                self._entries = manifest.get("entries", {})
+        except FileNotFoundError:
+            pass
+        except (json.JSONDecodeError, IOError, AttributeError) as e:
+            logger.warning(f"Warning: Rebuilding unreadable manifest {self.path}: {e}")
+        return self._entries
+
+    def _save(self) -> None:
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"version": MANIFEST_VERSION, "entries": self._entries}, f)
+        os.replace(tmp_path, self.path)
+        # Our own write changes the directory mtime, so force a check next time
+        self._dir_mtime_ns = None
+
+    def _known_files_changed(self, entries: Dict[str, Dict[str, Any]]) -> bool:
+        # Rewriting a file in place leaves the directory mtime alone
+        for name, entry in entries.items():
+            try:
+                st = os.stat(self.directory / name)
+            except FileNotFoundError:
+                return True
+            if entry["mtime_ns"] != st.st_mtime_ns or entry["size"] != st.st_size:
+                return True
+        return False
+
+    def _sync(self) -> None:
+        entries = self._load()
+        dir_mtime_ns = os.stat(self.directory).st_mtime_ns
+        if dir_mtime_ns == self._dir_mtime_ns and not self._known_files_changed(entries):
+            return
+
+        changed = False
+        seen = set()
+        with os.scandir(self.directory) as it:
+            for dir_entry in it:
+                name = dir_entry.name
+                if not name.endswith(".json") or name == MANIFEST_NAME or not dir_entry.is_file():
+                    continue
+                seen.add(name)
+
+                st = dir_entry.stat()
+                entry = entries.get(name)
+                if entry is not None and entry["mtime_ns"] == st.st_mtime_ns and entry["size"] == st.st_size:
+                    continue
+
+                filepath = Path(dir_entry.path)
+                try:
+                    with open(filepath, 'rb') as f:
+                        data = decode(f.read())
+                except (ValueError, IOError) as e:
+                    logger.warning(f"Warning: Could not read file {filepath}: {e}")
+                    data = None
+                if not isinstance(data, dict):
+                    # Remember unusable files so they are not parsed on every listing
+                    data = None
+                entries[name] = self._make_entry(filepath, st, data)
+                changed = True
+
+        for name in set(entries) - seen:
+            del entries[name]
+            changed = True
+
+        if changed:
+            self._save()
+            dir_mtime_ns = os.stat(self.directory).st_mtime_ns
+
+        # Only trust the directory mtime once it is old enough that a change
+        # within the same timestamp tick can no longer go unnoticed.
+        if time.time_ns() - dir_mtime_ns > RACY_WINDOW_NS:
+            self._dir_mtime_ns = dir_mtime_ns
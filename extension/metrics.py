@@ -0,0 +1,224 @@
+import time
+import asyncio
+from bisect import bisect_left
+from typing import Any, Dict, List, Sequence, Tuple
+
+from aiohttp import web
+
+from .executor import storage
+
+# Upper bounds in seconds; the +Inf bucket is implied
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus layout."""
+
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        # Stored per bucket and accumulated on export, so observing stays O(log n)
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> List[Tuple[str, int]]:
+        total = 0
+        rows = []
+        for bound, count in zip(self.buckets, self.counts):
+            total += count
+            rows.append((_format_float(bound), total))
+        rows.append(("+Inf", self.count))
+        return rows
+
+
+class RebaseMetrics:
+    """
+    Request and fan-out metrics for the rebase sub-app.
+
+    Everything runs on the event loop, so the counters are plain dicts
+    keyed by label tuples; recording a request is a few dict lookups and
+    one bisect. Routes are labelled by their pattern (e.g.
+    /rebase/diff/load/{filename}), which keeps the label set bounded.
+    """
+
+    def __init__(self, buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.started = time.time()
+        self.requests: Dict[Tuple[str, str, str], int] = {}
+        self.latency: Dict[Tuple[str, str], Histogram] = {}
+        self.response_bytes: Dict[Tuple[str, str], int] = {}
+        self.in_flight = 0
+        self.fanout_latency: Dict[str, Histogram] = {}
+        self.fanout_sockets: Dict[Tuple[str, str], int] = {}
+
+    def observe_request(self, method: str, route: str, status: int, duration: float, size: int) -> None:
+        key = (method, route, str(status))
+        self.requests[key] = self.requests.get(key, 0) + 1
+        route_key = (method, route)
+        histogram = self.latency.get(route_key)
+        if histogram is None:
+            histogram = self.latency[route_key] = Histogram(self.buckets)
+        histogram.observe(duration)
+        if size:
+            self.response_bytes[route_key] = self.response_bytes.get(route_key, 0) + size
+
+    def observe_fanout(self, event: str, result: Any) -> None:
+        """Record one WebsocketFanout.broadcast; result is its FanoutResult."""
+        histogram = self.fanout_latency.get(event)
+        if histogram is None:
+            histogram = self.fanout_latency[event] = Histogram(self.buckets)
+        histogram.observe(result.duration)
+        for outcome in ("delivered", "timed_out", "failed", "dropped"):
+            count = getattr(result, outcome)
+            if count:
+                key = (event, outcome)
+                self.fanout_sockets[key] = self.fanout_sockets.get(key, 0) + count
+
+    def render(self) -> str:
+        """Export everything in the Prometheus text exposition format."""
+        lines: List[str] = []
+
+        _header(lines, "rebase_http_requests_total", "counter", "Requests handled by the rebase routes.")
+        for (method, route, status), value in sorted(self.requests.items()):
+            lines.append(f"rebase_http_requests_total{_labels(method=method, route=route, status=status)} {value}")
+
+        _header(lines, "rebase_http_request_duration_seconds", "histogram",
+                "Time from receiving a request until its response headers are sent, or a streamed body is complete.")
+        for (method, route), histogram in sorted(self.latency.items()):
+            _histogram(lines, "rebase_http_request_duration_seconds", histogram, method=method, route=route)
+
+        _header(lines, "rebase_http_response_bytes_total", "counter", "Response body bytes written.")
+        for (method, route), value in sorted(self.response_bytes.items()):
+            lines.append(f"rebase_http_response_bytes_total{_labels(method=method, route=route)} {value}")
+
+        _header(lines, "rebase_http_requests_in_flight", "gauge", "Requests currently being handled.")
+        lines.append(f"rebase_http_requests_in_flight {self.in_flight}")
+
+        _header(lines, "rebase_fanout_duration_seconds", "histogram",
+                "Time to write one event to every connected websocket.")
+        for event, histogram in sorted(self.fanout_latency.items()):
+            _histogram(lines, "rebase_fanout_duration_seconds", histogram, event=event)
+
+        _header(lines, "rebase_fanout_sockets_total", "counter", "Websocket writes by outcome.")
+        for (event, outcome), value in sorted(self.fanout_sockets.items()):
+            lines.append(f"rebase_fanout_sockets_total{_labels(event=event, outcome=outcome)} {value}")
+
+        storage_stats = storage.stats()
+        _header(lines, "rebase_storage_waiting", "gauge", "Storage operations waiting for a slot.")
+        for op, s in storage_stats["operations"].items():
+            lines.append(f"rebase_storage_waiting{_labels(op=op)} {s['waiting']}")
+        _header(lines, "rebase_storage_running", "gauge", "Storage operations running on the thread pool.")
+        for op, s in storage_stats["operations"].items():
+            lines.append(f"rebase_storage_running{_labels(op=op)} {s['running']}")
+
+        _header(lines, "rebase_start_time_seconds", "gauge", "When the metrics started being collected.")
+        lines.append(f"rebase_start_time_seconds {self.started:.3f}")
+        return "\n".join(lines) + "\n"
+
+
+def _format_float(value: float) -> str:
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(**labels: str) -> str:
+    return "{" + ",".join(f'{k}="{_escape(str(v))}"' for k, v in labels.items()) + "}"
+
+
+def _header(lines: List[str], name: str, kind: str, help_text: str) -> None:
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} {kind}")
+
+
+def _histogram(lines: List[str], name: str, histogram: Histogram, **labels: str) -> None:
+    for bound, count in histogram.cumulative():
+        lines.append(f"{name}_bucket{_labels(**labels, le=bound)} {count}")
+    lines.append(f"{name}_sum{_labels(**labels)} {histogram.sum:.6f}")
+    lines.append(f"{name}_count{_labels(**labels)} {histogram.count}")
+
+
+def _route_label(request: web.Request) -> str:
+    route = request.match_info.route
+    resource = getattr(route, "resource", None)
+    if resource is None:
+        # 404/405: keep unmatched paths out of the labels
+        return "unmatched"
+    return resource.canonical
+
+
+# Set on a request whose response aiohttp prepares after the middleware returned
+# (older aiohttp versions have no RequestKey and take plain string keys)
+PENDING_KEY = (
+    web.RequestKey("rebase_metrics_pending", float) if hasattr(web, "RequestKey") else "rebase_metrics_pending"
+)
+
+
+def _observe(request: web.Request, start: float, status: int, size: int) -> None:
+    metrics.observe_request(
+        request.method, _route_label(request), status, time.perf_counter() - start,
+        0 if request.method == "HEAD" else size,
+    )
+
+
+@web.middleware
+async def metrics_middleware(request: web.Request, handler) -> web.StreamResponse:
+    """
+    Time each request until its response is on its way.
+
+    A handler that streams (SSE, StreamResponse) is timed until it returns.
+    Other responses are written by aiohttp after the middleware returns, so
+    they are timed in record_prepared_response, when their headers go out;
+    FileResponse then streams its body with sendfile.
+    """
+    start = time.perf_counter()
+    metrics.in_flight += 1
+    try:
+        response = await handler(request)
+    except web.HTTPException as e:
+        _observe(request, start, e.status, 0)
+        raise
+    except asyncio.CancelledError:
+        # Client went away; 499 as in nginx
+        _observe(request, start, 499, 0)
+        raise
+    except BaseException:
+        _observe(request, start, 500, 0)
+        raise
+    finally:
+        metrics.in_flight -= 1
+
+    if response.prepared:
+        _observe(request, start, response.status, response.body_length)
+    else:
+        request[PENDING_KEY] = start
+    return response
+
+
+async def record_prepared_response(request: web.Request, response: web.StreamResponse) -> None:
+    """on_response_prepare handler completing the samples metrics_middleware left pending."""
+    start = request.pop(PENDING_KEY, None)
+    if start is None:
+        return
+    # Known for plain and file responses at this point; sendfile bypasses the writer's count
+    size = response.content_length
+    _observe(request, start, response.status, size or 0)
+
+
+async def metrics_route(request):
+    """Request, fan-out and storage metrics in Prometheus text format"""
+    return web.Response(body=metrics.render().encode("utf-8"), headers={"Content-Type": CONTENT_TYPE})
+
+
+metrics = RebaseMetrics()
@@ -0,0 +1,230 @@
+import io
+import os
+import re
+import json
+import time
+import pstats
+import logging
+import cProfile
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from aiohttp import web
+
+from .executor import storage, call_wrapper
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = "X-Rebase-Profile"
+PROFILE_NAME = re.compile(r"^\d+_[A-Z]+_[A-Za-z0-9_.-]+\.prof$")
+
+
+class RequestProfile:
+    """
+    cProfile data for one request: the handler on the event loop, plus
+    every call it sends to the storage thread pool.
+    """
+
+    def __init__(self):
+        self.loop_profile = cProfile.Profile()
+        self.worker_profiles: List[cProfile.Profile] = []
+        self._lock = threading.Lock()
+
+    def wrap(self, call: Callable[[], Any]) -> Callable[[], Any]:
+        def profiled() -> Any:
+            profile = cProfile.Profile()
+            try:
+                profile.enable()
+            except ValueError:
+                # Another profiler owns this interpreter; run unprofiled
+                return call()
+            try:
+                return call()
+            finally:
+                profile.disable()
+                with self._lock:
+                    self.worker_profiles.append(profile)
+        return profiled
+
+    def stats(self) -> pstats.Stats:
+        stats = pstats.Stats(self.loop_profile)
+        with self._lock:
+            for profile in self.worker_profiles:
+                stats.add(profile)
+        return stats
+
+
+class RequestProfiler:
+    """
+    Opt-in cProfile capture of single rebase requests.
+
+    A request is profiled when it asks for it (X-Rebase-Profile: 1 or
+    ?profile=1) and its route pattern is in the server-side allowlist
+    (REBASE_PROFILE_ROUTES, comma-separated, '*' for every route; empty
+    disables profiling). Only one request is profiled at a time, since the
+    event-loop profile also sees whatever else the loop runs meanwhile;
+    other requests are served normally with "X-Rebase-Profile: busy".
+
+    Profiles are pstats dumps in data/profiles/, one JSON sidecar each,
+    and only the newest `keep` are kept.
+    """
+
+    def __init__(self, directory: Optional[Path] = None, allowed: Optional[List[str]] = None, keep: int = 50):
+        if directory is None:
+            directory = Path(__file__).parent.parent / "data" / "profiles"
+        if allowed is None:
+            allowed = [r.strip() for r in os.environ.get("REBASE_PROFILE_ROUTES", "").split(",") if r.strip()]
+        self.directory = directory
+        self.allowed = set(allowed)
+        self.keep = keep
+        self._active = False
+
+    def allows(self, route: str) -> bool:
+        return "*" in self.allowed or route in self.allowed
+
+    @staticmethod
+    def requested(request: web.Request) -> bool:
+        flag = request.headers.get(PROFILE_HEADER) or request.query.get("profile")
+        return flag is not None and flag.lower() in ("1", "true", "yes")
+
+    def _save(self, profile: RequestProfile, meta: Dict[str, Any]) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        profile.stats().dump_stats(str(self.directory / meta["filename"]))
+        with open(self.directory / (meta["filename"] + ".json"), 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+
+        for old in self._list()[self.keep:]:
+            for path in (self.directory / old["filename"], self.directory / (old["filename"] + ".json")):
+                try:
+                    path.unlink()
+                except OSError:
+                    pass
+
+    def _list(self) -> List[Dict[str, Any]]:
+        profiles = []
+        if not self.directory.is_dir():
+            return profiles
+        for sidecar in self.directory.glob("*.prof.json"):
+            try:
+                with open(sidecar, 'r', encoding='utf-8') as f:
+                    profiles.append(json.load(f))
+            except (ValueError, IOError):
+                continue
+        profiles.sort(key=lambda p: p["created"], reverse=True)
+        return profiles
+
+    async def profile(self, request: web.Request, handler, route: str) -> web.StreamResponse:
+        if self._active:
+            response = await handler(request)
+            response.headers[PROFILE_HEADER] = "busy"
+            return response
+
+        profile = RequestProfile()
+        try:
+            profile.loop_profile.enable()
+        except ValueError:
+            # Another profiler owns this interpreter
+            response = await handler(request)
+            response.headers[PROFILE_HEADER] = "busy"
+            return response
+
+        self._active = True
+        token = call_wrapper.set(profile.wrap)
+        created = time.time()
+        start = time.perf_counter()
+        status = 500
+        try:
+            try:
+                response = await handler(request)
+            finally:
+                profile.loop_profile.disable()
+            status = response.status
+        except web.HTTPException as e:
+            status = e.status
+            raise
+        finally:
+            duration = time.perf_counter() - start
+            call_wrapper.reset(token)
+            self._active = False
+
+            slug = re.sub(r"[^A-Za-z0-9]+", "_", route).strip("_") or "root"
+            meta = {
+                "filename": f"{int(created * 1000)}_{request.method}_{slug}.prof",
+                "route": route,
+                "method": request.method,
+                "path": request.path_qs,
+                "status": status,
+                "created": created,
+                "duration_ms": round(duration * 1000, 3),
+            }
+            try:
+                await storage.run("profiles.save", self._save, profile, meta)
+            except Exception as e:
+                logger.error(f"Failed to save profile for {request.path}: {e}")
+                meta = None
+
+        if meta is not None:
+            response.headers[PROFILE_HEADER] = meta["filename"]
+        return response
+
+    async def list(self) -> List[Dict[str, Any]]:
+        return await storage.run("profiles.list", self._list)
+
+    def path_of(self, filename: str) -> Optional[Path]:
+        if not PROFILE_NAME.match(filename):
+            return None
+        path = self.directory / filename
+        return path if path.is_file() else None
+
+
+def _route_pattern(request: web.Request) -> Optional[str]:
+    resource = getattr(request.match_info.route, "resource", None)
+    return resource.canonical if resource is not None else None
+
+
+@web.middleware
+async def profiling_middleware(request: web.Request, handler) -> web.StreamResponse:
+    """Profile requests that ask for it, when their route is allowlisted"""
+    if not profiler.allowed or not profiler.requested(request):
+        return await handler(request)
+    route = _route_pattern(request)
+    if route is None or not profiler.allows(route):
+        return await handler(request)
+    return await profiler.profile(request, handler, route)
+
+
+async def list_profiles_route(request):
+    """List saved request profiles, newest first"""
+    return web.json_response({
+        "enabled": bool(profiler.allowed),
+        "routes": sorted(profiler.allowed),
+        "profiles": await profiler.list(),
+    })
+
+
+def _profile_text(path: Path, sort: str, limit: int) -> str:
+    out = io.StringIO()
+    pstats.Stats(str(path), stream=out).sort_stats(sort).print_stats(limit)
+    return out.getvalue()
+
+
+async def get_profile_route(request):
+    """Download a profile (pstats format), or ?format=text for a readable summary"""
+    path = profiler.path_of(request.match_info["filename"])
+    if path is None:
+        return web.json_response({"error": "Profile not found"}, status=404)
+
+    if request.query.get("format") == "text":
+        sort = request.query.get("sort", "cumulative")
+        try:
+            limit = int(request.query.get("limit", "50"))
+            text = await storage.run("profiles.load", _profile_text, path, sort, limit)
+        except (ValueError, KeyError) as e:
+            return web.json_response({"error": f"Invalid parameters: {e}"}, status=400)
+        return web.Response(text=text)
+
+    return web.FileResponse(path, headers={"Content-Disposition": f'attachment; filename="{path.name}"'})
+
+
+profiler = RequestProfiler()
@@ -0,0 +1,90 @@
+import os
+import gzip
+import json
+import zlib
+import logging
+from typing import Any, Callable, Dict
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+GZIP_MAGIC = b"\x1f\x8b"
+DEFAULT_CODEC = "compact"
+
+
+def _dumps_compact(value: Any) -> bytes:
+    if orjson is not None:
+        try:
+            return orjson.dumps(value)
+        except TypeError:
+            # Non-string keys or integers beyond 64 bits; the stdlib copes
+            pass
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def _loads_json(data: bytes) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+class Codec:
+    """Turns a stored record into bytes and back."""
+
+    def __init__(self, name: str, encode: Callable[[Any], bytes]):
+        self.name = name
+        self.encode = encode
+
+    def __repr__(self) -> str:
+        return f"Codec({self.name!r})"
+
+
+CODECS: Dict[str, Codec] = {
+    # Pretty-printed JSON, as records were written before codecs existed
+    "json": Codec("json", lambda value: json.dumps(value, indent=2).encode("utf-8")),
+    "compact": Codec("compact", _dumps_compact),
+    "gzip": Codec("gzip", lambda value: gzip.compress(_dumps_compact(value), compresslevel=6, mtime=0)),
+}
+
+
+def get_codec(name: str) -> Codec:
+    try:
+        return CODECS[name]
+    except KeyError:
+        raise ValueError(f"Unknown codec: {name} (expected one of {', '.join(CODECS)})") from None
+
+
+def default_codec() -> Codec:
+    """The codec selected with REBASE_STORAGE_CODEC (default 'compact')."""
+    return get_codec(os.environ.get("REBASE_STORAGE_CODEC", DEFAULT_CODEC))
+
+
+def codec_of(data: bytes) -> str:
+    """
+    Name the codec a stored record was written with. Gzip records carry the
+    gzip magic number; every other codec writes plain JSON, which any of
+    them can read, so those are reported as 'json'.
+    """
+    return "gzip" if data[:2] == GZIP_MAGIC else "json"
+
+
+def decode(data: bytes) -> Any:
+    """
+    Decode a record written by any codec. Truncated or corrupt records
+    raise ValueError, whichever layer noticed.
+    """
+    if data[:2] == GZIP_MAGIC:
+        try:
+            data = gzip.decompress(data)
+        except (EOFError, zlib.error, gzip.BadGzipFile) as e:
+            raise ValueError(f"Corrupt gzip record: {e}") from e
+    return _loads_json(data)
+
+
+def fast_json_backend() -> str:
+    """Name of the JSON implementation in use, for reporting."""
+    return "orjson" if orjson is not None else "json"
@@ -0,0 +1,303 @@
+import os
+import json
+import time
+import logging
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from .manifest import DirectoryManifest, MANIFEST_NAME, Summarizer
+from .record_codecs import Codec, decode, default_codec
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ("files", "sqlite")
+
+
+def name_key(name: str) -> str:
+    """Form of a record name that case-insensitive prefix search compares."""
+    return str(name).casefold()
+
+
+class RecordStore(ABC):
+    """
+    Storage for named JSON records (saved diffs and remaps).
+
+    Records are addressed by filename, e.g. 'My_Diff_1700000000.json', so
+    the route contract is the same whichever backend is configured.
+    Listings are summaries, newest first, optionally filtered by a
+    case-insensitive name prefix (compared as name_key) and paginated.
+    """
+
+    @abstractmethod
+    def save(self, filename: str, record: Dict[str, Any]) -> None:
+        ...
+
+    @abstractmethod
+    def load(self, filename: str) -> Dict[str, Any]:
+        """Return the full record. Raises FileNotFoundError if it does not exist."""
+
+    @abstractmethod
+    def delete(self, filename: str) -> bool:
+        ...
+
+    @abstractmethod
+    def list(self, limit: Optional[int] = None, offset: int = 0, prefix: Optional[str] = None) -> List[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    def count(self, prefix: Optional[str] = None) -> int:
+        ...
+
+
+class FileRecordStore(RecordStore):
+    """One file per record, written with the configured codec and listed through a DirectoryManifest."""
+
+    def __init__(self, directory: Path, summarize: Summarizer, codec: Optional[Codec] = None):
+        self.directory = directory
+        self.codec = codec or default_codec()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._manifest = DirectoryManifest(directory, summarize)
+
+    def save(self, filename: str, record: Dict[str, Any]) -> None:
+        # A record can hold a whole version chain, so never leave it half-written
+        filepath = self.directory / filename
+        tmp_path = filepath.with_name(filepath.name + ".tmp")
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(self.codec.encode(record))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, filepath)
+        except BaseException:
+            try:
+                tmp_path.unlink()
+            except OSError:
+                pass
+            raise
+        self._manifest.record(filename, record)
+
+    def load(self, filename: str) -> Dict[str, Any]:
+        filepath = self.directory / filename
+        if not filepath.exists():
+            raise FileNotFoundError(filename)
+        with open(filepath, 'rb') as f:
+            return decode(f.read())
+
+    def delete(self, filename: str) -> bool:
+        filepath = self.directory / filename
+        if not filepath.exists():
+            return False
+        try:
+            filepath.unlink()
+            self._manifest.remove(filename)
+            return True
+        except OSError:
+            return False
+
+    def _matching(self, prefix: Optional[str]) -> List[Dict[str, Any]]:
+        summaries = self._manifest.summaries()
+        if prefix:
+            folded = name_key(prefix)
+            summaries = [s for s in summaries if name_key(s["name"]).startswith(folded)]
+        return summaries
+
+    def list(self, limit: Optional[int] = None, offset: int = 0, prefix: Optional[str] = None) -> List[Dict[str, Any]]:
+        summaries = self._matching(prefix)
+        # Sort by creation time, newest first
+        summaries.sort(key=lambda x: x["created"], reverse=True)
+        end = None if limit is None else offset + limit
+        return summaries[offset:end]
+
+    def count(self, prefix: Optional[str] = None) -> int:
+        return len(self._matching(prefix))
+
+
+class SqliteRecordStore(RecordStore):
+    """
+    All records of one kind in a table of a shared SQLite database.
+
+    The listing summary is stored next to the record, so listings never
+    decode full records. name_key and created are indexed for prefix
+    search and newest-first pagination; name_key is filled in Python
+    because SQLite's NOCASE only folds ASCII.
+    """
+
+    def __init__(self, db_path: Path, table: str, summarize: Summarizer, codec: Optional[Codec] = None):
+        if not table.isidentifier():
+            raise ValueError(f"Invalid table name: {table}")
+        self.db_path = db_path
+        self.table = table
+        self.summarize = summarize
+        self.codec = codec or default_codec()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.db_path), check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(f"""
+                CREATE TABLE IF NOT EXISTS {self.table} (
+                    filename TEXT PRIMARY KEY,
+                    name TEXT NOT NULL,
+                    name_key TEXT NOT NULL,
+                    created REAL NOT NULL,
+                    summary TEXT NOT NULL,
+                    data BLOB NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS migrations (source TEXT PRIMARY KEY, migrated REAL NOT NULL);
+            """)
+            self._add_name_key(conn)
+            conn.executescript(f"""
+                DROP INDEX IF EXISTS {self.table}_name;
+                CREATE INDEX IF NOT EXISTS {self.table}_name_key ON {self.table} (name_key);
+                CREATE INDEX IF NOT EXISTS {self.table}_created ON {self.table} (created);
+            """)
+            self._conn = conn
+        return self._conn
+
+    def _add_name_key(self, conn: sqlite3.Connection) -> None:
+        """Upgrade a table created before name_key existed."""
+        columns = [row[1] for row in conn.execute(f"PRAGMA table_info({self.table})")]
+        if "name_key" in columns:
+            return
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(f"ALTER TABLE {self.table} ADD COLUMN name_key TEXT NOT NULL DEFAULT ''")
+            rows = conn.execute(f"SELECT filename, name FROM {self.table}").fetchall()
+            conn.executemany(
+                f"UPDATE {self.table} SET name_key = ? WHERE filename = ?",
+                [(name_key(name), filename) for filename, name in rows],
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _row(self, filepath: Path, record: Dict[str, Any]) -> tuple:
+        summary = self.summarize(filepath, record)
+        name = str(summary["name"])
+        return (filepath.name, name, name_key(name), summary["created"], json.dumps(summary), self.codec.encode(record))
+
+    def save(self, filename: str, record: Dict[str, Any]) -> None:
+        row = self._row(Path(filename), record)
+        with self._lock:
+            self._db().execute(
+                f"INSERT OR REPLACE INTO {self.table} (filename, name, name_key, created, summary, data) VALUES (?, ?, ?, ?, ?, ?)",
+                row,
+            )
+
+    def load(self, filename: str) -> Dict[str, Any]:
+        with self._lock:
+            row = self._db().execute(f"SELECT data FROM {self.table} WHERE filename = ?", (filename,)).fetchone()
+        if row is None:
+            raise FileNotFoundError(filename)
+        data = row[0]
+        return decode(data.encode("utf-8") if isinstance(data, str) else data)
+
+    def delete(self, filename: str) -> bool:
+        with self._lock:
+            cur = self._db().execute(f"DELETE FROM {self.table} WHERE filename = ?", (filename,))
+        return cur.rowcount > 0
+
+    @staticmethod
+    def _prefix_clause(prefix: Optional[str]) -> tuple:
+        if not prefix:
+            return "", []
+        # A range on name_key can always use its index, unlike LIKE
+        folded = name_key(prefix)
+        return " WHERE name_key >= ? AND name_key < ?", [folded, folded + "\U0010ffff"]
+
+    def list(self, limit: Optional[int] = None, offset: int = 0, prefix: Optional[str] = None) -> List[Dict[str, Any]]:
+        where, params = self._prefix_clause(prefix)
+        query = f"SELECT filename, summary FROM {self.table}{where} ORDER BY created DESC, filename LIMIT ? OFFSET ?"
+        params += [-1 if limit is None else limit, offset]
+        with self._lock:
+            rows = self._db().execute(query, params).fetchall()
+        return [{"filename": filename, **json.loads(summary)} for filename, summary in rows]
+
+    def count(self, prefix: Optional[str] = None) -> int:
+        where, params = self._prefix_clause(prefix)
+        with self._lock:
+            return self._db().execute(f"SELECT COUNT(*) FROM {self.table}{where}", params).fetchone()[0]
+
+    def migrate_directory(self, directory: Path) -> int:
+        """
+        Import the JSON files of a file-backed store, once per directory.
+        The files are left in place; returns the number of records imported.
+        """
+        source = f"{self.table}:{directory.resolve()}"
+        with self._lock:
+            db = self._db()
+            if db.execute("SELECT 1 FROM migrations WHERE source = ?", (source,)).fetchone():
+                return 0
+
+            rows = []
+            if directory.is_dir():
+                for filepath in sorted(directory.glob("*.json")):
+                    if filepath.name == MANIFEST_NAME:
+                        continue
+                    try:
+                        with open(filepath, 'rb') as f:
+                            record = decode(f.read())
+                    except (ValueError, IOError) as e:
+                        logger.warning(f"Skipping unreadable file {filepath} during migration: {e}")
+                        continue
+                    if isinstance(record, dict):
+                        rows.append(self._row(filepath, record))
+
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                db.executemany(
+                    f"INSERT OR IGNORE INTO {self.table} (filename, name, name_key, created, summary, data) VALUES (?, ?, ?, ?, ?, ?)",
+                    rows,
+                )
+                db.execute("INSERT INTO migrations (source, migrated) VALUES (?, ?)", (source, time.time()))
+                db.execute("COMMIT")
+            except Exception:
+                db.execute("ROLLBACK")
+                raise
+
+        if rows:
+            logger.info(f"Migrated {len(rows)} record(s) from {directory} into {self.db_path}")
+        return len(rows)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+def default_db_path() -> Path:
+    return Path(__file__).parent.parent / "data" / "rebase.sqlite3"
+
+
+def create_store(
+    backend: str,
+    directory: Path,
+    table: str,
+    summarize: Summarizer,
+    db_path: Optional[Path] = None,
+    codec: Optional[Codec] = None,
+) -> RecordStore:
+    """
+    Build the store for one kind of record. The sqlite backend imports the
+    existing files from directory the first time it is used.
+    """
+    if backend == "files":
+        return FileRecordStore(directory, summarize, codec)
+    if backend == "sqlite":
+        store = SqliteRecordStore(db_path or default_db_path(), table, summarize, codec)
+        store.migrate_directory(directory)
+        return store
+    raise ValueError(f"Unknown storage backend: {backend} (expected one of {', '.join(BACKENDS)})")
+
+
+def storage_backend() -> str:
+    """The backend selected with REBASE_STORAGE_BACKEND (default 'files')."""
+    return os.environ.get("REBASE_STORAGE_BACKEND", "files")
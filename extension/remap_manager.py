@@ -1,23 +1,45 @@
-import json
 import time
 import logging
 from pathlib import Path
 from typing import Dict, List, Any, Optional
 
+from .record_codecs import get_codec
+from .record_store import create_store, storage_backend
+
 logger = logging.getLogger(__name__)
 
 class RemapManager:
     """Manages saving, loading, and listing of field remap configurations."""
 
-    def __init__(self, remaps_dir: Optional[Path] = None):
+    def __init__(
+        self,
+        remaps_dir: Optional[Path] = None,
+        backend: Optional[str] = None,
+        db_path: Optional[Path] = None,
+        codec: Optional[str] = None,
+    ):
         if remaps_dir is None:
             # Default to a 'remaps' subdirectory in the extension root
             self.remaps_dir = Path(__file__).parent.parent / "data" / "remaps"
         else:
             self.remaps_dir = remaps_dir
 
-        # Ensure the directory exists
-        self.remaps_dir.mkdir(parents=True, exist_ok=True)
+        self._store = create_store(
+            backend or storage_backend(), self.remaps_dir, "remaps", self._summarize, db_path,
+            get_codec(codec) if codec else None,
+        )
+
+    @staticmethod
+    def _summarize(filepath: Path, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Extract the listing fields stored in the manifest."""
+        created = data.get("created")
+        if created is None:
+            created = filepath.stat().st_mtime
+        return {
+            "name": data.get("name", filepath.stem),
+            "created": created,
+            "count": len(data.get("remaps", []))
+        }
 
     def save_remaps(self, name: str, remaps_data: List[Dict[str, Any]]) -> str:
         """
@@ -33,7 +55,6 @@ class RemapManager:
 
         timestamp = int(time.time())
         filename = f"{safe_name}_{timestamp}.json"
-        filepath = self.remaps_dir / filename
 
         # Prepare the data to save
         save_data = {
@@ -42,57 +63,26 @@ class RemapManager:
             "remaps": remaps_data
         }
 
-        # Save to file
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(save_data, f, indent=2)
-
+        self._store.save(filename, save_data)
         return filename
 
     def load_remaps(self, filename: str) -> List[Dict[str, Any]]:
         """Load remaps by filename."""
-        filepath = self.remaps_dir / filename
-
-        if not filepath.exists():
+        try:
+            data = self._store.load(filename)
+        except FileNotFoundError:
             raise FileNotFoundError(f"Remap file not found: {filename}")
 
-        with open(filepath, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-
         return data.get("remaps", [])
 
-    def list_remaps(self) -> List[Dict[str, Any]]:
-        """List all available remap configurations."""
-        remaps = []
-
-        for filepath in self.remaps_dir.glob("*.json"):
-            try:
-                with open(filepath, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-
-                remaps.append({
-                    "filename": filepath.name,
-                    "name": data.get("name", filepath.stem),
-                    "created": data.get("created", filepath.stat().st_mtime),
-                    "count": len(data.get("remaps", []))
-                })
-            except (json.JSONDecodeError, IOError) as e:
-                # Skip corrupted files
-                logger.warning(f"Warning: Could not read remap file {filepath}: {e}")
-                continue
-
-        # Sort by creation time, newest first
-        remaps.sort(key=lambda x: x["created"], reverse=True)
-        return remaps
+    def list_remaps(self, limit: Optional[int] = None, offset: int = 0, prefix: Optional[str] = None) -> List[Dict[str, Any]]:
+        """List available remap configurations, newest first, optionally paginated and filtered by name prefix."""
+        return self._store.list(limit, offset, prefix)
+
+    def count_remaps(self, prefix: Optional[str] = None) -> int:
+        """Count remap configurations, optionally only those whose name starts with prefix."""
+        return self._store.count(prefix)
 
     def delete_remaps(self, filename: str) -> bool:
         """Delete remaps by filename. Returns True if successful."""
-        filepath = self.remaps_dir / filename
-
-        if not filepath.exists():
-            return False
-
-        try:
-            filepath.unlink()
-            return True
-        except OSError:
-            return False
+        return self._store.delete(filename)
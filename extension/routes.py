@@ -1,8 +1,17 @@
 from aiohttp import web
 import os
 from pathlib import Path
+from PIL import Image
 from .diff_manager import DiffManager
 from .remap_manager import RemapManager
+from .dir_index import DirectoryIndex
+from .executor import storage
+from .thumbnails import ThumbnailCache, THUMBNAIL_FORMATS, DEFAULT_SIZE, MIN_SIZE, MAX_SIZE
+from .workflow_meta import WorkflowCache
+from .job_queue import JobQueue, JobDispatcher, JOB_STATUSES, validate_job
+from .working_state import WorkingState
+
+dir_index = DirectoryIndex()
 
 def get_parent_path():
     """Get the ComfyUI-SearchReplace root directory"""
@@ -10,33 +19,72 @@ def get_parent_path():
 
 def get_data_path(folder_type="evals"):
     """Get the data directory with optional subfolder"""
+    # folder_type comes from ?type=, so it may only name a visible directory directly under data/
+    if not folder_type or folder_type != Path(folder_type).name or folder_type.startswith("."):
+        raise web.HTTPBadRequest(text=f"Invalid data type: {folder_type}")
     return get_parent_path() / "data" / folder_type
 
+def get_thumbnail_cache_path():
+    """Get the directory holding generated thumbnails"""
+    return get_parent_path() / "data" / ".cache" / "thumbs"
+
+thumbnail_cache = ThumbnailCache(get_thumbnail_cache_path())
+workflow_cache = WorkflowCache()
+
 def get_target_folder_files(folder, folder_type="evals", filter_ext=None):
     """List files in a specific folder with optional extension filtering"""
-    target = get_data_path(folder_type) / folder
-    if not target.exists() or not target.is_dir():
+    base_path = get_data_path(folder_type)
+    target = base_path / folder
+    if not target.resolve().is_relative_to(base_path.resolve()):
+        raise web.HTTPBadRequest(text="Invalid folder path")
+    listing = dir_index.get(target)
+    if listing is None:
         return None
 
-    files = [f.name for f in target.iterdir() if f.is_file()]
     if filter_ext:
         if isinstance(filter_ext, str):
             filter_ext = (filter_ext,)
-        files = [f for f in files if any(f.lower().endswith(ext) for ext in filter_ext)]
-    return sorted(files)
+        return listing.files_with_ext(tuple(filter_ext))
+    return listing.files
 
-async def list_data_folders(request):
-    """List available evaluation folders"""
-    folder_type = request.query.get("type", "evals")
+def get_data_folders(folder_type="evals"):
+    """List subfolders of a data directory, creating it if missing"""
     base_path = get_data_path(folder_type)
 
-    if not base_path.exists():
+    listing = dir_index.get(base_path)
+    if listing is None:
         # Create directory if it doesn't exist
         base_path.mkdir(parents=True, exist_ok=True)
-        return web.json_response({"folders": []})
+        return []
+
+    return listing.dirs
+
+def get_data_file(folder, filename, folder_type="evals"):
+    """Resolve a file inside a data folder, refusing paths that escape it"""
+    base_path = get_data_path(folder_type).resolve()
+    file_path = (base_path / folder / filename).resolve()
+
+    if not file_path.is_relative_to(base_path):
+        raise web.HTTPBadRequest(text="Invalid file path")
+
+    if not file_path.is_file():
+        raise web.HTTPNotFound(text=f"File not found: {filename}")
+
+    return file_path
 
-    folders = [d.name for d in base_path.iterdir() if d.is_dir()]
-    return web.json_response({"folders": sorted(folders)})
+async def list_data_folders(request):
+    """List available evaluation folders"""
+    folder_type = request.query.get("type", "evals")
+    folders = await storage.run("data.folders", get_data_folders, folder_type)
+    return web.json_response({"folders": folders})
+
+async def index_stats(request):
+    """Report hit/miss counts for the cached directory index"""
+    return web.json_response(dir_index.stats())
+
+async def storage_stats(request):
+    """Report queue depth and concurrency of the storage thread pool"""
+    return web.json_response(storage.stats())
 
 async def list_images(request):
     """List images in a specific folder with metadata"""
@@ -46,25 +94,48 @@ async def list_images(request):
     if not folder:
         return web.json_response({"images": []})
 
-    files = get_target_folder_files(folder, folder_type, filter_ext=(".png", ".jpg", ".jpeg", ".webp"))
+    files = await storage.run(
+        "data.images", get_target_folder_files,
+        folder, folder_type, filter_ext=(".png", ".jpg", ".jpeg", ".webp"),
+    )
     if files is None:
         raise web.HTTPNotFound(text=f"Folder '{folder}' not found")
 
+    folder_path = get_data_path(folder_type) / folder
+    # Only known once the workflow has been extracted at least once; no stat per file
+    has_workflow = workflow_cache.has_workflows(folder_path, files)
     images = []
     for filename in files:
-        # Check for associated workflow json
         # Build API URL for retrieving this file
         url = f"/rebase/data/view?type={folder_type}&folder={folder}&filename={filename}"
+        thumb_url = f"/rebase/data/thumb?type={folder_type}&folder={folder}&filename={filename}"
+        workflow_url = f"/rebase/data/workflow?type={folder_type}&folder={folder}&filename={filename}"
 
-        images.append({
+        image = {
             "filename": filename,
-            "url": url
-        })
+            "url": url,
+            "thumb_url": thumb_url,
+            "workflow_url": workflow_url,
+        }
+        if filename in has_workflow:
+            image["has_workflow"] = has_workflow[filename]
+        images.append(image)
 
     return web.json_response({"images": images})
 
+def get_content_type(filename):
+    """Map a data file to the content type served for it"""
+    ext = os.path.splitext(filename)[1].lower()
+    if ext in (".png", ".jpg", ".jpeg", ".webp"):
+        return f"image/{ext[1:]}"
+    return "application/json"
+
 async def view_file(request):
-    """Return file contents (image or JSON)"""
+    """Return file contents (image or JSON)
+
+    Served through aiohttp's FileResponse, which streams the file with
+    sendfile and handles Range, ETag/Last-Modified and 304 responses.
+    """
     folder_type = request.query.get("type", "evals")
     folder = request.query.get("folder", "")
     filename = request.query.get("filename")
@@ -72,23 +143,77 @@ async def view_file(request):
     if not filename or not folder:
         raise web.HTTPBadRequest(text="Missing required parameters")
 
-    # Build full path
-    file_path = get_data_path(folder_type) / folder / filename
+    file_path = await storage.run("data.view", get_data_file, folder, filename, folder_type)
 
-    if not file_path.exists():
-        raise web.HTTPNotFound(text=f"File not found: {filename}")
+    return web.FileResponse(
+        file_path,
+        headers={
+            "Content-Type": get_content_type(filename),
+            "Cache-Control": "no-cache",
+        },
+    )
+
+async def view_thumbnail(request):
+    """Return a downscaled preview of an image, generated and cached on first request"""
+    folder_type = request.query.get("type", "evals")
+    folder = request.query.get("folder", "")
+    filename = request.query.get("filename")
+    fmt = request.query.get("format", "webp")
 
-    # Read file
-    with open(file_path, "rb") as f:
-        data = f.read()
+    if not filename or not folder:
+        raise web.HTTPBadRequest(text="Missing required parameters")
 
-    # Set content type based on extension
-    ext = os.path.splitext(filename)[1].lower()
-    content_type = "application/json"
-    if ext in (".png", ".jpg", ".jpeg", ".webp"):
-        content_type = f"image/{ext[1:]}"
+    if fmt not in THUMBNAIL_FORMATS:
+        raise web.HTTPBadRequest(text=f"Unsupported thumbnail format: {fmt}")
+
+    try:
+        size = int(request.query.get("size", DEFAULT_SIZE))
+    except ValueError:
+        raise web.HTTPBadRequest(text="Invalid thumbnail size")
+    size = max(MIN_SIZE, min(MAX_SIZE, size))
+
+    file_path = await storage.run("data.view", get_data_file, folder, filename, folder_type)
+    try:
+        thumb_path = await storage.run("data.thumb", thumbnail_cache.get, file_path, size, fmt)
+    except Image.DecompressionBombError as e:
+        # Over PIL's MAX_IMAGE_PIXELS: refused before decoding, and not an OSError
+        raise web.HTTPUnprocessableEntity(text=f"Image too large to thumbnail: {filename}: {e}")
+    except OSError as e:
+        raise web.HTTPUnsupportedMediaType(text=f"Cannot create thumbnail for {filename}: {e}")
+
+    return web.FileResponse(
+        thumb_path,
+        headers={
+            "Content-Type": THUMBNAIL_FORMATS[fmt][2],
+            "Cache-Control": "no-cache",
+        },
+    )
+
+async def view_workflow(request):
+    """Return the workflow/prompt JSON embedded in an image without sending the image"""
+    folder_type = request.query.get("type", "evals")
+    folder = request.query.get("folder", "")
+    filename = request.query.get("filename")
 
-    return web.Response(body=data, content_type=content_type)
+    if not filename or not folder:
+        raise web.HTTPBadRequest(text="Missing required parameters")
+
+    await storage.run("data.view", get_data_file, folder, filename, folder_type)
+    # Keyed by the unresolved path so list_images can look entries up cheaply
+    file_path = get_data_path(folder_type) / folder / filename
+    body = await storage.run("data.workflow", workflow_cache.get, file_path)
+    if body is None:
+        raise web.HTTPNotFound(text=f"No workflow data found for {filename}")
+
+    return web.Response(body=body, content_type="application/json")
+
+async def workflow_stats(request):
+    """Report hit/miss counts for the embedded-workflow cache"""
+    return web.json_response(workflow_cache.stats())
+
+async def thumbnail_stats(request):
+    """Report hit/miss counts and disk usage of the thumbnail cache"""
+    return web.json_response(thumbnail_cache.stats())
 
 diff_manager = DiffManager()
 remap_manager = RemapManager()
@@ -106,7 +231,7 @@ async def save_diff_route(request):
         if not diff_data:
             return web.json_response({'error': 'Diff data is required'}, status=400)
 
-        filename = diff_manager.save_diff(name, diff_data)
+        filename = await storage.run("diff.save", diff_manager.save_diff, name, diff_data)
         return web.json_response({'success': True, 'filename': filename})
 
     except ValueError as e:
@@ -114,11 +239,24 @@ async def save_diff_route(request):
     except Exception as e:
         return web.json_response({'error': f'Failed to save diff: {str(e)}'}, status=500)
 
+def _page_params(request):
+    """Read ?limit=, ?offset= and ?prefix= for listings. Raises ValueError."""
+    limit = request.query.get('limit')
+    limit = None if limit is None else max(int(limit), 0)
+    offset = max(int(request.query.get('offset', 0)), 0)
+    prefix = request.query.get('prefix') or None
+    return limit, offset, prefix
+
 async def list_diffs_route(request):
-    """List all saved diffs."""
+    """List saved diffs, newest first (?limit=, ?offset=, ?prefix= to page and search by name)."""
+    try:
+        limit, offset, prefix = _page_params(request)
+    except ValueError:
+        return web.json_response({'error': 'limit and offset must be integers'}, status=400)
     try:
-        diffs = diff_manager.list_diffs()
-        return web.json_response({'diffs': diffs})
+        diffs = await storage.run("diff.list", diff_manager.list_diffs, limit, offset, prefix)
+        total = await storage.run("diff.list", diff_manager.count_diffs, prefix)
+        return web.json_response({'diffs': diffs, 'total': total})
     except Exception as e:
         return web.json_response({'error': f'Failed to list diffs: {str(e)}'}, status=500)
 
@@ -126,18 +264,46 @@ async def load_diff_route(request):
     """Load a specific diff."""
     try:
         filename = request.match_info['filename']
-        diff_data = diff_manager.load_diff(filename)
+        diff_data = await storage.run("diff.load", diff_manager.load_diff, filename)
         return web.json_response({'diff': diff_data})
     except FileNotFoundError:
         return web.json_response({'error': 'Diff not found'}, status=404)
     except Exception as e:
         return web.json_response({'error': f'Failed to load diff: {str(e)}'}, status=500)
 
+async def list_diff_versions_route(request):
+    """List the saved versions of a diff."""
+    try:
+        filename = request.match_info['filename']
+        versions = await storage.run("diff.load", diff_manager.list_versions, filename)
+        return web.json_response({'versions': versions})
+    except FileNotFoundError:
+        return web.json_response({'error': 'Diff not found'}, status=404)
+    except Exception as e:
+        return web.json_response({'error': f'Failed to list diff versions: {str(e)}'}, status=500)
+
+async def load_diff_version_route(request):
+    """Load a specific version of a diff."""
+    try:
+        filename = request.match_info['filename']
+        version = int(request.match_info['version'])
+    except ValueError:
+        return web.json_response({'error': 'Version must be an integer'}, status=400)
+    try:
+        diff_data = await storage.run("diff.load", diff_manager.load_version, filename, version)
+        return web.json_response({'diff': diff_data, 'version': version})
+    except FileNotFoundError:
+        return web.json_response({'error': 'Diff not found'}, status=404)
+    except KeyError:
+        return web.json_response({'error': f'Version not found: {version}'}, status=404)
+    except Exception as e:
+        return web.json_response({'error': f'Failed to load diff version: {str(e)}'}, status=500)
+
 async def delete_diff_route(request):
     """Delete a diff."""
     try:
         filename = request.match_info['filename']
-        success = diff_manager.delete_diff(filename)
+        success = await storage.run("diff.delete", diff_manager.delete_diff, filename)
         if success:
             return web.json_response({'success': True})
         else:
@@ -159,7 +325,7 @@ async def save_remaps_route(request):
         if not remaps_data:
             return web.json_response({'error': 'Remaps data is required'}, status=400)
 
-        filename = remap_manager.save_remaps(name, remaps_data)
+        filename = await storage.run("remap.save", remap_manager.save_remaps, name, remaps_data)
         return web.json_response({'success': True, 'filename': filename})
 
     except ValueError as e:
@@ -168,10 +334,15 @@ async def save_remaps_route(request):
         return web.json_response({'error': f'Failed to save remaps: {str(e)}'}, status=500)
 
 async def list_remaps_route(request):
-    """List all saved remap configurations."""
+    """List saved remap configurations, newest first (?limit=, ?offset=, ?prefix=)."""
+    try:
+        limit, offset, prefix = _page_params(request)
+    except ValueError:
+        return web.json_response({'error': 'limit and offset must be integers'}, status=400)
     try:
-        remaps = remap_manager.list_remaps()
-        return web.json_response({'remaps': remaps})
+        remaps = await storage.run("remap.list", remap_manager.list_remaps, limit, offset, prefix)
+        total = await storage.run("remap.list", remap_manager.count_remaps, prefix)
+        return web.json_response({'remaps': remaps, 'total': total})
     except Exception as e:
         return web.json_response({'error': f'Failed to list remaps: {str(e)}'}, status=500)
 
@@ -179,7 +350,7 @@ async def load_remaps_route(request):
     """Load a specific remap configuration."""
     try:
         filename = request.match_info['filename']
-        remaps_data = remap_manager.load_remaps(filename)
+        remaps_data = await storage.run("remap.load", remap_manager.load_remaps, filename)
         return web.json_response({'remaps': remaps_data})
     except FileNotFoundError:
         return web.json_response({'error': 'Remaps not found'}, status=404)
@@ -190,10 +361,159 @@ async def delete_remaps_route(request):
     """Delete a remap configuration."""
     try:
         filename = request.match_info['filename']
-        success = remap_manager.delete_remaps(filename)
+        success = await storage.run("remap.delete", remap_manager.delete_remaps, filename)
         if success:
             return web.json_response({'success': True})
         else:
             return web.json_response({'error': 'Remaps not found'}, status=404)
     except Exception as e:
         return web.json_response({'error': f'Failed to delete remaps: {str(e)}'}, status=500)
+
+# Working diff routes
+working_state = WorkingState()
+
+async def flush_working_state(app):
+    """Write any buffered working-state changes before shutdown."""
+    await working_state.flush()
+
+async def get_working_route(request):
+    """Return the shared working diff and remaps."""
+    try:
+        return web.json_response(await working_state.get())
+    except Exception as e:
+        return web.json_response({'error': f'Failed to read working state: {str(e)}'}, status=500)
+
+async def update_working_route(request):
+    """
+    Update the working state: {'diff': {...}} replaces the diff, {'nodes': {id: diff|null}}
+    replaces single nodes and {'remaps': [...]} replaces the remaps.
+    """
+    try:
+        data = await request.json()
+        diff = data.get('diff')
+        nodes = data.get('nodes')
+        remaps = data.get('remaps')
+        if diff is not None and not isinstance(diff, dict):
+            return web.json_response({'error': 'diff must be an object'}, status=400)
+        if nodes is not None and not isinstance(nodes, dict):
+            return web.json_response({'error': 'nodes must be an object'}, status=400)
+        if remaps is not None and not isinstance(remaps, list):
+            return web.json_response({'error': 'remaps must be a list'}, status=400)
+        if diff is None and nodes is None and remaps is None:
+            return web.json_response({'error': 'One of diff, nodes or remaps is required'}, status=400)
+
+        revision = await working_state.update(diff=diff, nodes=nodes, remaps=remaps)
+        return web.json_response({'success': True, 'revision': revision})
+    except Exception as e:
+        return web.json_response({'error': f'Failed to update working state: {str(e)}'}, status=500)
+
+async def clear_working_route(request):
+    """Clear the working diff and remaps."""
+    try:
+        revision = await working_state.clear()
+        return web.json_response({'success': True, 'revision': revision})
+    except Exception as e:
+        return web.json_response({'error': f'Failed to clear working state: {str(e)}'}, status=500)
+
+async def working_stats(request):
+    """Report how many updates were coalesced into how many disk writes"""
+    return web.json_response(working_state.stats())
+
+# Job queue routes
+job_queue = JobQueue()
+job_dispatcher = JobDispatcher(
+    job_queue,
+    target_depth=int(os.environ.get('REBASE_JOB_TARGET_DEPTH', '2')),
+)
+
+async def start_job_dispatcher(app):
+    """Resume dispatching jobs left in the queue by a previous run."""
+    job_dispatcher.start()
+
+async def stop_job_dispatcher(app):
+    await job_dispatcher.stop()
+    job_queue.close()
+
+async def submit_jobs_route(request):
+    """Queue jobs in bulk: {'jobs': [{'detail': {...}, 'count': n}, ...]}."""
+    try:
+        data = await request.json()
+        items = data.get('jobs')
+        if not isinstance(items, list) or not items:
+            return web.json_response({'error': 'Jobs list is required'}, status=400)
+
+        jobs = []
+        for i, item in enumerate(items):
+            try:
+                jobs.append(validate_job(item))
+            except ValueError as e:
+                return web.json_response({'error': f'{str(e)} (index {i})'}, status=400)
+
+        ids = await storage.run("jobs.submit", job_queue.submit, jobs)
+        job_dispatcher.wake()
+        return web.json_response({'success': True, 'ids': ids})
+
+    except Exception as e:
+        return web.json_response({'error': f'Failed to queue jobs: {str(e)}'}, status=500)
+
+async def list_jobs_route(request):
+    """List jobs (?status=, ?limit=, ?offset=) with per-status counts."""
+    status = request.query.get('status')
+    if status is not None and status not in JOB_STATUSES:
+        return web.json_response({'error': f'Unknown status: {status}'}, status=400)
+    try:
+        limit = min(max(int(request.query.get('limit', 100)), 1), 1000)
+        offset = max(int(request.query.get('offset', 0)), 0)
+    except ValueError:
+        return web.json_response({'error': 'limit and offset must be integers'}, status=400)
+
+    try:
+        jobs = await storage.run("jobs.list", job_queue.list, status, limit, offset)
+        counts = await storage.run("jobs.list", job_queue.counts)
+        return web.json_response({'jobs': [job.to_json() for job in jobs], 'counts': counts})
+    except Exception as e:
+        return web.json_response({'error': f'Failed to list jobs: {str(e)}'}, status=500)
+
+def _job_id(request):
+    try:
+        return int(request.match_info['job_id'])
+    except ValueError:
+        return None
+
+async def get_job_route(request):
+    """Report the status of a single job."""
+    job_id = _job_id(request)
+    if job_id is None:
+        return web.json_response({'error': 'Invalid job id'}, status=400)
+    try:
+        job = await storage.run("jobs.get", job_queue.get, job_id)
+        if job is None:
+            return web.json_response({'error': 'Job not found'}, status=404)
+        return web.json_response(job.to_json())
+    except Exception as e:
+        return web.json_response({'error': f'Failed to read job: {str(e)}'}, status=500)
+
+async def cancel_job_route(request):
+    """Cancel a job that has not been dispatched yet."""
+    job_id = _job_id(request)
+    if job_id is None:
+        return web.json_response({'error': 'Invalid job id'}, status=400)
+    try:
+        if await storage.run("jobs.update", job_queue.cancel, job_id):
+            return web.json_response({'success': True})
+        return web.json_response({'error': 'Job not found or no longer queued'}, status=409)
+    except Exception as e:
+        return web.json_response({'error': f'Failed to cancel job: {str(e)}'}, status=500)
+
+async def retry_job_route(request):
+    """Queue a failed, cancelled or dispatched job again."""
+    job_id = _job_id(request)
+    if job_id is None:
+        return web.json_response({'error': 'Invalid job id'}, status=400)
+    try:
+        if await storage.run("jobs.update", job_queue.retry, job_id):
+            job_dispatcher.wake()
+            return web.json_response({'success': True})
+        return web.json_response({'error': 'Job not found or still queued'}, status=409)
+    except Exception as e:
+        return web.json_response({'error': f'Failed to retry job: {str(e)}'}, status=500)
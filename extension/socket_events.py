@@ -1,13 +1,189 @@
+import os
 import server
+import asyncio
+import logging
 from pathlib import Path
+from typing import Any, Dict, Optional
 from aiohttp import web
 
+from .acks import acks, ACK_ID_KEY, ACK_REQUEST_KEY
+from .executor import storage
+from .fanout import fanout, FanoutResult
+from .templates import TemplateRegistry, DEFAULT_TEMPLATE
+
+logger = logging.getLogger(__name__)
+
 SUPPORTED_EVENTS = [
     'prompt_replace',
     'generate',
 ]
+
+DEFAULT_ACK_TIMEOUT = 30.0
+MAX_ACK_TIMEOUT = 300.0
+
+
+def merge_detail(base: Dict[str, Any], update: Dict[str, Any]) -> Dict[str, Any]:
+    """Merge prompt_replace payloads field by field; nested objects merge recursively."""
+    merged = dict(base)
+    for key, value in update.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = merge_detail(merged[key], value)
+        else:
+            merged[key] = value
+    return merged
+
+
+class PromptReplaceCoalescer:
+    """
+    Opt-in debouncing of bursty prompt_replace events.
+
+    While enabled (window > 0), prompt_replace payloads are merged field by
+    field and broadcast as one event once no new update has arrived for
+    `window` seconds, or after `max_delay` at the latest. Any other event
+    must call flush() first so it is never delivered ahead of an earlier
+    prompt_replace.
+    """
+
+    def __init__(self, window: float = 0.0, max_delay: Optional[float] = None):
+        self.window = window
+        self.max_delay = max_delay
+        self._pending: Optional[Dict[str, Any]] = None
+        self._merged = 0
+        self._deadline = 0.0
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._inflight: Optional[asyncio.Future] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.window > 0
+
+    def add(self, data: Dict[str, Any]) -> int:
+        """Buffer a payload; returns how many events are merged into the pending one."""
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        if self._pending is None:
+            self._pending = {}
+            self._merged = 0
+            self._deadline = now + (self.max_delay if self.max_delay is not None else 4 * self.window)
+        self._pending = merge_detail(self._pending, data or {})
+        self._merged += 1
+
+        if self._timer is not None:
+            self._timer.cancel()
+        delay = max(0.0, min(self.window, self._deadline - now))
+        self._timer = loop.call_later(delay, self._flush_from_timer)
+        return self._merged
+
+    def _flush_from_timer(self) -> None:
+        self._timer = None
+        asyncio.ensure_future(self.flush()).add_done_callback(_log_flush_failure)
+
+    async def flush(self) -> Optional[FanoutResult]:
+        """Broadcast the pending merged event, waiting for any flush already in progress."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        if self._pending is not None:
+            data, merged = self._pending, self._merged
+            self._pending = None
+            previous = self._inflight
+            self._inflight = asyncio.ensure_future(self._deliver(previous, data, merged))
+
+        if self._inflight is None:
+            return None
+        inflight = self._inflight
+        try:
+            # Shared by every caller, so one caller going away must not cancel it
+            return await asyncio.shield(inflight)
+        finally:
+            if self._inflight is inflight and inflight.done():
+                self._inflight = None
+
+    async def _deliver(self, previous: Optional[asyncio.Future], data: Dict[str, Any], merged: int) -> FanoutResult:
+        if previous is not None:
+            # Only ordering matters here; the previous failure was reported to its own callers
+            await asyncio.wait([previous])
+        logger.debug(f"Flushing {merged} coalesced prompt_replace event(s)")
+        return await fanout.broadcast('prompt_replace', data)
+
+
+def _log_flush_failure(task: asyncio.Future) -> None:
+    if not task.cancelled() and task.exception() is not None:
+        logger.error(f"Failed to broadcast coalesced prompt_replace: {task.exception()}")
+
+
+coalescer = PromptReplaceCoalescer(
+    window=float(os.environ.get('REBASE_COALESCE_WINDOW_MS', '0')) / 1000,
+)
+
+
+async def dispatch_event(event: str, data: Any) -> Optional[FanoutResult]:
+    """
+    Deliver an event to the browser, honouring prompt_replace coalescing.
+    Returns None when the event was buffered for a later merged broadcast.
+    """
+    if event == 'prompt_replace' and coalescer.enabled:
+        coalescer.add(data)
+        return None
+    await coalescer.flush()
+    return await fanout.broadcast(event, data)
+
+
+def wait_params(request):
+    """
+    Parse ?wait=true&timeout=<seconds>; returns the ack timeout, or None
+    when the caller does not want to wait. Raises ValueError if invalid.
+    """
+    if request.query.get('wait', '').lower() not in ('1', 'true', 'yes'):
+        return None
+    timeout = float(request.query.get('timeout', DEFAULT_ACK_TIMEOUT))
+    if not 0 < timeout <= MAX_ACK_TIMEOUT:
+        raise ValueError(f'timeout must be in (0, {MAX_ACK_TIMEOUT:g}]')
+    return timeout
+
+
+async def send_with_ack(event: str, data: Any) -> tuple:
+    """
+    Broadcast an event tagged with a fresh correlation ID, bypassing the
+    coalescer; returns (ack_id, FanoutResult). The caller must discard()
+    the ID once done with it, in a finally so cancellation cannot leak it.
+    """
+    if data is not None and not isinstance(data, dict):
+        raise ValueError('Event data must be an object to wait for acknowledgement')
+    await coalescer.flush()
+    ack_id = acks.register()
+    sent = False
+    try:
+        result = await fanout.broadcast(event, {**(data or {}), ACK_ID_KEY: ack_id, ACK_REQUEST_KEY: True})
+        sent = True
+    finally:
+        # Failed or cancelled (CancelledError is not an Exception): nobody will wait for it
+        if not sent:
+            acks.discard(ack_id)
+    return ack_id, result
+
+
+def ack_response(acked):
+    """Map collected acknowledgements to (body fields, HTTP status)."""
+    if any(a is None for a in acked):
+        return {'error': 'Timed out waiting for acknowledgement'}, 504
+    failed = [a for a in acked if not a['ok']]
+    if failed:
+        return {'error': f"Event handler failed: {failed[0]['error']}"}, 502
+    return {'success': True}, 200
+
+
 async def forward_to_websocket(request):
-    """Forward HTTP requests to websocket as events."""
+    """
+    Forward HTTP requests to websocket as events.
+
+    With ?wait=true the event carries a correlation ID and the response
+    waits until a browser tab acknowledges that its handler finished
+    (504 after ?timeout seconds, 502 if the handler failed). The handler's
+    result, such as the prompt ids queued by 'generate', is returned as
+    'result'.
+    """
     try:
         data = await request.json()
         event = data.get('event')
@@ -19,27 +195,203 @@ async def forward_to_websocket(request):
         if event not in SUPPORTED_EVENTS:
            return web.json_response({'error': f'Unsupported event: {event}'}, status=400)
 
+        try:
+            timeout = wait_params(request)
+            if timeout is not None:
+                ack_id, result = await send_with_ack(event, event_data)
+        except ValueError as e:
+            return web.json_response({'error': str(e)}, status=400)
+
+        if timeout is not None:
+            try:
+                if not result.delivered:
+                    return web.json_response({'error': 'No websocket received the event', 'id': ack_id, **result.to_json()}, status=503)
+                ack = await acks.wait(ack_id, timeout)
+            finally:
+                acks.discard(ack_id)
+            body, status = ack_response([ack])
+            if ack is not None:
+                body['result'] = ack['result']
+            return web.json_response({**body, 'id': ack_id, **result.to_json()}, status=status)
+
         # Forward to all connected websockets
-        await server.PromptServer.instance.send_json(event, event_data)
+        result = await dispatch_event(event, event_data)
+        if result is None:
+            return web.json_response({'success': True, 'coalesced': True})
 
-        return web.json_response({'success': True})
+        return web.json_response({'success': True, **result.to_json()})
 
     except Exception as e:
         return web.json_response({'error': f'Failed to forward message: {str(e)}'}, status=500)
 
+async def forward_batch_to_websocket(request):
+    """
+    Forward an ordered list of events to websocket in a single request.
+    ?wait=true tags each event and waits for all of them to be acknowledged.
+    """
+    try:
+        data = await request.json()
+        events = data.get('events')
+
+        if not isinstance(events, list) or not events:
+            return web.json_response({'error': 'Events list is required'}, status=400)
+
+        # Validate the whole batch before delivering anything
+        for i, item in enumerate(events):
+            event = item.get('event') if isinstance(item, dict) else None
+            if not event:
+                return web.json_response({'error': f'Event field is required (index {i})'}, status=400)
+            if event not in SUPPORTED_EVENTS:
+                return web.json_response({'error': f'Unsupported event: {event} (index {i})'}, status=400)
+        try:
+            timeout = wait_params(request)
+        except ValueError as e:
+            return web.json_response({'error': str(e)}, status=400)
+
+        if timeout is not None:
+            if any(item.get('data') is not None and not isinstance(item.get('data'), dict) for item in events):
+                return web.json_response({'error': 'Event data must be an object to wait for acknowledgement'}, status=400)
+            return await _forward_batch_and_wait(events, timeout)
+
+        delivered = []
+        duration = 0.0
+        for item in events:
+            result = await dispatch_event(item['event'], item.get('data', {}))
+            # None marks a prompt_replace buffered by the coalescer
+            delivered.append(None if result is None else result.delivered)
+            duration += 0.0 if result is None else result.duration
+
+        return web.json_response({
+            'success': True,
+            'count': len(events),
+            'delivered': delivered,
+            'duration_ms': round(duration * 1000, 3),
+        })
+
+    except Exception as e:
+        return web.json_response({'error': f'Failed to forward messages: {str(e)}'}, status=500)
+
+async def _forward_batch_and_wait(events, timeout):
+    ids = []
+    delivered = []
+    duration = 0.0
+    try:
+        for item in events:
+            ack_id, result = await send_with_ack(item['event'], item.get('data', {}))
+            ids.append(ack_id)
+            delivered.append(result.delivered)
+            duration += result.duration
+
+        summary = {
+            'count': len(events),
+            'ids': ids,
+            'delivered': delivered,
+            'duration_ms': round(duration * 1000, 3),
+        }
+        if not all(delivered):
+            return web.json_response({'error': 'No websocket received the event', **summary}, status=503)
 
-base_template = None
-with open(Path(__file__).parent.parent / "data" / "workflowTemplate.json", 'r') as templateFile:
-    base_template = templateFile.read()
+        # The browser handles events one at a time, so the waits share one deadline
+        acked = await asyncio.gather(*(acks.wait(ack_id, timeout) for ack_id in ids))
+    finally:
+        for ack_id in ids:
+            acks.discard(ack_id)
+    body, status = ack_response(acked)
+    return web.json_response({**body, **summary, 'acks': acked}, status=status)
+
+
+async def acknowledge_event(request):
+    """Called by the browser when it has handled an event: {'id', 'ok', 'error', 'result'}."""
+    try:
+        data = await request.json()
+        ack_id = data.get('id')
+        if not isinstance(ack_id, str) or not ack_id:
+            return web.json_response({'error': 'id is required'}, status=400)
+        matched = acks.resolve(ack_id, ok=bool(data.get('ok', True)), error=data.get('error'), result=data.get('result'))
+        return web.json_response({'success': True, 'matched': matched})
+    except Exception as e:
+        return web.json_response({'error': f'Failed to record acknowledgement: {str(e)}'}, status=500)
+
+def get_queue_depth():
+    """Summarize ComfyUI's prompt queue without copying the queued prompts."""
+    instance = server.PromptServer.instance
+    prompt_queue = instance.prompt_queue
+    if hasattr(prompt_queue, 'get_current_queue_volatile'):
+        running, pending = prompt_queue.get_current_queue_volatile()
+    else:
+        running, pending = prompt_queue.get_current_queue()
+    return {
+        'running': len(running),
+        'pending': len(pending),
+        'remaining': len(running) + len(pending),
+        # Monotonic count of prompts ever queued, used by clients to tell
+        # when a forwarded 'generate' has actually reached the queue.
+        'submitted': getattr(instance, 'number', None),
+    }
+
+
+async def queue_status(request):
+    """Report ComfyUI's running/pending queue depth for client-side pacing."""
+    try:
+        return web.json_response(get_queue_depth())
+    except Exception as e:
+        return web.json_response({'error': f'Failed to read queue: {str(e)}'}, status=500)
+
+
+template_registry = TemplateRegistry(
+    Path(__file__).parent.parent / "data" / "templates",
+    legacy_path=Path(__file__).parent.parent / "data" / "workflowTemplate.json",
+)
+
+
+async def get_template(name=DEFAULT_TEMPLATE):
+    """Return a workflow template, only touching disk when a change check is due."""
+    template = template_registry.cached(name)
+    if template is None:
+        template = await storage.run("template.load", template_registry.get, name)
+    return template
 
 
 async def forward_reset_request(request):
-    """Forward HTTP requests to websocket as events."""
+    """Load a workflow template in the browser (?template=<name>, default 'default')."""
+    name = request.query.get('template', DEFAULT_TEMPLATE)
     try:
-        # No validation...
-        await server.PromptServer.instance.send_json('load_graph', base_template)
+        template = await get_template(name)
+    except KeyError:
+        return web.json_response({'error': f'Template not found: {name}'}, status=404)
+    except Exception as e:
+        return web.json_response({'error': f'Failed to load template: {str(e)}'}, status=500)
 
-        return web.json_response({'success': True})
+    try:
+        await coalescer.flush()
+        result = await fanout.broadcast('load_graph', message=template.message)
+
+        return web.json_response({'success': True, 'template': template.name, **result.to_json()})
 
     except Exception as e:
         return web.json_response({'error': f'Failed to forward message: {str(e)}'}, status=500)
+
+
+async def list_templates(request):
+    """List the workflow templates available to /rebase/reset."""
+    try:
+        names = await storage.run("template.list", template_registry.names)
+        return web.json_response({'templates': names})
+    except Exception as e:
+        return web.json_response({'error': f'Failed to list templates: {str(e)}'}, status=500)
+
+
+async def coalesce_settings(request):
+    """Read or change the prompt_replace coalescing window (POST {'window_ms': n}, 0 disables)."""
+    try:
+        if request.method == 'POST':
+            data = await request.json()
+            window_ms = float(data.get('window_ms', 0))
+            if window_ms < 0:
+                return web.json_response({'error': 'window_ms must be >= 0'}, status=400)
+            if window_ms == 0:
+                await coalescer.flush()
+            coalescer.window = window_ms / 1000
+        return web.json_response({'window_ms': coalescer.window * 1000})
+    except (TypeError, ValueError) as e:
+        return web.json_response({'error': f'Invalid window: {str(e)}'}, status=400)
@@ -0,0 +1,108 @@
+import os
+import json
+import time
+import logging
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TEMPLATE = "default"
+
+
+@dataclass(frozen=True)
+class Template:
+    """A workflow template held in memory in the form sent to the browser."""
+    name: str
+    path: Path
+    mtime_ns: int
+    payload: str  # raw JSON text, sent as the 'load_graph' event data
+    message: str  # the complete websocket message, encoded once
+
+
+class TemplateRegistry:
+    """
+    Workflow templates stored as data/templates/<name>.json.
+
+    Templates are read on first use and kept in memory already serialized.
+    A template file is checked for changes at most once per check_interval
+    seconds and reloaded when its mtime moves, so edits are picked up
+    without restarting ComfyUI. The legacy data/workflowTemplate.json is
+    served as "default" when no templates/default.json exists.
+    """
+
+    def __init__(self, templates_dir: Path, legacy_path: Optional[Path] = None, check_interval: float = 1.0):
+        self.templates_dir = templates_dir
+        self.legacy_path = legacy_path
+        self.check_interval = check_interval
+        self._templates: Dict[str, Template] = {}
+        self._checked: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def _path_for(self, name: str) -> Optional[Path]:
+        if not name or Path(name).name != name or name.startswith("."):
+            return None
+        path = self.templates_dir / f"{name}.json"
+        if name == DEFAULT_TEMPLATE and not path.exists() and self.legacy_path is not None:
+            return self.legacy_path
+        return path
+
+    def cached(self, name: str = DEFAULT_TEMPLATE) -> Optional[Template]:
+        """Return the in-memory template if it was checked recently, without touching disk."""
+        with self._lock:
+            template = self._templates.get(name)
+            if template is not None and time.monotonic() - self._checked.get(name, 0.0) < self.check_interval:
+                return template
+        return None
+
+    def get(self, name: str = DEFAULT_TEMPLATE) -> Template:
+        """
+        Return a template, reloading it if the file changed.
+        Raises KeyError for unknown names and ValueError for invalid JSON.
+        """
+        path = self._path_for(name)
+        if path is None:
+            raise KeyError(name)
+        try:
+            mtime_ns = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            with self._lock:
+                self._templates.pop(name, None)
+            raise KeyError(name)
+
+        with self._lock:
+            template = self._templates.get(name)
+            if template is not None and template.path == path and template.mtime_ns == mtime_ns:
+                self._checked[name] = time.monotonic()
+                return template
+
+        with open(path, 'r', encoding='utf-8') as f:
+            payload = f.read()
+        try:
+            json.loads(payload)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Template '{name}' is not valid JSON: {e}") from e
+
+        template = Template(
+            name=name,
+            path=path,
+            mtime_ns=mtime_ns,
+            payload=payload,
+            message=json.dumps({"type": "load_graph", "data": payload}),
+        )
+        with self._lock:
+            self._templates[name] = template
+            self._checked[name] = time.monotonic()
+        logger.info(f"Loaded workflow template '{name}' from {path}")
+        return template
+
+    def names(self) -> List[str]:
+        """List available template names."""
+        names = set()
+        if self.templates_dir.is_dir():
+            names.update(p.stem for p in self.templates_dir.glob("*.json") if not p.name.startswith("."))
+        if self.legacy_path is not None and self.legacy_path.exists():
+            names.add(DEFAULT_TEMPLATE)
+        return sorted(names)
@@ -0,0 +1,137 @@
+import os
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+# format name -> (PIL format, file extension, content type)
+THUMBNAIL_FORMATS: Dict[str, Tuple[str, str, str]] = {
+    "webp": ("WEBP", ".webp", "image/webp"),
+    "jpeg": ("JPEG", ".jpg", "image/jpeg"),
+}
+MIN_SIZE = 32
+MAX_SIZE = 1024
+DEFAULT_SIZE = 256
+# Only refresh an entry's mtime (its LRU position on disk) this often
+TOUCH_INTERVAL = 60.0
+
+
+class ThumbnailCache:
+    """
+    Size-bounded LRU directory of downscaled thumbnails.
+
+    Thumbnails are keyed by source path, size, mtime, requested edge length
+    and format, so editing a source image produces a fresh thumbnail. The
+    least recently used files are evicted once the directory grows past
+    max_bytes; recency survives restarts through file mtimes.
+    """
+
+    def __init__(self, cache_dir: Path, max_bytes: int = 256 * 1024 * 1024, quality: int = 80):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.quality = quality
+        self._lru: Optional["OrderedDict[str, Tuple[int, float]]"] = None  # name -> (bytes, last touch)
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _load(self) -> "OrderedDict[str, Tuple[int, float]]":
+        if self._lru is not None:
+            return self._lru
+
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        entries = []
+        with os.scandir(self.cache_dir) as it:
+            for entry in it:
+                if entry.is_file() and not entry.name.endswith(".tmp"):
+                    st = entry.stat()
+                    entries.append((st.st_mtime, entry.name, st.st_size))
+        entries.sort()
+
+        self._lru = OrderedDict((name, (size, mtime)) for mtime, name, size in entries)
+        self._total_bytes = sum(size for _, _, size in entries)
+        return self._lru
+
+    def get(self, source: Path, size: int = DEFAULT_SIZE, fmt: str = "webp") -> Path:
+        """Return the path of a thumbnail for source, generating it on a miss."""
+        pil_format, ext, _ = THUMBNAIL_FORMATS[fmt]
+        st = os.stat(source)
+        key = f"{source}|{st.st_size}|{st.st_mtime_ns}|{size}|{fmt}"
+        name = hashlib.sha1(key.encode("utf-8")).hexdigest() + ext
+        path = self.cache_dir / name
+
+        with self._lock:
+            lru = self._load()
+            entry = lru.get(name)
+            if entry is not None and path.exists():
+                self.hits += 1
+                lru.move_to_end(name)
+                now = time.time()
+                if now - entry[1] > TOUCH_INTERVAL:
+                    os.utime(path)
+                    lru[name] = (entry[0], now)
+                return path
+            self.misses += 1
+
+        nbytes = self._generate(source, path, size, pil_format)
+
+        with self._lock:
+            old = lru.pop(name, None)
+            if old is not None:
+                self._total_bytes -= old[0]
+            lru[name] = (nbytes, time.time())
+            self._total_bytes += nbytes
+            self._evict()
+        return path
+
+    def _generate(self, source: Path, path: Path, size: int, pil_format: str) -> int:
+        tmp_path = path.with_name(f"{path.name}.{threading.get_ident()}.tmp")
+        try:
+            with Image.open(source) as img:
+                # Let JPEG decode at reduced scale instead of full resolution
+                img.draft("RGB", (size, size))
+                img.thumbnail((size, size))
+                if pil_format == "JPEG" and img.mode not in ("RGB", "L"):
+                    img = img.convert("RGB")
+                elif img.mode not in ("RGB", "RGBA", "L", "LA"):
+                    img = img.convert("RGBA")
+                img.save(tmp_path, pil_format, quality=self.quality)
+            os.replace(tmp_path, path)
+        except BaseException:
+            # Never leave a half-written thumbnail behind in the cache directory
+            try:
+                tmp_path.unlink()
+            except OSError:
+                pass
+            raise
+        return path.stat().st_size
+
+    def _evict(self) -> None:
+        # Always keep the newest entry, even if it alone exceeds the budget
+        while self._total_bytes > self.max_bytes and len(self._lru) > 1:
+            name, (nbytes, _) = self._lru.popitem(last=False)
+            self._total_bytes -= nbytes
+            try:
+                (self.cache_dir / name).unlink()
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning(f"Could not evict thumbnail {name}: {e}")
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self._lru or ()),
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+            }
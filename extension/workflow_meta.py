@@ -0,0 +1,198 @@
+import os
+import json
+import zlib
+import struct
+import logging
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+PNG_TEXT_CHUNKS = (b"tEXt", b"zTXt", b"iTXt")
+METADATA_KEYS = ("workflow", "prompt")
+# Exif ASCII values are written as "<key>:<json>" by ComfyUI's WebP savers
+EXIF_ASCII = 2
+# Raised by truncated or corrupt chunks; such metadata is skipped, not fatal
+MALFORMED_METADATA = (zlib.error, struct.error, UnicodeDecodeError, IndexError)
+
+
+def _decode_png_text(chunk_type: bytes, data: bytes) -> Tuple[str, str]:
+    keyword, _, rest = data.partition(b"\x00")
+    key = keyword.decode("latin-1")
+    if chunk_type == b"tEXt":
+        return key, rest.decode("latin-1")
+    if chunk_type == b"zTXt":
+        return key, zlib.decompress(rest[1:]).decode("latin-1")
+    # iTXt: compression flag, method, language tag, translated keyword, text
+    compressed = rest[0] == 1
+    _, _, rest = rest[2:].partition(b"\x00")
+    _, _, text = rest.partition(b"\x00")
+    if compressed:
+        text = zlib.decompress(text)
+    return key, text.decode("utf-8")
+
+
+def read_png_text(f) -> Dict[str, str]:
+    """Collect workflow/prompt text chunks, seeking past image data."""
+    found: Dict[str, str] = {}
+    f.seek(len(PNG_SIGNATURE))
+    while True:
+        header = f.read(8)
+        if len(header) < 8:
+            break
+        length, chunk_type = struct.unpack(">I4s", header)
+        if chunk_type == b"IEND":
+            break
+        if chunk_type in PNG_TEXT_CHUNKS:
+            try:
+                key, text = _decode_png_text(chunk_type, f.read(length))
+            except MALFORMED_METADATA as e:
+                logger.warning(f"Skipping malformed {chunk_type.decode('latin-1')} chunk: {e}")
+            else:
+                if key in METADATA_KEYS:
+                    found[key] = text
+            f.seek(4, os.SEEK_CUR)  # CRC
+        else:
+            f.seek(length + 4, os.SEEK_CUR)
+    return found
+
+
+def _read_exif_ascii(exif: bytes) -> Dict[str, str]:
+    if exif.startswith(b"Exif\x00\x00"):
+        exif = exif[6:]
+    endian = {b"II": "<", b"MM": ">"}.get(exif[:2])
+    if endian is None:
+        return {}
+
+    found: Dict[str, str] = {}
+    ifd_offset = struct.unpack(endian + "I", exif[4:8])[0]
+    (count,) = struct.unpack(endian + "H", exif[ifd_offset:ifd_offset + 2])
+    for i in range(count):
+        entry = exif[ifd_offset + 2 + i * 12: ifd_offset + 14 + i * 12]
+        if len(entry) < 12:
+            break
+        _, value_type, value_count = struct.unpack(endian + "HHI", entry[:8])
+        if value_type != EXIF_ASCII:
+            continue
+        if value_count <= 4:
+            raw = entry[8:8 + value_count]
+        else:
+            offset = struct.unpack(endian + "I", entry[8:12])[0]
+            raw = exif[offset:offset + value_count]
+        key, sep, text = raw.rstrip(b"\x00").decode("utf-8", "replace").partition(":")
+        if sep and key in METADATA_KEYS:
+            found[key] = text
+    return found
+
+
+def read_webp_text(f) -> Dict[str, str]:
+    """Find the EXIF chunk of a WebP file, seeking past the bitstream."""
+    f.seek(12)
+    while True:
+        header = f.read(8)
+        if len(header) < 8:
+            return {}
+        chunk_type, length = struct.unpack("<4sI", header)
+        if chunk_type == b"EXIF":
+            return _read_exif_ascii(f.read(length))
+        f.seek(length + (length & 1), os.SEEK_CUR)
+
+
+def read_embedded_metadata(path: Path) -> Dict[str, Any]:
+    """Return the parsed workflow/prompt JSON embedded in a PNG or WebP file."""
+    with open(path, "rb") as f:
+        head = f.read(12)
+        try:
+            if head.startswith(PNG_SIGNATURE):
+                texts = read_png_text(f)
+            elif head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+                texts = read_webp_text(f)
+            else:
+                texts = {}
+        except MALFORMED_METADATA as e:
+            logger.warning(f"Ignoring malformed metadata in {path}: {e}")
+            texts = {}
+
+    metadata: Dict[str, Any] = {}
+    for key, text in texts.items():
+        try:
+            metadata[key] = json.loads(text)
+        except json.JSONDecodeError as e:
+            logger.warning(f"Ignoring malformed {key} metadata in {path}: {e}")
+    return metadata
+
+
+class WorkflowCache:
+    """
+    Parsed embedded workflows keyed by (path, mtime, size).
+
+    Parsed payloads are kept pre-encoded in a bounded LRU. A separate,
+    larger LRU remembers, per path, whether the version last read (by
+    mtime and size) had a workflow at all, which is what listings need.
+    Listings only look that answer up, never stat, so it is a hint that
+    can be stale until the file is read again; the frontend falls back
+    to the image itself when the hint is wrong.
+    """
+
+    def __init__(self, max_entries: int = 256, max_known: int = 4096):
+        self.max_entries = max_entries
+        self.max_known = max_known
+        self._bodies: "OrderedDict[Tuple[str, int, int], Optional[bytes]]" = OrderedDict()
+        self._has_workflow: "OrderedDict[str, Tuple[int, int, bool]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, path: Path) -> Optional[bytes]:
+        """Return the JSON body for path's embedded metadata, or None if it has none."""
+        st = os.stat(path)
+        key = (str(path), st.st_mtime_ns, st.st_size)
+
+        with self._lock:
+            if key in self._bodies:
+                self.hits += 1
+                self._bodies.move_to_end(key)
+                return self._bodies[key]
+            self.misses += 1
+
+        metadata = read_embedded_metadata(path)
+        body = json.dumps(metadata).encode("utf-8") if metadata else None
+
+        with self._lock:
+            self._bodies[key] = body
+            if len(self._bodies) > self.max_entries:
+                self._bodies.popitem(last=False)
+            # One entry per path: reading a newer version replaces the old answer
+            self._has_workflow[str(path)] = (st.st_mtime_ns, st.st_size, "workflow" in metadata)
+            self._has_workflow.move_to_end(str(path))
+            if len(self._has_workflow) > self.max_known:
+                self._has_workflow.popitem(last=False)
+        return body
+
+    def has_workflow(self, path: Path) -> Optional[bool]:
+        """
+        Whether path embedded a workflow when it was last read, or None if
+        it has not been read (or was evicted). Does not touch the disk.
+        """
+        with self._lock:
+            known = self._has_workflow.get(str(path))
+        return None if known is None else known[2]
+
+    def has_workflows(self, folder: Path, filenames: Iterable[str]) -> Dict[str, bool]:
+        """has_workflow for each file of a listing, leaving out unknown ones."""
+        prefix = os.path.join(str(folder), "")
+        with self._lock:
+            known = self._has_workflow
+            return {name: known[prefix + name][2] for name in filenames if prefix + name in known}
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self._bodies),
+                "known": len(self._has_workflow),
+            }
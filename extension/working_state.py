@@ -0,0 +1,149 @@
+import os
+import time
+import asyncio
+import logging
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from .executor import storage
+from .record_codecs import decode, get_codec
+
+logger = logging.getLogger(__name__)
+
+
+class WorkingState:
+    """
+    The working diff and remaps shared by every browser tab.
+
+    Updates are applied to an in-memory copy and written back to disk
+    behind the caller's back: a flush is scheduled `delay` seconds after
+    the last update, but never later than `max_delay` after the first
+    unflushed one, so a burst of edits costs one write and a crash loses
+    at most max_delay seconds of changes. Each flush writes a temporary
+    file, fsyncs it and renames it over the previous state.
+    """
+
+    def __init__(self, path: Optional[Path] = None, delay: float = 0.5, max_delay: float = 2.0):
+        if path is None:
+            path = Path(__file__).parent.parent / "data" / "working.json"
+        self.path = path
+        self.delay = delay
+        self.max_delay = max_delay
+        self._state: Optional[Dict[str, Any]] = None
+        self._dirty_since: Optional[float] = None
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._flush_lock = asyncio.Lock()
+        self.flushes = 0
+        self.updates = 0
+
+    def _read(self) -> Dict[str, Any]:
+        try:
+            with open(self.path, 'rb') as f:
+                state = decode(f.read())
+        except FileNotFoundError:
+            state = {}
+        except (ValueError, IOError) as e:
+            logger.warning(f"Ignoring unreadable working state {self.path}: {e}")
+            state = {}
+        return {
+            "diff": state.get("diff") or {},
+            "remaps": state.get("remaps") or [],
+            "revision": state.get("revision", 0),
+            "updated": state.get("updated"),
+        }
+
+    async def _load(self) -> Dict[str, Any]:
+        if self._state is None:
+            state = await storage.run("working.load", self._read)
+            # Another caller may have loaded it while we were reading
+            if self._state is None:
+                self._state = state
+        return self._state
+
+    async def get(self) -> Dict[str, Any]:
+        """Return the current state: {'diff', 'remaps', 'revision', 'updated'}."""
+        state = await self._load()
+        return dict(state)
+
+    async def update(
+        self,
+        diff: Optional[Dict[str, Any]] = None,
+        nodes: Optional[Dict[str, Any]] = None,
+        remaps: Optional[List[Any]] = None,
+    ) -> int:
+        """
+        Apply an update and schedule a flush; returns the new revision.
+
+        diff replaces the whole working diff, nodes replaces individual node
+        entries (None removes one), and remaps replaces the remap list.
+        """
+        state = await self._load()
+        if diff is not None:
+            state["diff"] = dict(diff)
+        if nodes:
+            merged = dict(state["diff"])
+            for node_id, node_diff in nodes.items():
+                if node_diff is None:
+                    merged.pop(node_id, None)
+                else:
+                    merged[node_id] = node_diff
+            state["diff"] = merged
+        if remaps is not None:
+            state["remaps"] = list(remaps)
+
+        state["revision"] += 1
+        state["updated"] = time.time()
+        self.updates += 1
+        self._schedule()
+        return state["revision"]
+
+    async def clear(self) -> int:
+        return await self.update(diff={}, remaps=[])
+
+    def _schedule(self) -> None:
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        if self._dirty_since is None:
+            self._dirty_since = now
+        if self._timer is not None:
+            self._timer.cancel()
+        delay = max(0.0, min(self.delay, self._dirty_since + self.max_delay - now))
+        self._timer = loop.call_later(delay, lambda: asyncio.ensure_future(self.flush()))
+
+    async def flush(self) -> bool:
+        """Write pending changes now; returns whether anything was written."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        # One flush at a time, so renames land in the order of the snapshots
+        async with self._flush_lock:
+            if self._dirty_since is None or self._state is None:
+                return False
+            self._dirty_since = None
+            snapshot = dict(self._state)
+            try:
+                await storage.run("working.flush", self._write, snapshot)
+            except Exception as e:
+                logger.error(f"Failed to write working state {self.path}: {e}")
+                # Keep the changes pending so the next update retries the write
+                self._dirty_since = asyncio.get_running_loop().time()
+                return False
+        self.flushes += 1
+        return True
+
+    def _write(self, state: Dict[str, Any]) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp_path, 'wb') as f:
+            f.write(get_codec("compact").encode(state))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "updates": self.updates,
+            "flushes": self.flushes,
+            "pending": self._dirty_since is not None,
+            "revision": self._state["revision"] if self._state is not None else None,
+        }
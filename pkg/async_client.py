@@ -0,0 +1,147 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+import aiohttp
+
+from pkg.client import (
+    PromptReplaceDetail,
+    RebaseClientError,
+    _as_event,
+    generate_event,
+    prompt_replace_event,
+)
+
+logger = logging.getLogger(__name__)
+
+# Only failures that happen before the request reaches the server are
+# retried; anything later (timeouts, 5xx) may already have queued a render.
+RETRY_ERRORS = (aiohttp.ClientConnectorError,)
+
+
+class AsyncRebaseClient:
+    """
+    asyncio counterpart of RebaseClient for scripts driving many jobs or hosts.
+
+    Requests share one keep-alive connection pool. At most max_in_flight
+    requests run at once. Connection failures (refused, DNS) are retried
+    with exponential backoff; errors after the request was sent are not,
+    since replaying a 'generate' could queue its renders twice. Failures
+    surface as RebaseClientError just like the synchronous client.
+
+        async with AsyncRebaseClient("http://gpu-box:8188") as client:
+            await client.submit_job(detail, 2)
+    """
+
+    def __init__(
+        self,
+        base_url: str = "http://localhost:8191",
+        timeout: float = 10.0,
+        max_in_flight: int = 8,
+        retries: int = 2,
+        backoff: float = 0.5,
+        max_backoff: float = 8.0,
+    ) -> None:
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.max_in_flight = max_in_flight
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    async def __aenter__(self) -> "AsyncRebaseClient":
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    # ----- Low-level -----
+
+    def _ensure_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.max_in_flight)
+            self._session = aiohttp.ClientSession(connector=connector)
+            self._semaphore = asyncio.Semaphore(self.max_in_flight)
+        return self._session
+
+    async def _post_json(
+        self,
+        path: str,
+        payload: Dict[str, Any],
+        timeout: Optional[float] = None,
+    ) -> Dict[str, Any]:
+        session = self._ensure_session()
+        url = f"{self.base_url}{path}"
+        client_timeout = aiohttp.ClientTimeout(total=self.timeout if timeout is None else timeout)
+
+        for attempt in range(self.retries + 1):
+            try:
+                async with self._semaphore:
+                    async with session.post(url, json=payload, timeout=client_timeout) as resp:
+                        resp.raise_for_status()
+                        # backend returns {'success': True} or {'error': ...}
+                        try:
+                            return await resp.json(content_type=None)
+                        except ValueError:
+                            text = await resp.text()
+                            raise RebaseClientError(f"Non-JSON response from {url}: {text[:200]}")
+            except RETRY_ERRORS as e:
+                if attempt == self.retries:
+                    raise RebaseClientError(f"POST {url} failed: {e!r}") from e
+                logger.debug(f"POST {url} failed ({e!r}), retrying")
+            except aiohttp.ClientResponseError as e:
+                raise RebaseClientError(f"POST {url} failed: {e}") from e
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                raise RebaseClientError(f"POST {url} failed: {e!r}") from e
+
+            # Back off without holding a slot other requests could use
+            await asyncio.sleep(min(self.backoff * 2 ** attempt, self.max_backoff))
+
+        raise RebaseClientError(f"POST {url} failed after {self.retries + 1} attempts")
+
+    # ----- High-level convenience -----
+
+    async def prompt_replace(
+        self,
+        detail: PromptReplaceDetail | Dict[str, Any] = PromptReplaceDetail(),
+        timeout: Optional[float] = None,
+    ) -> Dict[str, Any]:
+        """Send a 'prompt_replace' event."""
+        return await self._post_json("/rebase/forward", prompt_replace_event(detail), timeout)
+
+    async def generate(self, count: int, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """Send a 'generate' event."""
+        return await self._post_json("/rebase/forward", generate_event(count), timeout)
+
+    async def send_batch(
+        self,
+        events: Iterable[Dict[str, Any] | Tuple[str, Any]],
+        timeout: Optional[float] = None,
+    ) -> Dict[str, Any]:
+        """Send several events in one request; they are delivered in order."""
+        payload = {"events": [_as_event(item) for item in events]}
+        if not payload["events"]:
+            raise ValueError("events must not be empty")
+        return await self._post_json("/rebase/forward/batch", payload, timeout)
+
+    async def submit_job(
+        self,
+        detail: PromptReplaceDetail | Dict[str, Any],
+        count: int,
+        timeout: Optional[float] = None,
+    ) -> Dict[str, Any]:
+        """Send a 'prompt_replace' followed by a 'generate' in one round trip."""
+        return await self.send_batch([prompt_replace_event(detail), generate_event(count)], timeout)
+
+    async def reset(self, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """Trigger the special reset route (sends a 'load_graph' event with a base template)."""
+        return await self._post_json("/rebase/reset", {}, timeout)
@@ -2,16 +2,22 @@
 """
 Batch processor for ComfyUI image generation.
 Scans a directory for image/text pairs and processes them through the ComfyUI API.
+
+    python -m pkg.batch_processor <directory> --gens 2 --target-depth 2
 """
 
 import os
 import sys
 import argparse
 import time
-import json
-import requests
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from PIL import Image
+
+from pkg.image_size import ImageSizeCache, read_image_size
+from pkg.client import PromptReplaceDetail, QueuePacer, RebaseClient, RebaseClientError, Resolution
+
+DEFAULT_SIZE_CACHE = Path.home() / ".cache" / "comfyui-rebase" / "image_sizes.json"
 
 
 def find_image_text_pairs(directory):
@@ -45,11 +51,12 @@ def find_image_text_pairs(directory):
     return pairs, missing_text
 
 
-def get_image_resolution(image_path):
-    """Get image resolution using PIL."""
+def get_image_resolution(image_path, size_cache=None):
+    """Get image resolution from the file header (PIL for unusual files)."""
     try:
-        with Image.open(image_path) as img:
-            return img.size  # Returns (width, height)
+        if size_cache is not None:
+            return size_cache.get(image_path)
+        return read_image_size(image_path)  # Returns (width, height)
     except Exception as e:
         print(f"Error reading image {image_path}: {e}")
         return None
@@ -65,50 +72,64 @@ def read_prompt_file(text_path):
         return None
 
 
-def send_prompt_replace(base_url, prompt, resolution):
-    """Send promptReplace event to ComfyUI."""
-    url = f"{base_url}/rebase/forward"
-    payload = {
-        "event": "prompt_replace",
-        "data": {
-            "positive_prompt": prompt,
-            "resolution": {
-                "width": resolution[0],
-                "height": resolution[1]
-            }
-        }
-    }
+def prepare_pair(image_path, text_path, size_cache=None):
+    """
+    Resolve everything needed to submit a pair.
+    Returns ((resolution, prompt), None) on success or (None, error) on failure.
+    """
+    resolution = get_image_resolution(image_path, size_cache)
+    if not resolution:
+        return None, "Failed to read image resolution"
 
-    try:
-        response = requests.post(url, json=payload, timeout=10)
-        response.raise_for_status()
-        return True
-    except requests.exceptions.RequestException as e:
-        print(f"Error sending prompt_replace: {e}")
-        return False
-
-
-def send_generate_images(base_url, count):
-    """Send generateImages event to ComfyUI."""
-    url = f"{base_url}/rebase/forward"
-    payload = {
-        "event": "generate",
-        "data": {
-            "count": count
-        }
-    }
+    prompt = read_prompt_file(text_path)
+    if not prompt:
+        return None, "Failed to read prompt"
+
+    return (resolution, prompt), None
+
+
+def iter_prepared_pairs(pairs, workers=4, lookahead=8, size_cache=None):
+    """
+    Yield (index, (image_path, text_path), prepared, error) in input order.
+
+    A thread pool prepares up to `lookahead` upcoming pairs while the caller
+    submits the current one, so disk reads overlap with network round trips.
+    """
+    pool = ThreadPoolExecutor(max_workers=workers)
+    pending = deque()
+    remaining = iter(enumerate(pairs, 1))
+
+    def fill():
+        while len(pending) < lookahead:
+            try:
+                i, pair = next(remaining)
+            except StopIteration:
+                return
+            pending.append((i, pair, pool.submit(prepare_pair, *pair, size_cache)))
 
     try:
-        response = requests.post(url, json=payload, timeout=10)
-        response.raise_for_status()
-        return True
-    except requests.exceptions.RequestException as e:
-        print(f"Error sending generateImages: {e}")
-        return False
+        fill()
+        while pending:
+            i, pair, future = pending.popleft()
+            fill()
+            try:
+                prepared, error = future.result()
+            except Exception as e:
+                prepared, error = None, f"Failed to prepare pair: {e}"
+            yield i, pair, prepared, error
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
 
+def job_detail(prompt, resolution):
+    """Build the prompt_replace detail for one image/text pair."""
+    return PromptReplaceDetail(positive_prompt=prompt, resolution=Resolution(*resolution))
 
-def process_batch(directory, base_url, gens_per_image, randomize, delay_between_batches):
+
+def process_batch(directory, base_url, gens_per_image, randomize, delay_between_batches, workers=4, lookahead=8, target_depth=None, size_cache=None, server_queue=False, wait_ack=False, client=None):
     """Process all image/text pairs in the directory."""
+    client = client or RebaseClient(base_url)
+    pacer = QueuePacer(client, target_depth) if target_depth else None
 
     # Find pairs
     print(f"Scanning directory: {directory}")
@@ -139,6 +160,10 @@ def process_batch(directory, base_url, gens_per_image, randomize, delay_between_
         print(f"  ... and {len(pairs) - 5} more")
 
     print(f"\nGenerations per image: {gens_per_image}")
+    if server_queue:
+        print("Pacing: jobs are queued on the server and dispatched as ComfyUI's queue drains")
+    elif target_depth:
+        print(f"Pacing: keep ComfyUI queue below {target_depth} prompt(s)")
     print(f"Total generations: {len(pairs) * gens_per_image}")
 
     # Confirm with user
@@ -155,52 +180,65 @@ def process_batch(directory, base_url, gens_per_image, randomize, delay_between_
     print(f"\nStarting batch processing...")
     successful = 0
     failed = 0
+    server_jobs = []
 
-    for i, (image_path, text_path) in enumerate(pairs, 1):
+    for i, (image_path, text_path), prepared, error in iter_prepared_pairs(pairs, workers, lookahead, size_cache):
         print(f"\n[{i}/{len(pairs)}] Processing {image_path.name}")
 
-        # Get image resolution
-        resolution = get_image_resolution(image_path)
-        if not resolution:
-            print(f"  ❌ Failed to read image resolution")
+        # Resolution and prompt were read ahead of time by the worker pool
+        if error:
+            print(f"  ❌ {error}")
             failed += 1
             continue
+        resolution, prompt = prepared
 
-        # Read prompt
-        prompt = read_prompt_file(text_path)
-        if not prompt:
-            print(f"  ❌ Failed to read prompt")
-            failed += 1
+        if server_queue:
+            server_jobs.append((job_detail(prompt, resolution), gens_per_image))
             continue
 
+        # Adaptive pacing: wait for the GPU queue to drain to the target depth
+        if pacer is not None:
+            try:
+                pacer.wait_for_slot()
+            except RebaseClientError as e:
+                print(f"  ⚠️  Queue status unavailable ({e}), falling back to {delay_between_batches}s delay")
+                pacer = None
+
         print(f"  📏 Resolution: {resolution[0]}x{resolution[1]}")
         print(f"  📝 Prompt: {prompt[:100]}{'...' if len(prompt) > 100 else ''}")
 
-        # Send promptReplace
-        print(f"  🔄 Sending prompt and resolution...")
-        if not send_prompt_replace(base_url, prompt, resolution):
-            print(f"  ❌ Failed to send promptReplace")
-            failed += 1
-            continue
-
-        # Small delay
-        time.sleep(0.5)
-
-        # Send generateImages
-        print(f"  🎨 Requesting {gens_per_image} generation(s)...")
-        if not send_generate_images(base_url, gens_per_image):
-            print(f"  ❌ Failed to send generateImages")
+        # Send promptReplace + generateImages; the browser handles them in order
+        print(f"  🎨 Sending prompt and requesting {gens_per_image} generation(s)...")
+        try:
+            client.submit_job(job_detail(prompt, resolution), gens_per_image, wait=wait_ack)
+        except RebaseClientError as e:
+            print(f"  ❌ Failed to send job: {e}")
             failed += 1
             continue
 
         print(f"  ✅ Batch submitted successfully")
         successful += 1
 
+        # An acknowledged generate has already reached the queue, so there is nothing in transit
+        if pacer is not None and not wait_ack:
+            pacer.submitted(gens_per_image)
+
         # Delay between batches (except for the last one)
-        if i < len(pairs):
+        if i < len(pairs) and pacer is None:
             print(f"  ⏸️  Waiting {delay_between_batches}s before next batch...")
             time.sleep(delay_between_batches)
 
+    if server_jobs:
+        print(f"\n📬 Queuing {len(server_jobs)} job(s) on the server...")
+        try:
+            ids = client.queue_jobs(server_jobs)
+        except RebaseClientError as e:
+            print(f"  ❌ Failed to queue jobs: {e}")
+            failed += len(server_jobs)
+        else:
+            print(f"  ✅ Queued jobs {ids[0]}-{ids[-1]}; track them with GET /rebase/jobs")
+            successful += len(ids)
+
     # Final report
     print(f"\n{'='*50}")
     print(f"Batch processing complete!")
@@ -216,6 +254,12 @@ def main():
     parser.add_argument("--gens", type=int, help="Number of generations per image (will prompt if not specified)")
     parser.add_argument("--delay", type=float, default=3.0, help="Delay between batches in seconds (default: 3.0)")
     parser.add_argument("--randomize", action="store_true", help="Randomize the order of image/text pairs before processing")
+    parser.add_argument("--target-depth", type=int, help="Pace submissions by keeping ComfyUI's queue below this many prompts instead of using --delay")
+    parser.add_argument("--server-queue", action="store_true", help="Queue all jobs on the server, which dispatches them as ComfyUI's queue drains; the script can exit right away")
+    parser.add_argument("--wait-ack", action="store_true", help="Wait for the browser to acknowledge each job before moving on (needs the updated frontend)")
+    parser.add_argument("--size-cache", default=str(DEFAULT_SIZE_CACHE), help=f"Image size cache file, or 'none' to disable (default: {DEFAULT_SIZE_CACHE})")
+    parser.add_argument("--workers", type=int, default=4, help="Threads preparing upcoming pairs (default: 4)")
+    parser.add_argument("--lookahead", type=int, default=8, help="Maximum number of pairs prepared ahead of submission (default: 8)")
 
     args = parser.parse_args()
 
@@ -241,14 +285,26 @@ def main():
         print("Error: Generations per image must be between 1 and 8")
         sys.exit(1)
 
+    size_cache = None if args.size_cache.lower() == "none" else ImageSizeCache(Path(args.size_cache))
+
     try:
-        process_batch(args.directory, args.url, gens_per_image, args.randomize, args.delay)
+        process_batch(
+            args.directory, args.url, gens_per_image, args.randomize, args.delay,
+            workers=max(1, args.workers), lookahead=max(1, args.lookahead),
+            target_depth=args.target_depth,
+            server_queue=args.server_queue,
+            size_cache=size_cache,
+            wait_ack=args.wait_ack,
+        )
     except KeyboardInterrupt:
         print("\n\nProcessing interrupted by user.")
         sys.exit(1)
     except Exception as e:
         print(f"\nError during processing: {e}")
         sys.exit(1)
+    finally:
+        if size_cache is not None:
+            size_cache.save()
 
 
 if __name__ == "__main__":
@@ -1,13 +1,18 @@
 from __future__ import annotations
 
+import json
 import logging
+import time
 from dataclasses import dataclass, asdict, is_dataclass
-from typing import Any, Dict, Optional
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
 
 import requests
 
 logger = logging.getLogger(__name__)
 
+# Seconds the server waits for the browser to acknowledge an event (?wait=true)
+DEFAULT_ACK_TIMEOUT = 30.0
+
 
 class RebaseClientError(Exception):
     """Raised when the Rebase client fails to send or parse a request."""
@@ -64,13 +69,46 @@ class PromptReplaceDetail:
         return _drop_none(self)
 
 
+def prompt_replace_event(detail: PromptReplaceDetail | Dict[str, Any]) -> Dict[str, Any]:
+    """Build the wire form of a 'prompt_replace' event."""
+    data = detail.to_wire() if isinstance(detail, PromptReplaceDetail) else _drop_none(detail)
+    return {"event": "prompt_replace", "data": data}
+
+
+def generate_event(count: int) -> Dict[str, Any]:
+    """Build the wire form of a 'generate' event."""
+    if not isinstance(count, int) or count < 1 or count > 8:
+        raise ValueError("count must be an integer between 1 and 8")
+    return {"event": "generate", "data": {"count": count}}
+
+
+def _as_event(item: Dict[str, Any] | Tuple[str, Any]) -> Dict[str, Any]:
+    if isinstance(item, dict):
+        return item
+    event, data = item
+    if event == "prompt_replace":
+        return prompt_replace_event(data)
+    return {"event": event, "data": _drop_none(data)}
+
+
+def _prompt_ids(result: Any) -> List[str]:
+    # Older frontends acknowledge without a result
+    if isinstance(result, dict):
+        return list(result.get("prompt_ids") or [])
+    return []
+
+
 class RebaseClient:
     """
     Minimal client for the Rebase endpoints.
 
     Endpoints:
-      - POST {base_url}/rebase/forward  (event fanout to websocket)
-      - POST {base_url}/rebase/reset    (load base workflow template)
+      - POST {base_url}/rebase/forward        (event fanout to websocket; ?wait=true waits for the browser)
+      - POST {base_url}/rebase/forward/batch  (ordered list of events, one round trip)
+      - POST {base_url}/rebase/reset          (load base workflow template)
+      - GET  {base_url}/rebase/queue          (ComfyUI queue depth)
+      - POST {base_url}/rebase/jobs           (durable server-side job queue)
+      - GET  {base_url}/rebase/events         (server-sent ComfyUI execution events)
 
     Events supported by /rebase/forward:
       - 'prompt_replace': data := PromptReplaceDetail
@@ -84,10 +122,10 @@ class RebaseClient:
 
     # ----- Low-level -----
 
-    def _post_json(self, path: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+    def _post_json(self, path: str, payload: Dict[str, Any], timeout: Optional[float] = None) -> Dict[str, Any]:
         url = f"{self.base_url}{path}"
         try:
-            resp = self._session.post(url, json=payload, timeout=self.timeout)
+            resp = self._session.post(url, json=payload, timeout=self.timeout if timeout is None else timeout)
             resp.raise_for_status()
             # backend returns {'success': True} or {'error': ...}
             try:
@@ -97,28 +135,261 @@ class RebaseClient:
         except requests.RequestException as e:
             raise RebaseClientError(f"POST {url} failed: {e}") from e
 
+    def _get_json(self, path: str) -> Dict[str, Any]:
+        url = f"{self.base_url}{path}"
+        try:
+            resp = self._session.get(url, timeout=self.timeout)
+            resp.raise_for_status()
+            try:
+                return resp.json()
+            except ValueError:
+                raise RebaseClientError(f"Non-JSON response from {url}: {resp.text[:200]}")
+        except requests.RequestException as e:
+            raise RebaseClientError(f"GET {url} failed: {e}") from e
+
+    def _forward(self, path: str, payload: Dict[str, Any], wait: bool, ack_timeout: float) -> Dict[str, Any]:
+        if not wait:
+            return self._post_json(path, payload)
+        # The server holds the request until the browser acknowledges the event
+        return self._post_json(f"{path}?wait=true&timeout={ack_timeout:g}", payload, timeout=self.timeout + ack_timeout)
+
     # ----- High-level convenience -----
 
     def prompt_replace(
         self,
         detail: PromptReplaceDetail | Dict[str, Any] = PromptReplaceDetail(),
+        wait: bool = False,
+        ack_timeout: float = DEFAULT_ACK_TIMEOUT,
     ) -> Dict[str, Any]:
         """
         Send a 'prompt_replace' event.
+
+        With wait=True this returns once the browser has applied the event
+        (RebaseClientError if it fails or does not answer within ack_timeout).
         """
-        data = detail.to_wire() if isinstance(detail, PromptReplaceDetail) else _drop_none(detail)
-        payload = {"event": "prompt_replace", "data": data}
-        return self._post_json("/rebase/forward", payload)
+        return self._forward("/rebase/forward", prompt_replace_event(detail), wait, ack_timeout)
 
-    def generate(self, count: int) -> Dict[str, Any]:
+    def generate(self, count: int, wait: bool = False, ack_timeout: float = DEFAULT_ACK_TIMEOUT) -> Dict[str, Any]:
         """
-        Send a 'generate' event.
+        Send a 'generate' event; wait=True returns once the prompts are queued.
+
+        With wait=True the response's 'prompt_ids' lists the prompts the
+        browser queued, ready for iter_events(prompt_ids=...).
+        """
+        response = self._forward("/rebase/forward", generate_event(count), wait, ack_timeout)
+        if wait:
+            response["prompt_ids"] = _prompt_ids(response.get("result"))
+        return response
+
+    def send_batch(
+        self,
+        events: Iterable[Dict[str, Any] | Tuple[str, Any]],
+        wait: bool = False,
+        ack_timeout: float = DEFAULT_ACK_TIMEOUT,
+    ) -> Dict[str, Any]:
+        """
+        Send several events in one request; they are delivered in order.
+
+        Each item is either a wire dict ({'event': ..., 'data': ...}) or an
+        (event, data) tuple. The server rejects the whole batch if any event
+        is unsupported, so nothing is delivered partially. wait=True returns
+        once the browser has handled every event.
         """
-        if not isinstance(count, int) or count < 1 or count > 8:
-            raise ValueError("count must be an integer between 1 and 8")
-        payload = {"event": "generate", "data": {"count": count}}
-        return self._post_json("/rebase/forward", payload)
+        payload = {"events": [_as_event(item) for item in events]}
+        if not payload["events"]:
+            raise ValueError("events must not be empty")
+        return self._forward("/rebase/forward/batch", payload, wait, ack_timeout)
+
+    def submit_job(
+        self,
+        detail: PromptReplaceDetail | Dict[str, Any],
+        count: int,
+        wait: bool = False,
+        ack_timeout: float = DEFAULT_ACK_TIMEOUT,
+    ) -> Dict[str, Any]:
+        """
+        Send a 'prompt_replace' followed by a 'generate' in one round trip.
+        wait=True adds the queued 'prompt_ids', as generate() does.
+        """
+        response = self.send_batch([prompt_replace_event(detail), generate_event(count)], wait, ack_timeout)
+        if wait:
+            acks = response.get("acks") or []
+            response["prompt_ids"] = _prompt_ids(acks[-1].get("result") if acks else None)
+        return response
 
     def reset(self) -> Dict[str, Any]:
         """Trigger the special reset route (sends a 'load_graph' event with a base template)."""
         return self._post_json("/rebase/reset", {})
+
+    def queue_status(self) -> Dict[str, Any]:
+        """
+        Read ComfyUI's queue depth.
+        Returns {'running', 'pending', 'remaining', 'submitted'}.
+        """
+        return self._get_json("/rebase/queue")
+
+    # ----- Server-side job queue -----
+
+    def queue_jobs(
+        self,
+        jobs: Iterable[Tuple[PromptReplaceDetail | Dict[str, Any], int]],
+    ) -> List[int]:
+        """
+        Hand (detail, count) jobs to the server's persistent queue and return
+        their ids. The server dispatches them as ComfyUI's queue drains, so
+        they survive this process exiting.
+        """
+        payload = {"jobs": [
+            {"detail": prompt_replace_event(detail)["data"], "count": generate_event(count)["data"]["count"]}
+            for detail, count in jobs
+        ]}
+        if not payload["jobs"]:
+            raise ValueError("jobs must not be empty")
+        return self._post_json("/rebase/jobs", payload)["ids"]
+
+    def job_status(self, job_id: int) -> Dict[str, Any]:
+        """Read one job: {'id', 'status', 'attempts', 'error', ...}."""
+        return self._get_json(f"/rebase/jobs/{job_id}")
+
+    def list_jobs(self, status: Optional[str] = None) -> Dict[str, Any]:
+        """List queued jobs, optionally by status. Returns {'jobs', 'counts'}."""
+        return self._get_json("/rebase/jobs" + (f"?status={status}" if status else ""))
+
+    def cancel_job(self, job_id: int) -> Dict[str, Any]:
+        """Cancel a job that has not been dispatched yet."""
+        return self._post_json(f"/rebase/jobs/{job_id}/cancel", {})
+
+    def retry_job(self, job_id: int) -> Dict[str, Any]:
+        """Queue a failed, cancelled or dispatched job again."""
+        return self._post_json(f"/rebase/jobs/{job_id}/retry", {})
+
+    # ----- Execution events -----
+
+    def iter_events(
+        self,
+        prompt_ids: Optional[Iterable[str]] = None,
+        events: Optional[Iterable[str]] = None,
+        until_finished: bool = False,
+        read_timeout: float = 60.0,
+        since: Optional[int] = 0,
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Stream ComfyUI execution events from /rebase/events as they happen.
+
+        Yields {'id', 'event', 'data'} dicts, e.g. 'executing', 'progress',
+        'executed', 'execution_success'. With prompt_ids only their events
+        are relayed, and until_finished ends the stream once every one of
+        them has finished. since replays the server's recent events after
+        that id first; the default of 0 replays everything it still holds,
+        so events of a prompt queued just before the call are not missed
+        (None only streams new events). A 'dropped' event means the server
+        discarded events because this reader fell behind. The server sends
+        keepalives, so read_timeout only trips when the connection is
+        really gone.
+        """
+        params = {}
+        if prompt_ids:
+            params["prompt_id"] = ",".join(prompt_ids)
+        if events:
+            params["events"] = ",".join(events)
+        if until_finished:
+            if not prompt_ids:
+                raise ValueError("until_finished needs prompt_ids")
+            params["until"] = "finished"
+        if since is not None:
+            params["since"] = str(since)
+
+        url = f"{self.base_url}/rebase/events"
+        try:
+            resp = self._session.get(url, params=params, stream=True, timeout=(self.timeout, read_timeout))
+            resp.raise_for_status()
+        except requests.RequestException as e:
+            raise RebaseClientError(f"GET {url} failed: {e}") from e
+
+        with resp:
+            try:
+                yield from parse_sse(resp.iter_lines(decode_unicode=True))
+            except requests.RequestException as e:
+                raise RebaseClientError(f"Event stream {url} failed: {e}") from e
+
+
+def parse_sse(lines: Iterable[str]) -> Iterator[Dict[str, Any]]:
+    """Turn server-sent-event lines into {'id', 'event', 'data'} dicts."""
+    fields: Dict[str, Any] = {}
+    data: List[str] = []
+    for line in lines:
+        if not line:
+            if data:
+                yield {"id": fields.get("id"), "event": fields.get("event", "message"), "data": json.loads("\n".join(data))}
+            fields, data = {}, []
+        elif line.startswith(":"):
+            continue
+        else:
+            name, _, value = line.partition(":")
+            value = value[1:] if value.startswith(" ") else value
+            if name == "data":
+                data.append(value)
+            elif name == "id":
+                fields["id"] = int(value) if value.isdigit() else value
+            else:
+                fields[name] = value
+
+
+class QueuePacer:
+    """
+    Paces job submission by ComfyUI's queue depth instead of fixed sleeps.
+
+    Call wait_for_slot() before each job and submitted(count) after it.
+    A forwarded 'generate' only reaches the queue once the browser has
+    queued it, so generations that have not shown up in the server's
+    'submitted' counter yet are counted as in transit. After settle_timeout
+    seconds they are no longer counted.
+
+        pacer = QueuePacer(client, target_depth=2)
+        for detail in details:
+            pacer.wait_for_slot()
+            client.submit_job(detail, 2)
+            pacer.submitted(2)
+    """
+
+    def __init__(
+        self,
+        client: RebaseClient,
+        target_depth: int = 2,
+        poll_interval: float = 0.5,
+        settle_timeout: float = 15.0,
+    ) -> None:
+        if target_depth < 1:
+            raise ValueError("target_depth must be at least 1")
+        self.client = client
+        self.target_depth = target_depth
+        self.poll_interval = poll_interval
+        self.settle_timeout = settle_timeout
+        self._expected_submitted: Optional[int] = None
+        self._last_submitted: Optional[int] = None
+        self._submitted_at = 0.0
+
+    def depth(self) -> int:
+        """Current queue depth plus generations still in transit from the browser."""
+        status = self.client.queue_status()
+        self._last_submitted = status.get("submitted")
+        in_transit = 0
+        if self._expected_submitted is not None and self._last_submitted is not None:
+            if time.monotonic() - self._submitted_at < self.settle_timeout:
+                in_transit = max(0, self._expected_submitted - self._last_submitted)
+        return status["remaining"] + in_transit
+
+    def wait_for_slot(self) -> None:
+        """Block until the queue has dropped below the target depth."""
+        while self.depth() >= self.target_depth:
+            time.sleep(self.poll_interval)
+
+    def submitted(self, count: int) -> None:
+        """Record that a job queuing `count` generations was just forwarded."""
+        if self._last_submitted is None:
+            return
+        base = self._last_submitted
+        if self._expected_submitted is not None and time.monotonic() - self._submitted_at < self.settle_timeout:
+            base = max(base, self._expected_submitted)
+        self._expected_submitted = base + count
+        self._submitted_at = time.monotonic()
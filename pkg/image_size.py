@@ -0,0 +1,163 @@
+"""
+Header-only image dimension reading with a persistent cache.
+
+PNG, JPEG and WebP sizes are parsed straight from the file header, which
+usually means reading well under a few KB instead of decoding the image.
+Anything the parsers do not recognise falls back to PIL.
+"""
+
+import os
+import json
+import struct
+import logging
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+# SOFn markers carry the frame size; C4 (DHT), C8 (JPG) and CC (DAC) do not.
+JPEG_SOF_MARKERS = set(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+JPEG_MAX_SEGMENTS = 256
+
+Size = Tuple[int, int]
+
+
+def _png_size(head: bytes) -> Optional[Size]:
+    if len(head) >= 24 and head[12:16] == b"IHDR":
+        return struct.unpack(">II", head[16:24])
+    return None
+
+
+def _webp_size(head: bytes) -> Optional[Size]:
+    chunk = head[12:16]
+    if chunk == b"VP8X" and len(head) >= 30:
+        width = int.from_bytes(head[24:27], "little") + 1
+        height = int.from_bytes(head[27:30], "little") + 1
+        return width, height
+    if chunk == b"VP8L" and len(head) >= 25 and head[20] == 0x2F:
+        b0, b1, b2, b3 = head[21:25]
+        width = 1 + (b0 | ((b1 & 0x3F) << 8))
+        height = 1 + ((b1 >> 6) | (b2 << 2) | ((b3 & 0x0F) << 10))
+        return width, height
+    if chunk == b"VP8 " and len(head) >= 30 and head[23:26] == b"\x9d\x01\x2a":
+        width, height = struct.unpack("<HH", head[26:30])
+        return width & 0x3FFF, height & 0x3FFF
+    return None
+
+
+def _jpeg_size(f) -> Optional[Size]:
+    """Walk JPEG segments, seeking past their payloads, until a SOF marker."""
+    f.seek(2)
+    for _ in range(JPEG_MAX_SEGMENTS):
+        byte = f.read(1)
+        while byte and byte != b"\xff":
+            byte = f.read(1)
+        while byte == b"\xff":
+            byte = f.read(1)
+        if not byte:
+            return None
+
+        marker = byte[0]
+        if marker == 0x01 or 0xD0 <= marker <= 0xD8:
+            continue  # standalone markers have no length
+        if marker in (0xD9, 0xDA):
+            return None  # end of image / start of scan before any frame header
+
+        length_bytes = f.read(2)
+        if len(length_bytes) < 2:
+            return None
+        length = struct.unpack(">H", length_bytes)[0]
+        if marker in JPEG_SOF_MARKERS:
+            frame = f.read(5)
+            if len(frame) < 5:
+                return None
+            height, width = struct.unpack(">xHH", frame)
+            return width, height
+        f.seek(length - 2, os.SEEK_CUR)
+    return None
+
+
+def read_header_size(path: Path) -> Optional[Size]:
+    """Parse (width, height) from a PNG, JPEG or WebP header; None if unrecognised."""
+    with open(path, "rb") as f:
+        head = f.read(32)
+        if head.startswith(PNG_SIGNATURE):
+            return _png_size(head)
+        if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+            return _webp_size(head)
+        if head[:2] == b"\xff\xd8":
+            return _jpeg_size(f)
+    return None
+
+
+def read_image_size(path: Path) -> Size:
+    """Return (width, height), trying the header parsers before PIL."""
+    try:
+        size = read_header_size(path)
+    except (OSError, struct.error) as e:
+        logger.debug(f"Header parse failed for {path}: {e}")
+        size = None
+    if size and size[0] > 0 and size[1] > 0:
+        return size
+
+    from PIL import Image
+
+    with Image.open(path) as img:
+        return img.size
+
+
+class ImageSizeCache:
+    """
+    On-disk cache of image sizes keyed by (path, file size, mtime).
+
+    Entries are reused only while the file's size and mtime are unchanged,
+    so re-scanning the same dataset costs one stat per image. Safe to share
+    between worker threads; call save() once the scan is done.
+    """
+
+    def __init__(self, cache_path: Optional[Path] = None):
+        self.cache_path = Path(cache_path) if cache_path else None
+        self._entries: Dict[str, List[int]] = {}
+        self._dirty = False
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        if self.cache_path and self.cache_path.exists():
+            try:
+                with open(self.cache_path, "r", encoding="utf-8") as f:
+                    self._entries = json.load(f)
+            except (json.JSONDecodeError, IOError) as e:
+                logger.warning(f"Ignoring unreadable size cache {self.cache_path}: {e}")
+
+    def get(self, path: Path) -> Size:
+        """Return the cached size for path, reading the header on a miss."""
+        key = str(Path(path).resolve())
+        st = os.stat(key)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] == st.st_size and entry[1] == st.st_mtime_ns:
+                self.hits += 1
+                return entry[2], entry[3]
+
+        width, height = read_image_size(Path(key))
+        with self._lock:
+            self.misses += 1
+            self._entries[key] = [st.st_size, st.st_mtime_ns, width, height]
+            self._dirty = True
+        return width, height
+
+    def save(self) -> None:
+        """Persist new entries with an atomic rename."""
+        with self._lock:
+            if not self.cache_path or not self._dirty:
+                return
+            self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.cache_path.with_name(self.cache_path.name + ".tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self._entries, f)
+            os.replace(tmp_path, self.cache_path)
+            self._dirty = False
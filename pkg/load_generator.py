@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+"""
+Load generator for the rebase event routes.
+
+Drives /rebase/forward (prompt_replace events) and /rebase/reset at one
+or more concurrency levels with a weighted request mix, then reports
+p50/p95/p99 latency, error rate and throughput per operation. A request
+counts as an error when it fails, returns a non-200 status, or reports a
+websocket that did not receive the event in time.
+
+Against a running ComfyUI:
+
+    python -m pkg.load_generator --url http://localhost:8188 --concurrency 1,8,32 --duration 10
+
+Offline, against an in-process stand-in PromptServer whose browser tabs
+take --socket-delay-ms to accept each frame:
+
+    python -m pkg.load_generator --offline --sockets 4 --socket-delay-ms 2 --concurrency 1,16,64
+"""
+
+from __future__ import annotations
+
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import aiohttp
+
+from pkg.client import prompt_replace_event
+
+ROOT = Path(__file__).resolve().parents[1]
+
+PROMPTS = [
+    "Astronaut riding a koi",
+    "Watercolor portrait of a fox, soft light",
+    "Neon city street at night, rain, cinematic",
+    "Isometric forest cabin, detailed",
+]
+
+
+@dataclass
+class OpStats:
+    latencies_ms: List[float] = field(default_factory=list)
+    errors: int = 0
+    undelivered: int = 0
+
+    @property
+    def requests(self) -> int:
+        return len(self.latencies_ms) + self.errors
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(pct / 100 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def parse_mix(text: str) -> List[Tuple[str, float]]:
+    """Parse 'forward=9,reset=1' into [(op, weight), ...]."""
+    mix = []
+    for part in text.split(","):
+        op, _, weight = part.partition("=")
+        op = op.strip()
+        if op not in OPERATIONS:
+            raise argparse.ArgumentTypeError(f"Unknown operation '{op}' (expected one of {', '.join(OPERATIONS)})")
+        mix.append((op, float(weight or 1)))
+    if not mix or sum(w for _, w in mix) <= 0:
+        raise argparse.ArgumentTypeError("Mix needs at least one operation with a positive weight")
+    return mix
+
+
+async def _forward(session: aiohttp.ClientSession, base_url: str) -> Dict[str, Any]:
+    payload = prompt_replace_event({"positive_prompt": random.choice(PROMPTS), "seed": random.randint(0, 2**31)})
+    async with session.post(f"{base_url}/rebase/forward", json=payload) as resp:
+        body = await resp.json(content_type=None)
+        if resp.status != 200:
+            raise RuntimeError(f"HTTP {resp.status}: {body.get('error')}")
+        return body
+
+
+async def _reset(session: aiohttp.ClientSession, base_url: str) -> Dict[str, Any]:
+    async with session.post(f"{base_url}/rebase/reset", json={}) as resp:
+        body = await resp.json(content_type=None)
+        if resp.status != 200:
+            raise RuntimeError(f"HTTP {resp.status}: {body.get('error')}")
+        return body
+
+
+OPERATIONS = {
+    "forward": _forward,
+    "reset": _reset,
+}
+
+
+async def run_level(
+    base_url: str,
+    concurrency: int,
+    mix: List[Tuple[str, float]],
+    duration: Optional[float],
+    requests: Optional[int],
+    timeout: float,
+) -> Dict[str, Any]:
+    """Run one concurrency level with closed-loop workers; returns its report."""
+    ops, weights = zip(*mix)
+    stats = {op: OpStats() for op in ops}
+    remaining = [requests] if requests is not None else None
+    deadline = time.perf_counter() + duration if duration is not None else None
+
+    async def worker(session: aiohttp.ClientSession) -> None:
+        while True:
+            if deadline is not None and time.perf_counter() >= deadline:
+                return
+            if remaining is not None:
+                if remaining[0] <= 0:
+                    return
+                remaining[0] -= 1
+
+            op = random.choices(ops, weights)[0]
+            start = time.perf_counter()
+            try:
+                body = await OPERATIONS[op](session, base_url)
+            except Exception:
+                stats[op].errors += 1
+                continue
+            stats[op].latencies_ms.append((time.perf_counter() - start) * 1000)
+            if body.get("timed_out") or body.get("failed") or body.get("dropped"):
+                stats[op].undelivered += 1
+
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    client_timeout = aiohttp.ClientTimeout(total=timeout)
+    async with aiohttp.ClientSession(connector=connector, timeout=client_timeout) as session:
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(session) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    report: Dict[str, Any] = {"concurrency": concurrency, "elapsed_s": round(elapsed, 3), "operations": {}}
+    total_ok = total_errors = total_undelivered = 0
+    for op, s in stats.items():
+        latencies = sorted(s.latencies_ms)
+        report["operations"][op] = {
+            "requests": s.requests,
+            "errors": s.errors,
+            "undelivered": s.undelivered,
+            "error_rate": round((s.errors + s.undelivered) / s.requests, 4) if s.requests else 0.0,
+            "throughput_rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+            "p50_ms": round(percentile(latencies, 50), 3),
+            "p95_ms": round(percentile(latencies, 95), 3),
+            "p99_ms": round(percentile(latencies, 99), 3),
+            "max_ms": round(latencies[-1], 3) if latencies else 0.0,
+        }
+        total_ok += len(latencies)
+        total_errors += s.errors
+        total_undelivered += s.undelivered
+
+    total = total_ok + total_errors
+    report["throughput_rps"] = round(total_ok / elapsed, 1) if elapsed else 0.0
+    report["error_rate"] = round((total_errors + total_undelivered) / total, 4) if total else 0.0
+    return report
+
+
+# ----- Offline mode -----
+
+class _StandInWebSocket:
+    """A browser tab that takes `delay` seconds to accept each frame."""
+
+    def __init__(self, delay: float) -> None:
+        self.delay = delay
+        self.frames = 0
+
+    async def send_str(self, message: str) -> None:
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        self.frames += 1
+
+    async def close(self) -> None:
+        pass
+
+
+class _StandInPromptQueue:
+    def get_current_queue(self):
+        return [], []
+
+
+class _StandInPromptServer:
+    """Just enough of ComfyUI's PromptServer for the rebase routes, in the style of tests/conftest.py."""
+
+    def __init__(self, sockets: int, delay: float) -> None:
+        self.sockets = {f"tab{i}": _StandInWebSocket(delay) for i in range(sockets)}
+        self.prompt_queue = _StandInPromptQueue()
+        self.number = 0
+        self.app = None
+
+
+async def start_offline_server(sockets: int, socket_delay: float, workdir: Path):
+    """
+    Serve the rebase event routes in-process against a stand-in PromptServer.
+    Returns (base_url, runner, restore); restore() puts back whatever
+    server module or PromptServer instance was installed before.
+    """
+    import types
+
+    instance = _StandInPromptServer(sockets, socket_delay)
+    existing = sys.modules.get("server")
+    installed = existing is None or not hasattr(existing, "PromptServer")
+    if installed:
+        sys.modules["server"] = types.SimpleNamespace(PromptServer=types.SimpleNamespace(instance=instance))
+        previous = None
+    else:
+        previous = existing.PromptServer.instance
+        existing.PromptServer.instance = instance
+
+    if str(ROOT) not in sys.path:
+        sys.path.insert(0, str(ROOT))
+    from aiohttp import web
+    from extension import socket_events
+    from extension.templates import TemplateRegistry
+
+    previous_registry, previous_coalescer = socket_events.template_registry, socket_events.coalescer
+    templates_dir = workdir / "templates"
+    templates_dir.mkdir(parents=True, exist_ok=True)
+    (templates_dir / "default.json").write_text(json.dumps({"nodes": [], "links": []}), encoding="utf-8")
+    socket_events.template_registry = TemplateRegistry(templates_dir)
+    socket_events.coalescer = socket_events.PromptReplaceCoalescer()
+
+    app = web.Application()
+    app.add_routes([
+        web.post("/rebase/forward", socket_events.forward_to_websocket),
+        web.post("/rebase/reset", socket_events.forward_reset_request),
+    ])
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = runner.addresses[0][1]
+
+    def restore() -> None:
+        socket_events.template_registry, socket_events.coalescer = previous_registry, previous_coalescer
+        if not installed:
+            existing.PromptServer.instance = previous
+        elif existing is None:
+            sys.modules.pop("server", None)
+        else:
+            sys.modules["server"] = existing
+
+    return f"http://127.0.0.1:{port}", runner, restore
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    runner = None
+    restore = None
+    base_url = args.url.rstrip("/")
+    tmp = tempfile.TemporaryDirectory(prefix="rebase-load-") if args.offline else None
+    try:
+        if args.offline:
+            base_url, runner, restore = await start_offline_server(args.sockets, args.socket_delay_ms / 1000, Path(tmp.name))
+
+        levels = []
+        for concurrency in args.concurrency:
+            levels.append(await run_level(
+                base_url, concurrency, args.mix,
+                duration=None if args.requests else args.duration,
+                requests=args.requests,
+                timeout=args.timeout,
+            ))
+
+        return {
+            "target": "offline" if args.offline else base_url,
+            "mix": dict(args.mix),
+            "sockets": args.sockets if args.offline else None,
+            "socket_delay_ms": args.socket_delay_ms if args.offline else None,
+            "levels": levels,
+        }
+    finally:
+        if runner is not None:
+            await runner.cleanup()
+        if restore is not None:
+            restore()
+        if tmp is not None:
+            tmp.cleanup()
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    print(f"Target: {report['target']}  mix: {report['mix']}")
+    header = f"{'conc':>5} {'op':<8} {'reqs':>7} {'rps':>9} {'err%':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}"
+    print(header)
+    print("-" * len(header))
+    for level in report["levels"]:
+        for op, s in level["operations"].items():
+            print(
+                f"{level['concurrency']:>5} {op:<8} {s['requests']:>7} {s['throughput_rps']:>9.1f} "
+                f"{s['error_rate'] * 100:>6.2f}% {s['p50_ms']:>9.2f} {s['p95_ms']:>9.2f} {s['p99_ms']:>9.2f} {s['max_ms']:>9.2f}"
+            )
+        print(f"{'':>5} {'total':<8} {'':>7} {level['throughput_rps']:>9.1f} {level['error_rate'] * 100:>6.2f}%")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Load-test /rebase/forward and /rebase/reset")
+    parser.add_argument("--url", default="http://localhost:8191", help="ComfyUI server URL (default: http://localhost:8191)")
+    parser.add_argument("--offline", action="store_true", help="Run against an in-process stand-in PromptServer instead of --url")
+    parser.add_argument("--concurrency", type=lambda s: [int(c) for c in s.split(",")], default=[1, 8, 32],
+                        help="Comma-separated concurrency levels to step through (default: 1,8,32)")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix("forward=9,reset=1"),
+                        help="Weighted request mix (default: forward=9,reset=1)")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per concurrency level (default: 10)")
+    parser.add_argument("--requests", type=int, help="Fixed number of requests per level instead of --duration")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Per-request timeout in seconds (default: 30)")
+    parser.add_argument("--sockets", type=int, default=2, help="Offline mode: connected browser tabs (default: 2)")
+    parser.add_argument("--socket-delay-ms", type=float, default=1.0, help="Offline mode: time each tab takes to accept a frame (default: 1)")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+
+if __name__ == "__main__":
+    main()
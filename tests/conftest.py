@@ -11,6 +11,7 @@ if str(ROOT) not in sys.path:
 class _DummyPromptServer:
     def __init__(self) -> None:
         self.sent = []
+        self.sockets = {}
         self.app = types.SimpleNamespace(add_subapp=lambda *args, **kwargs: None)
 
     async def send_json(self, event, data):
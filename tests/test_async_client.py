@@ -0,0 +1,147 @@
+import asyncio
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from pkg.async_client import AsyncRebaseClient
+from pkg.client import PromptReplaceDetail, RebaseClientError
+
+
+async def start_server(handler, path="/rebase/forward"):
+    app = web.Application()
+    app.router.add_post(path, handler)
+    server = TestServer(app)
+    await server.start_server()
+    return server
+
+
+@pytest.mark.asyncio
+async def test_busy_responses_are_not_replayed():
+    calls = []
+
+    async def handler(request):
+        calls.append(await request.json())
+        return web.json_response({"error": "busy"}, status=503)
+
+    server = await start_server(handler)
+    try:
+        async with AsyncRebaseClient(str(server.make_url("")), backoff=0) as client:
+            with pytest.raises(RebaseClientError):
+                await client.generate(2)
+    finally:
+        await server.close()
+
+    # The event may have been delivered, so a retry could queue renders twice
+    assert calls == [{"event": "generate", "data": {"count": 2}}]
+
+
+@pytest.mark.asyncio
+async def test_connection_refused_is_retried_until_server_is_up(unused_tcp_port):
+    calls = []
+
+    async def handler(request):
+        calls.append(await request.json())
+        return web.json_response({"success": True})
+
+    app = web.Application()
+    app.router.add_post("/rebase/forward", handler)
+    server = TestServer(app, port=unused_tcp_port)
+
+    async def start_later():
+        await asyncio.sleep(0.05)
+        await server.start_server()
+
+    starter = asyncio.ensure_future(start_later())
+    try:
+        async with AsyncRebaseClient(f"http://127.0.0.1:{unused_tcp_port}", retries=5, backoff=0.02) as client:
+            result = await client.prompt_replace(PromptReplaceDetail(positive_prompt="cat"))
+    finally:
+        await starter
+        await server.close()
+
+    assert result == {"success": True}
+    assert calls == [{"event": "prompt_replace", "data": {"positive_prompt": "cat"}}]
+
+
+@pytest.mark.asyncio
+async def test_backoff_does_not_hold_an_in_flight_slot(unused_tcp_port):
+    async def handler(request):
+        return web.json_response({"success": True})
+
+    up = await start_server(handler)
+    try:
+        async with AsyncRebaseClient(f"http://127.0.0.1:{unused_tcp_port}", max_in_flight=1, retries=1, backoff=0.5) as client:
+            failing = asyncio.ensure_future(client.generate(1))
+            await asyncio.sleep(0.05)
+            # The failed attempt is backing off; another request gets the only slot
+            client.base_url = str(up.make_url("")).rstrip("/")
+            assert await asyncio.wait_for(client.generate(1), 0.3) == {"success": True}
+            with pytest.raises(RebaseClientError):
+                await failing
+    finally:
+        await up.close()
+
+
+@pytest.mark.asyncio
+async def test_client_errors_are_not_retried():
+    calls = 0
+
+    async def handler(request):
+        nonlocal calls
+        calls += 1
+        return web.json_response({"error": "bad"}, status=400)
+
+    server = await start_server(handler)
+    try:
+        async with AsyncRebaseClient(str(server.make_url("")), backoff=0) as client:
+            with pytest.raises(RebaseClientError):
+                await client.generate(1)
+    finally:
+        await server.close()
+
+    assert calls == 1
+
+
+@pytest.mark.asyncio
+async def test_in_flight_requests_are_bounded():
+    active = 0
+    peak = 0
+
+    async def handler(request):
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.01)
+        active -= 1
+        return web.json_response({"success": True})
+
+    server = await start_server(handler, "/rebase/forward/batch")
+    try:
+        async with AsyncRebaseClient(str(server.make_url("")), max_in_flight=2) as client:
+            await asyncio.gather(*(client.submit_job({"positive_prompt": str(i)}, 1) for i in range(6)))
+    finally:
+        await server.close()
+
+    assert peak == 2
+
+
+@pytest.mark.asyncio
+async def test_timeouts_raise_client_error_without_retrying():
+    calls = 0
+
+    async def handler(request):
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.3)
+        return web.json_response({"success": True})
+
+    server = await start_server(handler, "/rebase/reset")
+    try:
+        async with AsyncRebaseClient(str(server.make_url("")), retries=1, backoff=0) as client:
+            with pytest.raises(RebaseClientError):
+                await client.reset(timeout=0.05)
+    finally:
+        await server.close()
+
+    assert calls == 1
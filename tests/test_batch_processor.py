@@ -0,0 +1,88 @@
+from pathlib import Path
+
+from PIL import Image
+
+from pkg import batch_processor
+
+
+def make_pair(directory: Path, stem: str, size, prompt: str):
+    image_path = directory / f"{stem}.png"
+    text_path = directory / f"{stem}.txt"
+    Image.new("RGB", size).save(image_path)
+    text_path.write_text(prompt, encoding="utf-8")
+    return image_path, text_path
+
+
+def test_prepared_pairs_keep_input_order_and_report_failures(tmp_path: Path):
+    pairs = [
+        make_pair(tmp_path, "a", (64, 32), "first"),
+        make_pair(tmp_path, "b", (32, 64), ""),
+        make_pair(tmp_path, "c", (16, 16), "third"),
+    ]
+    broken = tmp_path / "d.png"
+    broken.write_bytes(b"not an image")
+    (tmp_path / "d.txt").write_text("fourth", encoding="utf-8")
+    pairs.append((broken, tmp_path / "d.txt"))
+
+    results = list(batch_processor.iter_prepared_pairs(pairs, workers=2, lookahead=2))
+
+    assert [index for index, *_ in results] == [1, 2, 3, 4]
+    assert results[0][2] == ((64, 32), "first")
+    assert results[1][3] == "Failed to read prompt"
+    assert results[2][2] == ((16, 16), "third")
+    assert results[3][3] == "Failed to read image resolution"
+
+
+class FakeClient:
+    def __init__(self, statuses):
+        self.statuses = list(statuses)
+        self.jobs = []
+
+    def queue_status(self):
+        return self.statuses.pop(0)
+
+    def submit_job(self, detail, count, wait=False):
+        self.jobs.append((detail.to_wire(), count, wait))
+
+
+def test_process_batch_paces_jobs_through_the_client(tmp_path: Path, monkeypatch):
+    make_pair(tmp_path, "a", (64, 32), "first")
+    make_pair(tmp_path, "b", (32, 64), "second")
+    monkeypatch.setattr("builtins.input", lambda _: "y")
+    monkeypatch.setattr(batch_processor.time, "sleep", lambda _: None)
+    status = lambda remaining, submitted: {"running": 0, "pending": remaining, "remaining": remaining, "submitted": submitted}
+    # The second job waits until the first one's generations have landed and the queue drained
+    client = FakeClient([status(0, 5), status(0, 5), status(2, 7), status(0, 7)])
+
+    batch_processor.process_batch(tmp_path, "http://comfy", 2, False, 3.0, target_depth=1, client=client)
+
+    assert sorted(client.jobs, key=lambda job: job[0]["positive_prompt"]) == [
+        ({"positive_prompt": "first", "resolution": {"width": 64, "height": 32}}, 2, False),
+        ({"positive_prompt": "second", "resolution": {"width": 32, "height": 64}}, 2, False),
+    ]
+    assert client.statuses == []
+
+
+def test_failed_submit_counts_as_failed_and_the_batch_goes_on(tmp_path: Path, monkeypatch, capsys):
+    from pkg.client import RebaseClient, RebaseClientError
+
+    make_pair(tmp_path, "a", (64, 32), "first")
+    make_pair(tmp_path, "b", (32, 64), "second")
+    monkeypatch.setattr("builtins.input", lambda _: "y")
+    monkeypatch.setattr(batch_processor.time, "sleep", lambda _: None)
+    client = RebaseClient("http://comfy")
+    sent = []
+
+    def submit_job(detail, count, wait=False):
+        sent.append(detail.positive_prompt)
+        if len(sent) == 1:
+            raise RebaseClientError("POST /rebase/forward/batch failed")
+
+    monkeypatch.setattr(client, "submit_job", submit_job)
+
+    batch_processor.process_batch(tmp_path, "http://comfy", 1, False, 0.0, client=client)
+
+    assert len(sent) == 2
+    out = capsys.readouterr().out
+    assert "Successful: 1" in out
+    assert "Failed: 1" in out
@@ -0,0 +1,85 @@
+from pkg import client as client_module
+from pkg.client import QueuePacer
+
+
+class FakeClient:
+    def __init__(self, statuses):
+        self.statuses = list(statuses)
+
+    def queue_status(self):
+        return self.statuses.pop(0)
+
+
+def status(remaining, submitted):
+    return {"running": 0, "pending": remaining, "remaining": remaining, "submitted": submitted}
+
+
+def test_pacer_waits_for_queue_to_drop_below_target(monkeypatch):
+    monkeypatch.setattr(client_module.time, "sleep", lambda _: None)
+    fake = FakeClient([status(3, 10), status(2, 10), status(1, 10)])
+    pacer = QueuePacer(fake, target_depth=2)
+
+    pacer.wait_for_slot()
+
+    assert fake.statuses == []
+
+
+def test_pacer_counts_generations_not_yet_queued_by_browser(monkeypatch):
+    monkeypatch.setattr(client_module.time, "sleep", lambda _: None)
+    fake = FakeClient([status(0, 10)])
+    pacer = QueuePacer(fake, target_depth=2)
+    pacer.wait_for_slot()
+    pacer.submitted(2)
+
+    # The browser has not queued the generations yet, so depth stays high
+    fake.statuses = [status(0, 10), status(2, 12), status(1, 12)]
+    pacer.wait_for_slot()
+
+    assert fake.statuses == []
+
+
+def test_wait_adds_ack_query_and_extends_http_timeout(monkeypatch):
+    calls = []
+
+    class FakeResponse:
+        def raise_for_status(self):
+            pass
+
+        def json(self):
+            return {"success": True}
+
+    def post(url, json, timeout):
+        calls.append((url, timeout))
+        return FakeResponse()
+
+    client = client_module.RebaseClient("http://comfy", timeout=5)
+    monkeypatch.setattr(client._session, "post", post)
+
+    client.generate(2)
+    client.submit_job({"positive_prompt": "cat"}, 1, wait=True, ack_timeout=20)
+
+    assert calls == [
+        ("http://comfy/rebase/forward", 5),
+        ("http://comfy/rebase/forward/batch?wait=true&timeout=20", 25),
+    ]
+
+
+def test_generate_with_wait_returns_the_queued_prompt_ids(monkeypatch):
+    responses = [
+        {"success": True, "id": "a1", "result": {"prompt_ids": ["p1", "p2"]}},
+        {"success": True, "id": "a2", "result": None},
+    ]
+
+    class FakeResponse:
+        def raise_for_status(self):
+            pass
+
+        def json(self):
+            return responses.pop(0)
+
+    client = client_module.RebaseClient("http://comfy")
+    monkeypatch.setattr(client._session, "post", lambda url, json, timeout: FakeResponse())
+
+    assert client.generate(2, wait=True)["prompt_ids"] == ["p1", "p2"]
+    # An older frontend acknowledges without a result
+    assert client.generate(1, wait=True)["prompt_ids"] == []
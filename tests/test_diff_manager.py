@@ -48,3 +48,51 @@ def test_delete_diff(tmp_path: Path):
     assert manager.delete_diff(filename) is True
     assert not (tmp_path / filename).exists()
     assert manager.delete_diff("missing.json") is False
+
+
+def test_repeated_saves_form_version_chain(tmp_path: Path):
+    manager = DiffManager(tmp_path)
+
+    first = manager.save_diff("Chain", {"3": {"text": "cat"}})
+    second = manager.save_diff("Chain", {"3": {"text": "dog"}})
+    third = manager.save_diff("Chain", {"3": {"text": "dog"}, "4": {"steps": 30}})
+
+    assert first == second == third
+    assert [p.name for p in tmp_path.glob("[!.]*.json")] == [first]
+    assert [v["version"] for v in manager.list_versions(first)] == [1, 2, 3]
+    assert manager.load_version(first, 1) == {"3": {"text": "cat"}}
+    assert manager.load_version(first, 2) == {"3": {"text": "dog"}}
+    assert manager.load_diff(first) == {"3": {"text": "dog"}, "4": {"steps": 30}}
+    assert manager.list_diffs()[0]["versions"] == 3
+    with pytest.raises(KeyError):
+        manager.load_version(first, 4)
+
+
+def test_identical_save_is_deduplicated(tmp_path: Path):
+    manager = DiffManager(tmp_path)
+
+    filename = manager.save_diff("Autosave", {"b": 1, "a": 2})
+    assert manager.save_diff("Autosave", {"a": 2, "b": 1}) == filename
+
+    assert len(manager.list_versions(filename)) == 1
+
+
+def test_failed_write_keeps_previous_version_chain(tmp_path: Path, monkeypatch):
+    from extension import record_store
+
+    manager = DiffManager(tmp_path)
+    filename = manager.save_diff("Chain", {"3": {"text": "cat"}})
+    manager.save_diff("Chain", {"3": {"text": "dog"}})
+
+    def disk_full(fd):
+        raise OSError(28, "No space left on device")
+
+    monkeypatch.setattr(record_store.os, "fsync", disk_full)
+    with pytest.raises(OSError):
+        manager.save_diff("Chain", {"3": {"text": "bird"}})
+    monkeypatch.undo()
+
+    assert manager.load_diff(filename) == {"3": {"text": "dog"}}
+    assert [v["version"] for v in manager.list_versions(filename)] == [1, 2]
+    assert manager.load_version(filename, 1) == {"3": {"text": "cat"}}
+    assert not list(tmp_path.glob("*.tmp"))
@@ -0,0 +1,58 @@
+import os
+from pathlib import Path
+
+from extension.dir_index import DirectoryIndex
+
+
+def age_directory(path: Path, seconds: int = 60) -> None:
+    st = path.stat()
+    os.utime(path, (st.st_atime - seconds, st.st_mtime - seconds))
+
+
+def test_listing_is_served_from_cache_until_directory_changes(tmp_path: Path):
+    (tmp_path / "b.png").write_bytes(b"")
+    (tmp_path / "a.png").write_bytes(b"")
+    (tmp_path / "sub").mkdir()
+    age_directory(tmp_path)
+    index = DirectoryIndex()
+
+    listing = index.get(tmp_path)
+    assert listing.files == ["a.png", "b.png"]
+    assert listing.dirs == ["sub"]
+    assert index.get(tmp_path) is listing
+    assert index.stats()["hits"] == 1
+    assert index.stats()["misses"] == 1
+
+    (tmp_path / "c.png").write_bytes(b"")
+    age_directory(tmp_path, 30)
+
+    assert index.get(tmp_path).files == ["a.png", "b.png", "c.png"]
+    assert index.stats()["misses"] == 2
+
+
+def test_recently_modified_directory_is_rescanned(tmp_path: Path):
+    (tmp_path / "a.png").write_bytes(b"")
+    index = DirectoryIndex()
+
+    index.get(tmp_path)
+    index.get(tmp_path)
+
+    assert index.stats()["hits"] == 0
+    assert index.stats()["misses"] == 2
+
+
+def test_missing_directory_returns_none(tmp_path: Path):
+    index = DirectoryIndex()
+
+    assert index.get(tmp_path / "missing") is None
+    (tmp_path / "file.txt").write_text("x")
+    assert index.get(tmp_path / "file.txt") is None
+
+
+def test_extension_filter_is_case_insensitive(tmp_path: Path):
+    for name in ("one.PNG", "two.jpg", "three.txt"):
+        (tmp_path / name).write_bytes(b"")
+    index = DirectoryIndex()
+
+    listing = index.get(tmp_path)
+    assert listing.files_with_ext((".png", ".jpg")) == ["one.PNG", "two.jpg"]
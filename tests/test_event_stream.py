@@ -0,0 +1,133 @@
+import types
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestClient, TestServer
+
+from extension import event_stream as event_stream_module
+from extension.event_stream import ExecutionEventStream, Subscriber, prompt_finished
+from pkg.client import parse_sse
+
+
+class SendingPromptServer:
+    def __init__(self):
+        self.sent = []
+
+    async def send(self, event, data, sid=None):
+        self.sent.append((event, data, sid))
+
+
+@pytest.fixture
+def stream(monkeypatch):
+    instance = SendingPromptServer()
+    monkeypatch.setattr(event_stream_module, "server", types.SimpleNamespace(
+        PromptServer=types.SimpleNamespace(instance=instance),
+    ))
+    fresh = ExecutionEventStream(max_subscribers=2, buffer_size=3)
+    monkeypatch.setattr(event_stream_module, "event_stream", fresh)
+    return fresh, instance
+
+
+def test_subscriber_filters_and_keeps_newest_events():
+    subscriber = Subscriber(prompt_ids=frozenset(["p1"]), maxsize=2)
+    assert subscriber.wants("executing", {"prompt_id": "p1", "node": "3"})
+    assert not subscriber.wants("executing", {"prompt_id": "p2", "node": "3"})
+    assert not subscriber.wants("status", {"status": {}})
+
+    for seq in range(1, 5):
+        subscriber.put((seq, "progress", {"prompt_id": "p1", "value": seq}))
+    assert [item[0] for item in subscriber.buffer] == [3, 4]
+    assert subscriber.dropped == 2
+
+
+def test_prompt_finished_recognizes_both_end_markers():
+    assert prompt_finished("execution_success", {"prompt_id": "p1"}) == "p1"
+    assert prompt_finished("executing", {"prompt_id": "p1", "node": None}) == "p1"
+    assert prompt_finished("executing", {"prompt_id": "p1", "node": "5"}) is None
+
+
+@pytest.mark.asyncio
+async def test_install_relays_events_and_still_sends_to_browser(stream):
+    events, instance = stream
+    assert events.install()
+    subscriber = events.subscribe()
+
+    await instance.send("executing", {"prompt_id": "p1", "node": "3"}, "sid1")
+    await instance.send("crystools.monitor", {"cpu": 3})
+
+    assert [item[1:] for item in subscriber.buffer] == [("executing", {"prompt_id": "p1", "node": "3"})]
+    assert [e for e, _, _ in instance.sent] == ["executing", "crystools.monitor"]
+    assert instance.sent[0][2] == "sid1"
+
+    events.uninstall()
+    assert events.stats()["installed"] is False
+    assert "relaying_send" not in repr(instance.send)
+
+
+@pytest.mark.asyncio
+async def test_sse_route_streams_prompt_until_finished(stream):
+    events, instance = stream
+    events.install()
+    app = web.Application()
+    app.router.add_get("/rebase/events", event_stream_module.stream_events_route)
+    client = TestClient(TestServer(app))
+    await client.start_server()
+    try:
+        resp = await client.get("/rebase/events?prompt_id=p1&until=finished")
+        assert resp.headers["Content-Type"] == "text/event-stream"
+        # The subscriber is registered once the stream is open
+        assert events.stats()["subscribers"] == 1
+
+        await instance.send("status", {"status": {"exec_info": {"queue_remaining": 1}}})
+        await instance.send("executing", {"prompt_id": "p2", "node": "1"})
+        await instance.send("progress", {"prompt_id": "p1", "value": 1, "max": 2})
+        await instance.send("executed", {"prompt_id": "p1", "node": "9", "output": {}})
+        await instance.send("execution_success", {"prompt_id": "p1"})
+
+        body = await resp.text()
+        rejected = await client.get("/rebase/events?events=bogus")
+    finally:
+        await client.close()
+
+    received = list(parse_sse(body.split("\n")))
+    assert [e["event"] for e in received] == ["progress", "executed", "execution_success"]
+    assert all(e["data"]["prompt_id"] == "p1" for e in received)
+    assert received[0]["id"] < received[-1]["id"]
+    assert rejected.status == 400
+    assert events.stats()["subscribers"] == 0
+
+
+@pytest.mark.asyncio
+async def test_sse_route_replays_events_published_before_subscribing(stream):
+    events, instance = stream
+    events.install()
+    # Nobody is listening yet, e.g. a prompt that finished before the client connected
+    await instance.send("executing", {"prompt_id": "p1", "node": "3"})
+    await instance.send("executing", {"prompt_id": "p2", "node": "3"})
+    await instance.send("execution_success", {"prompt_id": "p1"})
+
+    app = web.Application()
+    app.router.add_get("/rebase/events", event_stream_module.stream_events_route)
+    client = TestClient(TestServer(app))
+    await client.start_server()
+    try:
+        replayed = await (await client.get("/rebase/events?prompt_id=p1&until=finished&since=0")).text()
+        resumed = await (await client.get(
+            "/rebase/events?prompt_id=p1&until=finished", headers={"Last-Event-ID": "1"},
+        )).text()
+        rejected = await client.get("/rebase/events?since=soon")
+    finally:
+        await client.close()
+
+    assert [(e["id"], e["event"]) for e in parse_sse(replayed.split("\n"))] == [(1, "executing"), (3, "execution_success")]
+    assert [(e["id"], e["event"]) for e in parse_sse(resumed.split("\n"))] == [(3, "execution_success")]
+    assert rejected.status == 400
+    assert events.stats()["history"] == 3
+
+
+def test_parse_sse_skips_comments_and_joins_data_lines():
+    lines = [": connected", "", "id: 4", "event: progress", 'data: {"value":', "data: 1}", "", "event: dropped", 'data: {"count": 2}', ""]
+    assert list(parse_sse(lines)) == [
+        {"id": 4, "event": "progress", "data": {"value": 1}},
+        {"id": None, "event": "dropped", "data": {"count": 2}},
+    ]
@@ -0,0 +1,60 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from extension.executor import StorageExecutor
+
+
+@pytest.mark.asyncio
+async def test_run_executes_off_the_event_loop_thread():
+    executor = StorageExecutor(max_workers=2)
+    loop_thread = threading.get_ident()
+
+    worker_thread = await executor.run("probe", threading.get_ident)
+
+    assert worker_thread != loop_thread
+    assert executor.stats()["operations"]["probe"]["completed"] == 1
+
+
+@pytest.mark.asyncio
+async def test_per_operation_limit_caps_concurrency():
+    executor = StorageExecutor(max_workers=4, limits={"slow": 1})
+    active = 0
+    peak = 0
+    lock = threading.Lock()
+
+    def slow():
+        nonlocal active, peak
+        with lock:
+            active += 1
+            peak = max(peak, active)
+        time.sleep(0.02)
+        with lock:
+            active -= 1
+
+    tasks = [asyncio.create_task(executor.run("slow", slow)) for _ in range(3)]
+    await asyncio.sleep(0.005)
+    depth = executor.stats()
+    await asyncio.gather(*tasks)
+
+    assert peak == 1
+    assert depth["waiting"] == 2
+    assert depth["operations"]["slow"]["limit"] == 1
+    assert executor.stats()["operations"]["slow"]["max_waiting"] == 2
+
+
+@pytest.mark.asyncio
+async def test_errors_propagate_and_are_counted():
+    executor = StorageExecutor()
+
+    def boom():
+        raise FileNotFoundError("missing")
+
+    with pytest.raises(FileNotFoundError):
+        await executor.run("load", boom)
+
+    stats = executor.stats()["operations"]["load"]
+    assert stats["failed"] == 1
+    assert stats["running"] == 0
@@ -0,0 +1,72 @@
+from pathlib import Path
+
+import pytest
+from PIL import Image
+
+from pkg import image_size
+from pkg.image_size import ImageSizeCache, read_header_size, read_image_size
+
+
+@pytest.mark.parametrize(
+    "filename, save_kwargs",
+    [
+        ("image.png", {}),
+        ("image.jpg", {"quality": 80}),
+        ("progressive.jpg", {"progressive": True}),
+        ("lossy.webp", {"quality": 80}),
+        ("lossless.webp", {"lossless": True}),
+    ],
+)
+def test_header_size_matches_pil(tmp_path: Path, filename, save_kwargs):
+    path = tmp_path / filename
+    Image.new("RGB", (123, 45), "red").save(path, **save_kwargs)
+
+    assert read_header_size(path) == (123, 45)
+
+
+def test_extended_webp_header(tmp_path: Path):
+    path = tmp_path / "alpha.webp"
+    exif = Image.Exif()
+    exif[0x010E] = "workflow"
+    Image.new("RGBA", (300, 200), (0, 0, 0, 128)).save(path, exif=exif)
+
+    assert read_header_size(path) == (300, 200)
+
+
+def test_jpeg_with_large_metadata_segment(tmp_path: Path):
+    path = tmp_path / "exif.jpg"
+    exif = Image.Exif()
+    exif[0x010E] = "x" * 20000
+    Image.new("RGB", (64, 48)).save(path, exif=exif)
+
+    assert read_header_size(path) == (64, 48)
+
+
+def test_unrecognised_formats_fall_back_to_pil(tmp_path: Path):
+    path = tmp_path / "image.bmp"
+    Image.new("RGB", (7, 9)).save(path)
+
+    assert read_header_size(path) is None
+    assert read_image_size(path) == (7, 9)
+
+
+def test_cache_reuses_entries_until_file_changes(tmp_path: Path, monkeypatch):
+    path = tmp_path / "image.png"
+    Image.new("RGB", (10, 20)).save(path)
+    cache_path = tmp_path / "sizes.json"
+
+    cache = ImageSizeCache(cache_path)
+    assert cache.get(path) == (10, 20)
+    cache.save()
+
+    reads = []
+    real_read = image_size.read_image_size
+    monkeypatch.setattr(image_size, "read_image_size", lambda p: reads.append(p) or real_read(p))
+
+    reloaded = ImageSizeCache(cache_path)
+    assert reloaded.get(path) == (10, 20)
+    assert reads == []
+
+    Image.new("RGB", (30, 40)).save(path)
+    assert reloaded.get(path) == (30, 40)
+    assert len(reads) == 1
@@ -0,0 +1,153 @@
+import asyncio
+import json
+import types
+
+import pytest
+
+from extension import job_queue as job_queue_module
+from extension.job_queue import JobDispatcher, JobQueue, validate_job
+
+
+class FakeWebSocket:
+    def __init__(self):
+        self.messages = []
+
+    async def send_str(self, message):
+        self.messages.append(json.loads(message))
+
+    async def close(self):
+        pass
+
+
+class FakeQueue:
+    def __init__(self, remaining=0):
+        self.remaining = remaining
+
+    def get_current_queue(self):
+        return [], [None] * self.remaining
+
+
+@pytest.fixture
+def prompt_server(monkeypatch):
+    import extension.socket_events as se
+    from extension import fanout as fanout_module
+
+    instance = types.SimpleNamespace(sockets={"tab": FakeWebSocket()}, prompt_queue=FakeQueue(), number=0)
+    server_stub = types.SimpleNamespace(PromptServer=types.SimpleNamespace(instance=instance))
+    for module in (se, fanout_module, job_queue_module):
+        monkeypatch.setattr(module, "server", server_stub)
+    monkeypatch.setattr(se, "coalescer", se.PromptReplaceCoalescer())
+    return instance
+
+
+def test_jobs_persist_and_recover_interrupted_dispatch(tmp_path):
+    db_path = tmp_path / "jobs.sqlite3"
+    queue = JobQueue(db_path)
+    ids = queue.submit([({"positive_prompt": "cat"}, 2), ({"positive_prompt": "dog"}, 1)])
+
+    claimed = queue.claim_next()
+    assert claimed.id == ids[0] and claimed.status == "dispatching"
+    queue.close()
+
+    reopened = JobQueue(db_path)
+    job = reopened.get(ids[0])
+    assert job.status == "queued"
+    assert job.attempts == 1
+    assert job.detail == {"positive_prompt": "cat"}
+    assert reopened.counts()["queued"] == 2
+
+
+def test_cancel_and_retry_transitions(tmp_path):
+    queue = JobQueue(tmp_path / "jobs.sqlite3")
+    (job_id,) = queue.submit([({}, 1)])
+
+    assert queue.cancel(job_id)
+    assert not queue.cancel(job_id)
+    assert queue.claim_next() is None
+    assert queue.retry(job_id)
+    assert queue.claim_next().id == job_id
+    assert not queue.cancel(job_id)
+
+
+def test_validate_job_rejects_bad_count():
+    assert validate_job({"detail": {"seed": 1}, "count": 3}) == ({"seed": 1}, 3)
+    for bad in ({"count": 0}, {"count": 9}, {"count": True}, {"detail": []}, "job"):
+        with pytest.raises(ValueError):
+            validate_job(bad)
+
+
+@pytest.mark.asyncio
+async def test_dispatcher_sends_jobs_until_queue_is_full(tmp_path, prompt_server):
+    queue = JobQueue(tmp_path / "jobs.sqlite3")
+    ids = queue.submit([({"positive_prompt": "cat"}, 2), ({"positive_prompt": "dog"}, 1)])
+    dispatcher = JobDispatcher(queue, target_depth=2)
+
+    assert await dispatcher.dispatch_next()
+    # Two generations are in transit until the browser queues them
+    assert not await dispatcher.dispatch_next()
+
+    prompt_server.number = 2
+    prompt_server.prompt_queue.remaining = 1
+    assert await dispatcher.dispatch_next()
+
+    messages = prompt_server.sockets["tab"].messages
+    assert [(m["type"], m["data"]) for m in messages] == [
+        ("prompt_replace", {"positive_prompt": "cat"}),
+        ("generate", {"count": 2}),
+        ("prompt_replace", {"positive_prompt": "dog"}),
+        ("generate", {"count": 1}),
+    ]
+    assert [queue.get(i).status for i in ids] == ["dispatched", "dispatched"]
+
+
+@pytest.mark.asyncio
+async def test_dispatcher_waits_for_a_browser(tmp_path, prompt_server):
+    queue = JobQueue(tmp_path / "jobs.sqlite3")
+    (job_id,) = queue.submit([({}, 1)])
+    prompt_server.sockets.clear()
+
+    assert not await JobDispatcher(queue).dispatch_next()
+    assert queue.get(job_id).status == "queued"
+
+
+@pytest.mark.asyncio
+async def test_job_routes_submit_list_and_cancel(tmp_path, prompt_server, monkeypatch):
+    from extension import routes
+
+    queue = JobQueue(tmp_path / "jobs.sqlite3")
+    dispatcher = JobDispatcher(queue, poll_interval=0.01)
+    monkeypatch.setattr(routes, "job_queue", queue)
+    monkeypatch.setattr(routes, "job_dispatcher", dispatcher)
+    prompt_server.sockets.clear()
+
+    class Request:
+        def __init__(self, payload=None, query=None, match_info=None):
+            self._payload = payload
+            self.query = query or {}
+            self.match_info = match_info or {}
+
+        async def json(self):
+            return self._payload
+
+    try:
+        resp = await routes.submit_jobs_route(Request({"jobs": [{"detail": {"seed": 1}, "count": 2}, {"count": 1}]}))
+        ids = json.loads(resp.body.decode())["ids"]
+        assert len(ids) == 2
+
+        resp = await routes.submit_jobs_route(Request({"jobs": [{"count": 1}, {"count": 20}]}))
+        assert resp.status == 400
+        assert "index 1" in json.loads(resp.body.decode())["error"]
+
+        resp = await routes.cancel_job_route(Request(match_info={"job_id": str(ids[1])}))
+        assert resp.status == 200
+
+        resp = await routes.list_jobs_route(Request(query={"status": "queued"}))
+        payload = json.loads(resp.body.decode())
+        assert [job["id"] for job in payload["jobs"]] == [ids[0]]
+        assert payload["counts"]["cancelled"] == 1
+
+        resp = await routes.get_job_route(Request(match_info={"job_id": "999"}))
+        assert resp.status == 404
+    finally:
+        await dispatcher.stop()
+        queue.close()
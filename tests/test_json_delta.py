@@ -0,0 +1,23 @@
+from extension.json_delta import apply_delta, content_hash, make_delta
+
+
+def test_content_hash_ignores_key_order():
+    assert content_hash({"a": 1, "b": [1, 2]}) == content_hash({"b": [1, 2], "a": 1})
+    assert content_hash({"a": 1}) != content_hash({"a": True})
+
+
+def test_delta_round_trips_nested_changes():
+    old = {"3": {"text": "cat", "seed": 1, "lora": {"a": 0.5}}, "4": {"steps": 20}, "gone": 1}
+    new = {"3": {"text": "dog", "seed": 1, "lora": {"a": 0.5, "b": 1}}, "4": {"steps": 20}, "5": [1, 2]}
+
+    delta = make_delta(old, new)
+
+    assert apply_delta(old, delta) == new
+    assert "4" not in delta.get("$patch", {}) and "4" not in delta.get("$set", {})
+    assert old["3"]["text"] == "cat"
+
+
+def test_identical_values_produce_empty_delta():
+    assert make_delta({"a": [1, {"b": 2}]}, {"a": [1, {"b": 2}]}) == {}
+    assert make_delta({"a": 1}, {"a": 1.0}) == {"$set": {"a": 1.0}}
+    assert apply_delta([1], make_delta([1], {"x": 1})) == {"x": 1}
@@ -0,0 +1,80 @@
+import sys
+import argparse
+
+import pytest
+
+import server
+from pkg import load_generator
+from pkg.load_generator import parse_mix, percentile, run
+
+
+def make_args(**overrides):
+    args = dict(
+        url="http://unused", offline=True, concurrency=[1, 4], mix=parse_mix("forward=3,reset=1"),
+        duration=None, requests=40, timeout=10.0, sockets=2, socket_delay_ms=0.0, json=False,
+    )
+    args.update(overrides)
+    return argparse.Namespace(**args)
+
+
+def test_parse_mix_accepts_weights_and_rejects_unknown_ops():
+    assert parse_mix("forward=9, reset=1") == [("forward", 9.0), ("reset", 1.0)]
+    assert parse_mix("reset") == [("reset", 1.0)]
+    with pytest.raises(argparse.ArgumentTypeError):
+        parse_mix("generate=1")
+    with pytest.raises(argparse.ArgumentTypeError):
+        parse_mix("forward=0")
+
+
+def test_percentile_uses_nearest_rank():
+    values = [float(v) for v in range(1, 101)]
+    assert percentile(values, 50) == 50.0
+    assert percentile(values, 99) == 99.0
+    assert percentile([], 95) == 0.0
+
+
+@pytest.mark.asyncio
+async def test_offline_run_reports_every_level_and_restores_server():
+    original = server.PromptServer.instance
+
+    report = await run(make_args())
+
+    assert server.PromptServer.instance is original
+    assert [level["concurrency"] for level in report["levels"]] == [1, 4]
+    for level in report["levels"]:
+        ops = level["operations"]
+        assert sum(s["requests"] for s in ops.values()) == 40
+        assert level["error_rate"] == 0.0
+        for stats in ops.values():
+            if stats["requests"]:
+                assert 0 < stats["p50_ms"] <= stats["p95_ms"] <= stats["p99_ms"] <= stats["max_ms"]
+
+
+@pytest.mark.asyncio
+async def test_offline_server_removes_the_server_module_it_installed(monkeypatch, tmp_path):
+    monkeypatch.delitem(sys.modules, "server")
+
+    base_url, runner, restore = await load_generator.start_offline_server(1, 0.0, tmp_path)
+    try:
+        assert sys.modules["server"].PromptServer.instance.sockets
+        assert int(base_url.rsplit(":", 1)[1]) > 0
+    finally:
+        await runner.cleanup()
+        restore()
+
+    assert "server" not in sys.modules
+
+
+@pytest.mark.asyncio
+async def test_failed_requests_count_as_errors(monkeypatch):
+    async def broken(session, base_url):
+        raise RuntimeError("HTTP 500")
+
+    monkeypatch.setitem(load_generator.OPERATIONS, "reset", broken)
+    report = await run(make_args(concurrency=[2], mix=parse_mix("reset=1"), requests=10))
+
+    stats = report["levels"][0]["operations"]["reset"]
+    assert stats["requests"] == 10
+    assert stats["errors"] == 10
+    assert stats["error_rate"] == 1.0
+    assert report["levels"][0]["throughput_rps"] == 0.0
@@ -0,0 +1,85 @@
+import os
+import json
+from pathlib import Path
+
+from extension import manifest as manifest_module
+from extension.diff_manager import DiffManager
+from extension.manifest import MANIFEST_NAME
+from extension.remap_manager import RemapManager
+
+
+def write_record(path: Path, name: str, created: int, **extra) -> None:
+    path.write_text(json.dumps({"name": name, "created": created, **extra}), encoding="utf-8")
+
+
+def test_save_and_delete_maintain_manifest(tmp_path: Path):
+    manager = DiffManager(tmp_path)
+    filename = manager.save_diff("Tracked", {"a": 1})
+
+    manifest = json.loads((tmp_path / MANIFEST_NAME).read_text(encoding="utf-8"))
+    assert manifest["entries"][filename]["summary"]["name"] == "Tracked"
+
+    manager.delete_diff(filename)
+    manifest = json.loads((tmp_path / MANIFEST_NAME).read_text(encoding="utf-8"))
+    assert filename not in manifest["entries"]
+
+
+def test_listing_does_not_reparse_known_files(tmp_path: Path, monkeypatch):
+    DiffManager(tmp_path).save_diff("Known", {"a": 1})
+
+    parsed = []
+    real_decode = manifest_module.decode
+
+    def spy_decode(data):
+        record = real_decode(data)
+        parsed.append(record.get("name"))
+        return record
+
+    # Records are parsed through decode(); only the manifest itself is read
+    monkeypatch.setattr(manifest_module, "decode", spy_decode)
+
+    assert [d["name"] for d in DiffManager(tmp_path).list_diffs()] == ["Known"]
+    assert parsed == []
+
+    # A file the manifest does not know about yet is parsed exactly once
+    write_record(tmp_path / "external.json", "External", 5, diff={})
+    assert len(DiffManager(tmp_path).list_diffs()) == 2
+    assert parsed == ["External"]
+
+
+def test_manifest_recovers_from_out_of_band_changes(tmp_path: Path):
+    manager = RemapManager(tmp_path)
+    kept = manager.save_remaps("Kept", [{"x": 1}])
+    removed = manager.save_remaps("Removed", [])
+    manager.list_remaps()
+
+    (tmp_path / removed).unlink()
+    write_record(tmp_path / "external.json", "External", 5, remaps=[1, 2, 3])
+    write_record(tmp_path / kept, "Renamed", 10, remaps=[])
+
+    listed = {entry["filename"]: entry for entry in manager.list_remaps()}
+    assert set(listed) == {kept, "external.json"}
+    assert listed["external.json"]["count"] == 3
+    assert listed[kept]["name"] == "Renamed"
+
+
+def test_corrupt_manifest_is_rebuilt(tmp_path: Path):
+    write_record(tmp_path / "one.json", "One", 1, diff={})
+    (tmp_path / MANIFEST_NAME).write_text("not-json", encoding="utf-8")
+
+    listed = DiffManager(tmp_path).list_diffs()
+    assert [entry["filename"] for entry in listed] == ["one.json"]
+
+
+def test_records_rewritten_in_place_are_reparsed(tmp_path: Path):
+    manager = DiffManager(tmp_path)
+    filename = manager.save_diff("Before", {"a": 1})
+    settled = (tmp_path.stat().st_mtime - 60,) * 2
+    os.utime(tmp_path, settled)
+    assert [d["name"] for d in manager.list_diffs()] == ["Before"]
+
+    # Writing through an existing file does not touch the directory mtime
+    write_record(tmp_path / filename, "After", 2, diff={"b": 2})
+    os.utime(tmp_path, settled)
+
+    assert [d["name"] for d in manager.list_diffs()] == ["After"]
@@ -0,0 +1,114 @@
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestClient, TestServer
+
+from extension import metrics as metrics_module
+from extension.fanout import FanoutResult
+from extension.metrics import Histogram, RebaseMetrics, metrics_middleware, metrics_route, record_prepared_response
+
+
+@pytest.fixture
+def metrics(monkeypatch):
+    fresh = RebaseMetrics()
+    monkeypatch.setattr(metrics_module, "metrics", fresh)
+    return fresh
+
+
+async def start_client(tmp_path):
+    (tmp_path / "big.bin").write_bytes(b"x" * 100_000)
+
+    async def load(request):
+        return web.json_response({"name": request.match_info["filename"]})
+
+    async def download(request):
+        return web.FileResponse(tmp_path / "big.bin")
+
+    async def missing(request):
+        raise web.HTTPNotFound()
+
+    async def stream(request):
+        response = web.StreamResponse()
+        await response.prepare(request)
+        for _ in range(3):
+            await response.write(b"x" * 10)
+        await response.write_eof()
+        return response
+
+    returned = []
+
+    @web.middleware
+    async def keep_response(request, handler):
+        response = await handler(request)
+        returned.append(response)
+        return response
+
+    sub = web.Application(middlewares=[keep_response, metrics_middleware])
+    sub.on_response_prepare.append(record_prepared_response)
+    sub.add_routes([
+        web.get("/diff/load/{filename}", load),
+        web.get("/data/view", download),
+        web.get("/gone", missing),
+        web.get("/events", stream),
+        web.get("/metrics", metrics_route),
+    ])
+    app = web.Application()
+    app.add_subapp("/rebase/", sub)
+    client = TestClient(TestServer(app))
+    client.returned = returned
+    await client.start_server()
+    return client
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram((0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        histogram.observe(value)
+    assert histogram.cumulative() == [("0.1", 2), ("1.0", 3), ("+Inf", 4)]
+    assert histogram.count == 4
+    assert histogram.sum == pytest.approx(3.65)
+
+
+@pytest.mark.asyncio
+async def test_middleware_labels_by_route_pattern_and_counts_bytes(metrics, tmp_path):
+    client = await start_client(tmp_path)
+    try:
+        for name in ("a.json", "b.json"):
+            assert (await client.get(f"/rebase/diff/load/{name}")).status == 200
+        resp = await client.get("/rebase/data/view")
+        assert len(await resp.read()) == 100_000
+        assert (await client.get("/rebase/gone")).status == 404
+        assert len(await (await client.get("/rebase/events")).read()) == 30
+    finally:
+        await client.close()
+
+    # Timed without replacing methods on the responses
+    assert all(not {"prepare", "write_eof"} & vars(r).keys() for r in client.returned)
+    # Streamed responses count what went over the wire, chunk framing included
+    assert metrics.response_bytes[("GET", "/rebase/events")] >= 30
+    assert metrics.requests[("GET", "/rebase/events", "200")] == 1
+
+    assert metrics.requests[("GET", "/rebase/diff/load/{filename}", "200")] == 2
+    assert metrics.requests[("GET", "/rebase/gone", "404")] == 1
+    assert metrics.latency[("GET", "/rebase/diff/load/{filename}")].count == 2
+    assert metrics.response_bytes[("GET", "/rebase/data/view")] == 100_000
+    assert metrics.in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_metrics_route_renders_prometheus_text(metrics, tmp_path):
+    metrics.observe_fanout("prompt_replace", FanoutResult(delivered=2, timed_out=1, duration=0.004))
+    client = await start_client(tmp_path)
+    try:
+        await client.get("/rebase/diff/load/a.json")
+        resp = await client.get("/rebase/metrics")
+        text = await resp.text()
+    finally:
+        await client.close()
+
+    assert resp.status == 200
+    assert resp.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+    assert "# TYPE rebase_http_request_duration_seconds histogram" in text
+    assert 'rebase_http_requests_total{method="GET",route="/rebase/diff/load/{filename}",status="200"} 1' in text
+    assert 'rebase_http_request_duration_seconds_bucket{method="GET",route="/rebase/diff/load/{filename}",le="+Inf"} 1' in text
+    assert 'rebase_fanout_duration_seconds_count{event="prompt_replace"} 1' in text
+    assert 'rebase_fanout_sockets_total{event="prompt_replace",outcome="timed_out"} 1' in text
@@ -0,0 +1,97 @@
+import asyncio
+import pstats
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestClient, TestServer
+
+from extension import profiling
+from extension.executor import storage
+from extension.profiling import RequestProfiler, profiling_middleware, list_profiles_route, get_profile_route
+
+
+def slow_listing():
+    return sorted(str(i) for i in range(20_000))
+
+
+async def start_client(tmp_path, monkeypatch, allowed):
+    profiler = RequestProfiler(tmp_path / "profiles", allowed=allowed, keep=2)
+    monkeypatch.setattr(profiling, "profiler", profiler)
+
+    async def list_diffs(request):
+        items = await storage.run("diff.list", slow_listing)
+        return web.json_response({"count": len(items)})
+
+    async def forward(request):
+        return web.json_response({"success": True})
+
+    sub = web.Application(middlewares=[profiling_middleware])
+    sub.add_routes([
+        web.get("/diff/list", list_diffs),
+        web.post("/forward", forward),
+        web.get("/profiles", list_profiles_route),
+        web.get("/profiles/{filename}", get_profile_route),
+    ])
+    app = web.Application()
+    app.add_subapp("/rebase/", sub)
+    client = TestClient(TestServer(app))
+    await client.start_server()
+    return client, profiler
+
+
+@pytest.mark.asyncio
+async def test_profiles_allowlisted_route_including_storage_work(tmp_path, monkeypatch):
+    client, profiler = await start_client(tmp_path, monkeypatch, ["/rebase/diff/list"])
+    try:
+        resp = await client.get("/rebase/diff/list", headers={"X-Rebase-Profile": "1"})
+        filename = resp.headers["X-Rebase-Profile"]
+        listing = await (await client.get("/rebase/profiles")).json()
+        text = await (await client.get(f"/rebase/profiles/{filename}?format=text")).text()
+        download = await client.get(f"/rebase/profiles/{filename}")
+        body = await download.read()
+    finally:
+        await client.close()
+
+    assert resp.status == 200
+    assert listing["enabled"] is True
+    assert [p["filename"] for p in listing["profiles"]] == [filename]
+    assert listing["profiles"][0]["route"] == "/rebase/diff/list"
+    # The pool work is part of the profile, not just the handler
+    assert "slow_listing" in text
+    assert download.status == 200
+    assert body == (tmp_path / "profiles" / filename).read_bytes()
+    stats = pstats.Stats(str(tmp_path / "profiles" / filename))
+    assert any(func[2] == "slow_listing" for func in stats.stats)
+
+
+@pytest.mark.asyncio
+async def test_requests_need_both_the_flag_and_the_allowlist(tmp_path, monkeypatch):
+    client, profiler = await start_client(tmp_path, monkeypatch, ["/rebase/diff/list"])
+    try:
+        unflagged = await client.get("/rebase/diff/list")
+        not_allowed = await client.post("/rebase/forward?profile=1")
+        listing = await (await client.get("/rebase/profiles")).json()
+    finally:
+        await client.close()
+
+    assert "X-Rebase-Profile" not in unflagged.headers
+    assert "X-Rebase-Profile" not in not_allowed.headers
+    assert listing["profiles"] == []
+
+
+@pytest.mark.asyncio
+async def test_keeps_only_newest_profiles_and_rejects_bad_names(tmp_path, monkeypatch):
+    client, profiler = await start_client(tmp_path, monkeypatch, ["*"])
+    try:
+        names = []
+        for _ in range(3):
+            resp = await client.get("/rebase/diff/list?profile=1")
+            names.append(resp.headers["X-Rebase-Profile"])
+            await asyncio.sleep(0.002)
+        listing = await (await client.get("/rebase/profiles")).json()
+        missing = await client.get("/rebase/profiles/..%2Fsecret.prof")
+    finally:
+        await client.close()
+
+    assert [p["filename"] for p in listing["profiles"]] == names[:0:-1]
+    assert missing.status == 404
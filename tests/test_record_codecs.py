@@ -0,0 +1,77 @@
+import gzip
+import json
+from pathlib import Path
+
+import pytest
+
+from extension import record_codecs
+from extension.diff_manager import DiffManager
+from extension.record_codecs import CODECS, codec_of, decode, get_codec
+from extension.remap_manager import RemapManager
+
+RECORD = {"name": "Prompt", "created": 1, "diff": {"3": {"text": "koi " * 50, "seed": 2**40}}}
+
+
+@pytest.mark.parametrize("name", list(CODECS))
+def test_every_codec_round_trips(name):
+    data = get_codec(name).encode(RECORD)
+    assert decode(data) == RECORD
+
+
+def test_codecs_are_recorded_in_the_payload():
+    assert codec_of(get_codec("gzip").encode(RECORD)) == "gzip"
+    assert codec_of(get_codec("compact").encode(RECORD)) == "json"
+    assert len(get_codec("compact").encode(RECORD)) < len(get_codec("json").encode(RECORD))
+
+
+def test_stdlib_fallback_without_orjson(monkeypatch):
+    monkeypatch.setattr(record_codecs, "orjson", None)
+    data = get_codec("compact").encode(RECORD)
+    assert json.loads(data) == RECORD
+    assert decode(data) == RECORD
+
+
+def test_unknown_codec_is_rejected():
+    with pytest.raises(ValueError):
+        get_codec("zstd")
+
+
+@pytest.mark.parametrize("backend", ["files", "sqlite"])
+def test_managers_read_records_from_any_codec(tmp_path: Path, backend):
+    db_path = tmp_path / "rebase.sqlite3"
+    gzip_manager = DiffManager(tmp_path / "diffs", backend=backend, db_path=db_path, codec="gzip")
+    filename = gzip_manager.save_diff("Zipped", {"value": 1})
+
+    if backend == "files":
+        assert (tmp_path / "diffs" / filename).read_bytes()[:2] == b"\x1f\x8b"
+
+    # A manager configured with another codec still reads the gzip record
+    plain_manager = DiffManager(tmp_path / "diffs", backend=backend, db_path=db_path, codec="json")
+    assert plain_manager.load_diff(filename) == {"value": 1}
+    assert plain_manager.list_diffs()[0]["name"] == "Zipped"
+
+
+def test_manifest_lists_gzip_files_written_behind_its_back(tmp_path: Path):
+    payload = {"name": "External", "created": 5, "remaps": [{"a": 1}]}
+    (tmp_path / "external.json").write_bytes(gzip.compress(json.dumps(payload).encode()))
+
+    listed = RemapManager(tmp_path).list_remaps()
+
+    assert listed == [{"filename": "external.json", "name": "External", "created": 5, "count": 1}]
+
+
+@pytest.mark.parametrize("backend", ["files", "sqlite"])
+def test_truncated_gzip_records_are_skipped(tmp_path: Path, backend):
+    diffs_dir = tmp_path / "diffs"
+    diffs_dir.mkdir()
+    zipped = get_codec("gzip").encode({"name": "Good", "created": 1, "diff": {}})
+    (diffs_dir / "good.json").write_bytes(zipped)
+    (diffs_dir / "truncated.json").write_bytes(zipped[:len(zipped) // 2])
+    (diffs_dir / "corrupt.json").write_bytes(zipped[:10] + b"\x00" * 20)
+
+    with pytest.raises(ValueError):
+        decode(zipped[:len(zipped) // 2])
+
+    manager = DiffManager(diffs_dir, backend=backend, db_path=tmp_path / "rebase.sqlite3")
+
+    assert [d["filename"] for d in manager.list_diffs()] == ["good.json"]
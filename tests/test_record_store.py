@@ -0,0 +1,112 @@
+import json
+import sqlite3
+from pathlib import Path
+
+import pytest
+
+from extension.diff_manager import DiffManager
+from extension.record_store import RecordStore, SqliteRecordStore, create_store
+from extension.remap_manager import RemapManager
+
+
+def write_record(directory: Path, filename: str, name: str, created: int) -> None:
+    directory.mkdir(parents=True, exist_ok=True)
+    payload = {"name": name, "created": created, "diff": {"created": created}}
+    (directory / filename).write_text(json.dumps(payload), encoding="utf-8")
+
+
+@pytest.mark.parametrize("backend", ["files", "sqlite"])
+def test_pagination_and_prefix_search(tmp_path: Path, backend):
+    diffs_dir = tmp_path / "diffs"
+    for i, name in enumerate(["Portrait A", "portrait B", "Landscape", "Portal_50%"]):
+        write_record(diffs_dir, f"d{i}.json", name, 1000 + i)
+
+    manager = DiffManager(diffs_dir, backend=backend, db_path=tmp_path / "rebase.sqlite3")
+
+    assert [d["filename"] for d in manager.list_diffs()] == ["d3.json", "d2.json", "d1.json", "d0.json"]
+    assert [d["filename"] for d in manager.list_diffs(limit=2, offset=1)] == ["d2.json", "d1.json"]
+    assert [d["name"] for d in manager.list_diffs(prefix="portr")] == ["portrait B", "Portrait A"]
+    assert [d["name"] for d in manager.list_diffs(prefix="Portal_5")] == ["Portal_50%"]
+    assert manager.count_diffs() == 4
+    assert manager.count_diffs(prefix="POR") == 3
+    assert manager.load_diff("d2.json") == {"created": 1002}
+
+
+@pytest.mark.parametrize("backend", ["files", "sqlite"])
+def test_prefix_search_folds_non_ascii_case_the_same_in_every_backend(tmp_path: Path, backend):
+    diffs_dir = tmp_path / "diffs"
+    for i, name in enumerate(["Ärger", "ärmel", "Apfel", "ΣΟΦΙΑ"]):
+        write_record(diffs_dir, f"d{i}.json", name, 1000 + i)
+
+    manager = DiffManager(diffs_dir, backend=backend, db_path=tmp_path / "rebase.sqlite3")
+
+    assert [d["name"] for d in manager.list_diffs(prefix="ÄR")] == ["ärmel", "Ärger"]
+    assert [d["name"] for d in manager.list_diffs(prefix="σοφ")] == ["ΣΟΦΙΑ"]
+    assert manager.count_diffs(prefix="a") == 1
+
+
+def test_sqlite_store_upgrades_tables_without_name_key(tmp_path: Path):
+    db_path = tmp_path / "rebase.sqlite3"
+    conn = sqlite3.connect(str(db_path))
+    conn.executescript("""
+        CREATE TABLE diffs (
+            filename TEXT PRIMARY KEY,
+            name TEXT NOT NULL COLLATE NOCASE,
+            created REAL NOT NULL,
+            summary TEXT NOT NULL,
+            data BLOB NOT NULL
+        );
+        CREATE INDEX diffs_name ON diffs (name);
+    """)
+    conn.execute(
+        "INSERT INTO diffs VALUES (?, ?, ?, ?, ?)",
+        ("old.json", "Ärger", 1, json.dumps({"name": "Ärger", "created": 1}), json.dumps({"diff": {}})),
+    )
+    conn.commit()
+    conn.close()
+
+    store = SqliteRecordStore(db_path, "diffs", DiffManager._summarize)
+
+    assert [r["filename"] for r in store.list(prefix="är")] == ["old.json"]
+
+
+def test_record_store_is_abstract():
+    with pytest.raises(TypeError):
+        RecordStore()
+
+
+def test_sqlite_backend_round_trip_without_files(tmp_path: Path):
+    remaps_dir = tmp_path / "remaps"
+    manager = RemapManager(remaps_dir, backend="sqlite", db_path=tmp_path / "rebase.sqlite3")
+
+    filename = manager.save_remaps("Sample", [{"source": 1}])
+
+    assert not (remaps_dir / filename).exists()
+    assert manager.load_remaps(filename) == [{"source": 1}]
+    assert manager.list_remaps()[0]["count"] == 1
+    assert manager.delete_remaps(filename) is True
+    assert manager.delete_remaps(filename) is False
+    with pytest.raises(FileNotFoundError):
+        manager.load_remaps(filename)
+
+
+def test_migration_runs_once_and_leaves_files(tmp_path: Path):
+    diffs_dir = tmp_path / "diffs"
+    write_record(diffs_dir, "old.json", "Old", 1)
+    (diffs_dir / "broken.json").write_text("not-json", encoding="utf-8")
+    db_path = tmp_path / "rebase.sqlite3"
+
+    store = SqliteRecordStore(db_path, "diffs", DiffManager._summarize)
+    assert store.migrate_directory(diffs_dir) == 1
+    assert (diffs_dir / "old.json").exists()
+
+    # Deleted records are not resurrected by a later start
+    store.delete("old.json")
+    write_record(diffs_dir, "late.json", "Late", 2)
+    assert store.migrate_directory(diffs_dir) == 0
+    assert store.count() == 0
+
+
+def test_unknown_backend_is_rejected(tmp_path: Path):
+    with pytest.raises(ValueError):
+        create_store("mongo", tmp_path, "diffs", DiffManager._summarize)
@@ -4,6 +4,7 @@ from typing import Any, Dict
 
 import pytest
 from aiohttp import web
+from aiohttp.test_utils import TestClient, TestServer
 from multidict import MultiDict, MultiDictProxy
 
 from extension import routes
@@ -69,11 +70,21 @@ async def test_list_images_returns_only_supported_types(tmp_path, monkeypatch):
             {
                 "filename": "image.png",
                 "url": "/rebase/data/view?type=evals&folder=sample&filename=image.png",
+                "thumb_url": "/rebase/data/thumb?type=evals&folder=sample&filename=image.png",
+                "workflow_url": "/rebase/data/workflow?type=evals&folder=sample&filename=image.png",
             }
         ]
     }
 
 
+async def make_client(*routes_: web.RouteDef) -> TestClient:
+    app = web.Application()
+    app.add_routes(list(routes_))
+    client = TestClient(TestServer(app))
+    await client.start_server()
+    return client
+
+
 @pytest.mark.asyncio
 async def test_view_file_returns_binary_contents(tmp_path, monkeypatch):
     monkeypatch.setattr(routes, "get_parent_path", lambda: tmp_path)
@@ -82,12 +93,78 @@ async def test_view_file_returns_binary_contents(tmp_path, monkeypatch):
     folder.mkdir(parents=True)
     (folder / "image.png").write_bytes(b"fakepng")
 
-    request = DummyRequest(query={"type": "evals", "folder": "sample", "filename": "image.png"})
-    response = await routes.view_file(request)
+    client = await make_client(web.get("/data/view", routes.view_file))
+    try:
+        response = await client.get(
+            "/data/view", params={"type": "evals", "folder": "sample", "filename": "image.png"}
+        )
+        assert response.status == 200
+        assert response.content_type == "image/png"
+        assert await response.read() == b"fakepng"
+    finally:
+        await client.close()
+
+
+@pytest.mark.asyncio
+async def test_view_file_supports_conditional_and_range_requests(tmp_path, monkeypatch):
+    monkeypatch.setattr(routes, "get_parent_path", lambda: tmp_path)
+
+    folder = tmp_path / "data" / "evals" / "sample"
+    folder.mkdir(parents=True)
+    (folder / "image.png").write_bytes(b"0123456789")
+    params = {"type": "evals", "folder": "sample", "filename": "image.png"}
+
+    client = await make_client(web.get("/data/view", routes.view_file))
+    try:
+        first = await client.get("/data/view", params=params)
+        etag = first.headers["ETag"]
+        assert "Last-Modified" in first.headers
+
+        cached = await client.get("/data/view", params=params, headers={"If-None-Match": etag})
+        assert cached.status == 304
 
-    assert response.status == 200
-    assert response.content_type == "image/png"
-    assert response.body == b"fakepng"
+        partial = await client.get("/data/view", params=params, headers={"Range": "bytes=2-5"})
+        assert partial.status == 206
+        assert await partial.read() == b"2345"
+    finally:
+        await client.close()
+
+
+@pytest.mark.asyncio
+async def test_view_file_rejects_paths_outside_data_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(routes, "get_parent_path", lambda: tmp_path)
+
+    (tmp_path / "data" / "evals" / "sample").mkdir(parents=True)
+    (tmp_path / "secret.json").write_text("{}")
+
+    request = DummyRequest(query={"folder": "sample", "filename": "../../../secret.json"})
+    with pytest.raises(web.HTTPBadRequest):
+        await routes.view_file(request)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("folder_type", ["..", "../..", "evals/../..", ".cache", "/etc", ""])
+async def test_data_routes_reject_type_outside_data_dir(tmp_path, monkeypatch, folder_type):
+    monkeypatch.setattr(routes, "get_parent_path", lambda: tmp_path / "root")
+    (tmp_path / "root" / "data" / "evals" / "sample").mkdir(parents=True)
+    (tmp_path / "root" / "secret.json").write_text("{}")
+    (tmp_path / "sample").mkdir()
+
+    with pytest.raises(web.HTTPBadRequest):
+        await routes.list_data_folders(DummyRequest(query={"type": folder_type}))
+    with pytest.raises(web.HTTPBadRequest):
+        await routes.list_images(DummyRequest(query={"type": folder_type, "folder": "sample"}))
+    with pytest.raises(web.HTTPBadRequest):
+        await routes.view_file(DummyRequest(query={"type": folder_type, "folder": ".", "filename": "secret.json"}))
+
+
+@pytest.mark.asyncio
+async def test_list_images_rejects_folder_outside_data_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(routes, "get_parent_path", lambda: tmp_path)
+    (tmp_path / "data" / "evals").mkdir(parents=True)
+
+    with pytest.raises(web.HTTPBadRequest):
+        await routes.list_images(DummyRequest(query={"folder": "../.."}))
 
 
 @pytest.mark.asyncio
@@ -125,3 +202,40 @@ async def test_save_and_list_remaps_route(tmp_path, monkeypatch):
 
     assert payload["remaps"][0]["filename"] == filename
     assert payload["remaps"][0]["count"] == 1
+
+
+@pytest.mark.asyncio
+async def test_list_diffs_route_paginates(tmp_path, monkeypatch):
+    manager = DiffManager(tmp_path)
+    monkeypatch.setattr(routes, "diff_manager", manager)
+    for name in ("Alpha", "Beta", "Alpine"):
+        manager.save_diff(name, {"name": name})
+
+    response = await routes.list_diffs_route(DummyRequest(query={"prefix": "al", "limit": "1"}))
+    payload = decode_response(response)
+
+    assert payload["total"] == 2
+    assert len(payload["diffs"]) == 1
+    assert payload["diffs"][0]["name"].startswith("Al")
+
+    response = await routes.list_diffs_route(DummyRequest(query={"limit": "many"}))
+    assert response.status == 400
+
+
+@pytest.mark.asyncio
+async def test_diff_version_routes(tmp_path, monkeypatch):
+    manager = DiffManager(tmp_path)
+    monkeypatch.setattr(routes, "diff_manager", manager)
+    filename = manager.save_diff("Versioned", {"value": 1})
+    manager.save_diff("Versioned", {"value": 2})
+
+    response = await routes.list_diff_versions_route(DummyRequest(match_info={"filename": filename}))
+    versions = decode_response(response)["versions"]
+    assert [v["version"] for v in versions] == [1, 2]
+    assert all("delta" not in v for v in versions)
+
+    response = await routes.load_diff_version_route(DummyRequest(match_info={"filename": filename, "version": "1"}))
+    assert decode_response(response) == {"diff": {"value": 1}, "version": 1}
+
+    response = await routes.load_diff_version_route(DummyRequest(match_info={"filename": filename, "version": "9"}))
+    assert response.status == 404
@@ -1,68 +1,452 @@
-import sys
+import asyncio
 import json
 import types
-import importlib
-import builtins
 
 import pytest
 
+from extension.templates import TemplateRegistry
 
-@pytest.mark.asyncio
-async def test_forward_reset_request_loads_template_and_sends(tmp_path, monkeypatch):
-    # Prepare a fake JSON template file
-    template_data = {"hello": "world", "n": 42}
-    template_str = json.dumps(template_data)
-    tmp_template = tmp_path / "workflowTemplate.json"
-    tmp_template.write_text(template_str, encoding="utf-8")
 
-    # Stub the ComfyUI server module to capture websocket sends
-    class DummyPromptServer:
-        def __init__(self):
-            self.sent = []
+class JsonRequest:
+    def __init__(self, payload=None, query=None):
+        self._payload = payload
+        self.query = query or {}
+
+    async def json(self):
+        return self._payload
+
+
+class FakeWebSocket:
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.messages = []
+        self.closed = False
+
+    async def send_str(self, message):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        self.messages.append(message)
+
+    async def close(self):
+        self.closed = True
+
+
+class DummyPromptServer:
+    def __init__(self):
+        self.sockets = {"tab": FakeWebSocket()}
+
+    @property
+    def sent(self):
+        decoded = (json.loads(m) for m in self.sockets["tab"].messages)
+        return [(m["type"], m["data"]) for m in decoded]
 
-        async def send_json(self, event, data):
-            self.sent.append((event, data))
+
+@pytest.fixture
+def socket_events(monkeypatch):
+    import extension.socket_events as se
+    from extension import fanout as fanout_module
 
     server_stub = types.SimpleNamespace(
         PromptServer=types.SimpleNamespace(instance=DummyPromptServer())
     )
-    monkeypatch.setitem(sys.modules, "server", server_stub)
+    monkeypatch.setattr(se, "server", server_stub)
+    monkeypatch.setattr(fanout_module, "server", server_stub)
+    return se
 
-    # Patch open() so socket_events reads from our data dir file path
-    real_open = builtins.open
-    opened_paths: list[str] = []
 
-    def fake_open(path, mode="r", *args, **kwargs):
-        p = str(path)
-        opened_paths.append(p)
-        # Redirect the module's ../data/workflowTemplate.json to our temp file
-        if p.endswith("../data/workflowTemplate.json") or p.endswith("data/workflowTemplate.json"):
-            return real_open(tmp_template, mode, *args, **kwargs)
-        return real_open(path, mode, *args, **kwargs)
+@pytest.mark.asyncio
+async def test_forward_batch_delivers_events_in_order(socket_events):
+    request = JsonRequest({"events": [
+        {"event": "prompt_replace", "data": {"positive_prompt": "cat"}},
+        {"event": "generate", "data": {"count": 2}},
+    ]})
 
-    monkeypatch.setattr(builtins, "open", fake_open)
+    resp = await socket_events.forward_batch_to_websocket(request)
 
-    # Import fresh to trigger file load at module import time
-    sys.modules.pop("extension.socket_events", None)
-    import extension.socket_events as se
-    importlib.reload(se)
+    assert resp.status == 200
+    payload = json.loads(resp.body.decode())
+    assert payload["count"] == 2
+    assert payload["delivered"] == [1, 1]
+    assert socket_events.server.PromptServer.instance.sent == [
+        ("prompt_replace", {"positive_prompt": "cat"}),
+        ("generate", {"count": 2}),
+    ]
 
-    # Invoke the handler
-    class DummyRequest:
-        pass
 
-    resp = await se.forward_reset_request(DummyRequest())
+@pytest.mark.asyncio
+async def test_forward_batch_rejects_whole_batch_on_unsupported_event(socket_events):
+    request = JsonRequest({"events": [
+        {"event": "prompt_replace", "data": {}},
+        {"event": "load_graph", "data": {}},
+    ]})
+
+    resp = await socket_events.forward_batch_to_websocket(request)
+
+    assert resp.status == 400
+    assert "index 1" in json.loads(resp.body.decode())["error"]
+    assert socket_events.server.PromptServer.instance.sent == []
+
+
+@pytest.mark.asyncio
+async def test_queue_status_reports_depth_and_submitted_counter(socket_events):
+    class PromptQueue:
+        def get_current_queue(self):
+            return [["running"]], [["a"], ["b"]]
+
+    instance = socket_events.server.PromptServer.instance
+    instance.prompt_queue = PromptQueue()
+    instance.number = 7
+
+    resp = await socket_events.queue_status(None)
+
+    assert json.loads(resp.body.decode()) == {
+        "running": 1, "pending": 2, "remaining": 3, "submitted": 7,
+    }
+
+
+@pytest.fixture
+def templates(tmp_path, socket_events, monkeypatch):
+    templates_dir = tmp_path / "templates"
+    templates_dir.mkdir()
+    legacy = tmp_path / "workflowTemplate.json"
+    registry = TemplateRegistry(templates_dir, legacy_path=legacy, check_interval=0)
+    monkeypatch.setattr(socket_events, "template_registry", registry)
+    return templates_dir, legacy
+
+
+@pytest.mark.asyncio
+async def test_forward_reset_request_sends_legacy_template(socket_events, templates):
+    _, legacy = templates
+    template_str = json.dumps({"hello": "world", "n": 42})
+    legacy.write_text(template_str, encoding="utf-8")
+
+    resp = await socket_events.forward_reset_request(JsonRequest())
+
     assert resp.status == 200
-    assert resp.body is not None
     payload = json.loads(resp.body.decode())
-    assert payload == {"success": True}
+    assert payload["success"] is True
+    assert payload["template"] == "default"
+    sent = socket_events.server.PromptServer.instance.sent
+    assert sent == [("load_graph", template_str)]  # sent as the raw JSON string
+
+
+@pytest.mark.asyncio
+async def test_forward_reset_request_selects_and_reloads_named_template(socket_events, templates):
+    templates_dir, _ = templates
+    path = templates_dir / "portrait.json"
+    path.write_text('{"v": 1}', encoding="utf-8")
+
+    await socket_events.forward_reset_request(JsonRequest(query={"template": "portrait"}))
+    path.write_text('{"v": 2, "changed": true}', encoding="utf-8")
+    await socket_events.forward_reset_request(JsonRequest(query={"template": "portrait"}))
+
+    sent = socket_events.server.PromptServer.instance.sent
+    assert [data for _, data in sent] == ['{"v": 1}', '{"v": 2, "changed": true}']
+
+
+@pytest.mark.asyncio
+async def test_forward_reset_request_unknown_template(socket_events, templates):
+    for name in ("missing", "../secret"):
+        resp = await socket_events.forward_reset_request(JsonRequest(query={"template": name}))
+        assert resp.status == 404
+    assert socket_events.server.PromptServer.instance.sent == []
+
+
+def test_registry_serves_cached_template_between_checks(tmp_path):
+    path = tmp_path / "a.json"
+    path.write_text('{"a": 1}', encoding="utf-8")
+    registry = TemplateRegistry(tmp_path, check_interval=60)
+
+    assert registry.cached("a") is None
+    template = registry.get("a")
+    assert registry.cached("a") is template
+    assert json.loads(template.message) == {"type": "load_graph", "data": '{"a": 1}'}
+    assert registry.names() == ["a"]
+
+
+@pytest.mark.asyncio
+async def test_forward_encodes_once_and_reports_delivery(socket_events):
+    instance = socket_events.server.PromptServer.instance
+    instance.sockets["second"] = FakeWebSocket()
+
+    resp = await socket_events.forward_to_websocket(
+        JsonRequest({"event": "generate", "data": {"count": 1}})
+    )
+
+    payload = json.loads(resp.body.decode())
+    assert payload["delivered"] == 2
+    assert "duration_ms" in payload
+    assert instance.sockets["tab"].messages == instance.sockets["second"].messages
+
+
+@pytest.mark.asyncio
+async def test_fanout_drops_sockets_that_keep_stalling(monkeypatch, socket_events):
+    from extension.fanout import WebsocketFanout
+
+    instance = socket_events.server.PromptServer.instance
+    stuck = FakeWebSocket(delay=1)
+    instance.sockets["stuck"] = stuck
+    fanout = WebsocketFanout(send_timeout=0.01, drop_after=2)
+
+    first = await fanout.broadcast("generate", {"count": 1})
+    second = await fanout.broadcast("generate", {"count": 1})
+    await asyncio.sleep(0)
+
+    assert (first.delivered, first.timed_out) == (1, 1)
+    assert (second.delivered, second.dropped) == (1, 1)
+    assert "stuck" not in instance.sockets
+    assert stuck.closed
+
+
+@pytest.mark.asyncio
+async def test_fanout_forgets_strikes_of_disconnected_sockets(socket_events):
+    from extension.fanout import WebsocketFanout
+
+    instance = socket_events.server.PromptServer.instance
+    instance.sockets["slow"] = FakeWebSocket(delay=1)
+    fanout = WebsocketFanout(send_timeout=0.01, drop_after=3)
+
+    await fanout.broadcast("generate", {"count": 1})
+    assert set(fanout._strikes) == {"slow"}
+
+    # The socket goes away through ComfyUI's own handler, not a drop
+    del instance.sockets["slow"]
+    await fanout.broadcast("generate", {"count": 1})
+    assert fanout._strikes == {}
+
+
+def test_merge_detail_merges_nested_fields():
+    from extension.socket_events import merge_detail
+
+    merged = merge_detail(
+        {"positive_prompt": "cat", "loras": {"a": 0.5, "b": 1.0}},
+        {"negative_prompt": "blurry", "loras": {"b": 0.2}},
+    )
 
-    # Assert the websocket event was sent with the JSON read from file
-    sent = server_stub.PromptServer.instance.sent
-    assert len(sent) == 1
-    event, data = sent[0]
-    assert event == "load_graph" # translated event type
-    assert data == template_str  # sent as the raw JSON string
+    assert merged == {
+        "positive_prompt": "cat",
+        "negative_prompt": "blurry",
+        "loras": {"a": 0.5, "b": 0.2},
+    }
+
+
+@pytest.fixture
+def coalescing(socket_events, monkeypatch):
+    coalescer = socket_events.PromptReplaceCoalescer(window=0.05)
+    monkeypatch.setattr(socket_events, "coalescer", coalescer)
+    return coalescer
+
+
+@pytest.mark.asyncio
+async def test_coalescer_merges_burst_into_one_event(socket_events, coalescing):
+    for data in ({"positive_prompt": "cat"}, {"positive_prompt": "dog"}, {"seed": 7}):
+        resp = await socket_events.forward_to_websocket(JsonRequest({"event": "prompt_replace", "data": data}))
+        assert json.loads(resp.body.decode())["coalesced"] is True
+
+    instance = socket_events.server.PromptServer.instance
+    assert instance.sent == []
+    await asyncio.sleep(0.1)
+    assert instance.sent == [("prompt_replace", {"positive_prompt": "dog", "seed": 7})]
+
+
+@pytest.mark.asyncio
+async def test_coalescer_flushes_before_generate(socket_events, coalescing):
+    request = JsonRequest({"events": [
+        {"event": "prompt_replace", "data": {"positive_prompt": "cat"}},
+        {"event": "prompt_replace", "data": {"negative_prompt": "blurry"}},
+        {"event": "generate", "data": {"count": 1}},
+    ]})
+
+    resp = await socket_events.forward_batch_to_websocket(request)
+
+    assert json.loads(resp.body.decode())["delivered"] == [None, None, 1]
+    assert socket_events.server.PromptServer.instance.sent == [
+        ("prompt_replace", {"positive_prompt": "cat", "negative_prompt": "blurry"}),
+        ("generate", {"count": 1}),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_coalescer_caps_delay_for_continuous_bursts(socket_events):
+    coalescer = socket_events.PromptReplaceCoalescer(window=0.05, max_delay=0.08)
+    instance = socket_events.server.PromptServer.instance
+
+    for i in range(6):
+        coalescer.add({"seed": i})
+        await asyncio.sleep(0.02)
+
+    assert instance.sent and instance.sent[0][0] == "prompt_replace"
+    await coalescer.flush()
+    assert instance.sent[-1] == ("prompt_replace", {"seed": 5})
+
+
+@pytest.mark.asyncio
+async def test_coalescer_recovers_after_failed_broadcast(socket_events, coalescing, monkeypatch, caplog):
+    fanout = socket_events.fanout
+    real_broadcast = fanout.broadcast
+    failures = [RuntimeError("socket exploded")]
+
+    async def flaky_broadcast(event, data=None, message=None):
+        if failures:
+            raise failures.pop()
+        return await real_broadcast(event, data, message)
+
+    monkeypatch.setattr(fanout, "broadcast", flaky_broadcast)
+    instance = socket_events.server.PromptServer.instance
+
+    # The timer-driven flush fails; the error is logged, not left unobserved
+    coalescing.add({"positive_prompt": "cat"})
+    await asyncio.sleep(0.1)
+    assert "socket exploded" in caplog.text
+    assert instance.sent == []
+
+    coalescing.add({"positive_prompt": "dog"})
+    result = await coalescing.flush()
+    assert result.delivered == 1
+    resp = await socket_events.forward_to_websocket(JsonRequest({"event": "generate", "data": {"count": 1}}))
+    assert resp.status == 200
+    assert instance.sent == [("prompt_replace", {"positive_prompt": "dog"}), ("generate", {"count": 1})]
+
+
+@pytest.mark.asyncio
+async def test_cancelled_caller_does_not_cancel_shared_delivery(socket_events, coalescing):
+    instance = socket_events.server.PromptServer.instance
+    instance.sockets["tab"].delay = 0.05
+
+    coalescing.add({"positive_prompt": "cat"})
+    caller = asyncio.ensure_future(coalescing.flush())
+    await asyncio.sleep(0.01)
+    caller.cancel()
+
+    result = await coalescing.flush()
+    assert result.delivered == 1
+    assert instance.sent == [("prompt_replace", {"positive_prompt": "cat"})]
+
+
+class AckingWebSocket(FakeWebSocket):
+    """A tab that acknowledges events after handling them, like the frontend."""
+
+    def __init__(self, acks, fail_events=()):
+        super().__init__()
+        self.acks = acks
+        self.fail_events = fail_events
+
+    async def send_str(self, message):
+        await super().send_str(message)
+        decoded = json.loads(message)
+        data = decoded["data"] or {}
+        if data.get("rebase_ack"):
+            ok = decoded["type"] not in self.fail_events
+            # The frontend's generate handler answers with the prompts it queued
+            result = {"prompt_ids": [f"prompt-{i}" for i in range(data["count"])]} if ok and decoded["type"] == "generate" else None
+            loop = asyncio.get_running_loop()
+            loop.call_later(0.01, self.acks.resolve, data["rebase_id"], ok, None if ok else "boom", result)
+
+
+@pytest.fixture
+def acks(monkeypatch, socket_events):
+    from extension.acks import AckRegistry
+
+    registry = AckRegistry()
+    monkeypatch.setattr(socket_events, "acks", registry)
+    return registry
+
+
+@pytest.mark.asyncio
+async def test_forward_wait_returns_after_acknowledgement(socket_events, acks, coalescing):
+    tab = AckingWebSocket(acks)
+    socket_events.server.PromptServer.instance.sockets = {"tab": tab}
+    socket_events.coalescer.add({"positive_prompt": "earlier"})
+
+    request = JsonRequest({"event": "generate", "data": {"count": 2}}, query={"wait": "true"})
+    resp = await socket_events.forward_to_websocket(request)
+    payload = json.loads(resp.text)
+
+    assert resp.status == 200
+    assert payload["success"] is True
+    assert payload["result"] == {"prompt_ids": ["prompt-0", "prompt-1"]}
+    sent = [json.loads(m) for m in tab.messages]
+    # The buffered prompt_replace goes out first, untagged
+    assert sent[0] == {"type": "prompt_replace", "data": {"positive_prompt": "earlier"}}
+    assert sent[1]["data"] == {"count": 2, "rebase_id": payload["id"], "rebase_ack": True}
+    assert acks.pending == 0
+
+
+@pytest.mark.asyncio
+async def test_forward_wait_times_out_without_acknowledgement(socket_events, acks):
+    request = JsonRequest({"event": "prompt_replace", "data": {}}, query={"wait": "1", "timeout": "0.05"})
+    resp = await socket_events.forward_to_websocket(request)
+
+    assert resp.status == 504
+    assert json.loads(resp.text)["delivered"] == 1
+    assert acks.pending == 0
+    # A late acknowledgement is ignored
+    assert acks.resolve(json.loads(resp.text)["id"]) is False
+
+
+@pytest.mark.asyncio
+async def test_forward_wait_rejects_bad_timeout_and_reports_handler_failure(socket_events, acks):
+    bad = JsonRequest({"event": "generate", "data": {"count": 1}}, query={"wait": "true", "timeout": "0"})
+    assert (await socket_events.forward_to_websocket(bad)).status == 400
+
+    socket_events.server.PromptServer.instance.sockets = {"tab": AckingWebSocket(acks, fail_events=("generate",))}
+    request = JsonRequest({"event": "generate", "data": {"count": 1}}, query={"wait": "true"})
+    resp = await socket_events.forward_to_websocket(request)
+    assert resp.status == 502
+    assert "boom" in json.loads(resp.text)["error"]
+
+
+@pytest.mark.asyncio
+async def test_forward_batch_wait_collects_every_acknowledgement(socket_events, acks):
+    socket_events.server.PromptServer.instance.sockets = {"tab": AckingWebSocket(acks)}
+    request = JsonRequest({"events": [
+        {"event": "prompt_replace", "data": {"positive_prompt": "cat"}},
+        {"event": "generate", "data": {"count": 1}},
+    ]}, query={"wait": "true"})
+
+    resp = await socket_events.forward_batch_to_websocket(request)
+    payload = json.loads(resp.text)
+
+    assert resp.status == 200
+    assert [a["id"] for a in payload["acks"]] == payload["ids"]
+    assert all(a["ok"] for a in payload["acks"])
+    assert payload["acks"][1]["result"] == {"prompt_ids": ["prompt-0"]}
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("route", ["forward_to_websocket", "forward_batch_to_websocket"])
+async def test_cancelled_wait_does_not_leak_pending_acks(socket_events, acks, route):
+    item = {"event": "generate", "data": {"count": 1}}
+    payload = item if route == "forward_to_websocket" else {"events": [item, item]}
+    handler = getattr(socket_events, route)
+
+    # Client gone while the event is still being written ...
+    socket_events.server.PromptServer.instance.sockets = {"tab": FakeWebSocket(delay=1.0)}
+    task = asyncio.ensure_future(handler(JsonRequest(payload, query={"wait": "true"})))
+    await asyncio.sleep(0.01)
+    assert acks.pending == 1
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    assert acks.pending == 0
+
+    # ... and while waiting for the browser to acknowledge it
+    socket_events.server.PromptServer.instance.sockets = {"tab": FakeWebSocket()}
+    task = asyncio.ensure_future(handler(JsonRequest(payload, query={"wait": "true"})))
+    await asyncio.sleep(0.01)
+    assert acks.pending >= 1
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    assert acks.pending == 0
+
+
+@pytest.mark.asyncio
+async def test_acknowledge_event_route_resolves_pending_id(socket_events, acks):
+    ack_id = acks.register()
+    resp = await socket_events.acknowledge_event(JsonRequest({"id": ack_id, "ok": True, "result": {"prompt_ids": ["p1"]}}))
+    assert json.loads(resp.text) == {"success": True, "matched": True}
+    assert await acks.wait(ack_id, 1) == {"id": ack_id, "ok": True, "error": None, "result": {"prompt_ids": ["p1"]}}
 
-    # Sanity check that the module attempted to read the expected data path
-    assert any("data/workflowTemplate.json" in p for p in opened_paths)
+    missing = await socket_events.acknowledge_event(JsonRequest({}))
+    assert missing.status == 400
@@ -0,0 +1,115 @@
+import os
+from pathlib import Path
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestClient, TestServer
+from PIL import Image
+
+from extension import routes, thumbnails
+from extension.thumbnails import ThumbnailCache
+
+
+def make_image(path: Path, size=(800, 600)) -> Path:
+    Image.new("RGB", size, "blue").save(path)
+    return path
+
+
+def test_thumbnail_is_downscaled_and_cached(tmp_path: Path):
+    source = make_image(tmp_path / "source.png")
+    cache = ThumbnailCache(tmp_path / "thumbs")
+
+    thumb = cache.get(source, 128, "webp")
+    with Image.open(thumb) as img:
+        assert img.format == "WEBP"
+        assert img.size == (128, 96)
+
+    assert cache.get(source, 128, "webp") == thumb
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_changed_source_gets_a_new_thumbnail(tmp_path: Path):
+    source = make_image(tmp_path / "source.png")
+    cache = ThumbnailCache(tmp_path / "thumbs")
+    first = cache.get(source, 64, "jpeg")
+
+    make_image(source, (300, 300))
+    st = source.stat()
+    os.utime(source, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+
+    assert cache.get(source, 64, "jpeg") != first
+
+
+def test_failed_write_leaves_no_temp_file(tmp_path: Path, monkeypatch):
+    source = make_image(tmp_path / "source.png")
+    cache = ThumbnailCache(tmp_path / "thumbs")
+
+    def fail_replace(src, dst):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(thumbnails.os, "replace", fail_replace)
+    with pytest.raises(OSError):
+        cache.get(source, 64, "webp")
+
+    assert list((tmp_path / "thumbs").iterdir()) == []
+
+
+def test_least_recently_used_thumbnails_are_evicted(tmp_path: Path):
+    sources = [make_image(tmp_path / f"{i}.png") for i in range(3)]
+    cache = ThumbnailCache(tmp_path / "thumbs")
+    first = cache.get(sources[0], 64)
+    cache.max_bytes = first.stat().st_size * 2
+
+    second = cache.get(sources[1], 64)
+    cache.get(sources[0], 64)  # refresh the first entry
+    third = cache.get(sources[2], 64)
+
+    assert first.exists()
+    assert not second.exists()
+    assert third.exists()
+    assert cache.stats()["entries"] == 2
+
+
+def test_lru_order_is_restored_from_disk(tmp_path: Path):
+    sources = [make_image(tmp_path / f"{i}.png") for i in range(2)]
+    cache = ThumbnailCache(tmp_path / "thumbs")
+    old = cache.get(sources[0], 64)
+    new = cache.get(sources[1], 64)
+    os.utime(old, (1, 1))
+
+    restarted = ThumbnailCache(tmp_path / "thumbs", max_bytes=new.stat().st_size)
+    restarted.get(sources[1], 64)
+    restarted._evict()
+
+    assert not old.exists()
+    assert new.exists()
+
+
+@pytest.mark.asyncio
+async def test_thumbnail_route_serves_cached_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(routes, "get_parent_path", lambda: tmp_path)
+    monkeypatch.setattr(routes, "thumbnail_cache", ThumbnailCache(tmp_path / "thumbs"))
+    folder = tmp_path / "data" / "evals" / "sample"
+    folder.mkdir(parents=True)
+    make_image(folder / "image.png")
+
+    app = web.Application()
+    app.router.add_get("/data/thumb", routes.view_thumbnail)
+    client = TestClient(TestServer(app))
+    await client.start_server()
+    try:
+        params = {"folder": "sample", "filename": "image.png", "size": "100", "format": "jpeg"}
+        response = await client.get("/data/thumb", params=params)
+        assert response.status == 200
+        assert response.content_type == "image/jpeg"
+
+        bad = await client.get("/data/thumb", params={**params, "format": "gif"})
+        assert bad.status == 400
+
+        # More than twice MAX_IMAGE_PIXELS makes PIL refuse to open the image
+        monkeypatch.setattr(Image, "MAX_IMAGE_PIXELS", 1000)
+        bomb = await client.get("/data/thumb", params={**params, "size": "120"})
+        assert bomb.status == 422
+    finally:
+        await client.close()
@@ -0,0 +1,137 @@
+import os
+import json
+from pathlib import Path
+
+import pytest
+from aiohttp import web
+from multidict import MultiDict, MultiDictProxy
+from PIL import Image
+from PIL.PngImagePlugin import PngInfo
+
+from extension import routes, workflow_meta
+from extension.workflow_meta import WorkflowCache, read_embedded_metadata
+
+WORKFLOW = {"nodes": [{"id": 1, "type": "KSampler"}], "links": []}
+PROMPT = {"1": {"class_type": "KSampler", "inputs": {}}}
+
+
+class QueryRequest:
+    def __init__(self, query):
+        self.query = MultiDictProxy(MultiDict(query))
+
+
+def save_png(path: Path, texts, compressed=False) -> Path:
+    info = PngInfo()
+    for key, value in texts.items():
+        if compressed:
+            info.add_itxt(key, value, zip=True)
+        else:
+            info.add_text(key, value)
+    Image.new("RGB", (8, 8)).save(path, pnginfo=info)
+    return path
+
+
+def test_reads_png_text_chunks(tmp_path: Path):
+    path = save_png(tmp_path / "a.png", {"workflow": json.dumps(WORKFLOW), "prompt": json.dumps(PROMPT)})
+
+    assert read_embedded_metadata(path) == {"workflow": WORKFLOW, "prompt": PROMPT}
+
+
+def test_reads_compressed_itxt_chunks(tmp_path: Path):
+    path = save_png(tmp_path / "a.png", {"workflow": json.dumps(WORKFLOW)}, compressed=True)
+
+    assert read_embedded_metadata(path) == {"workflow": WORKFLOW}
+
+
+def test_reads_webp_exif_metadata(tmp_path: Path):
+    exif = Image.Exif()
+    exif[0x010F] = "workflow:" + json.dumps(WORKFLOW)
+    exif[0x0110] = "prompt:" + json.dumps(PROMPT)
+    path = tmp_path / "a.webp"
+    Image.new("RGB", (8, 8)).save(path, exif=exif)
+
+    assert read_embedded_metadata(path) == {"workflow": WORKFLOW, "prompt": PROMPT}
+
+
+def test_images_without_metadata(tmp_path: Path):
+    path = tmp_path / "plain.jpg"
+    Image.new("RGB", (8, 8)).save(path)
+    save_png(tmp_path / "bad.png", {"workflow": "{not json"})
+
+    assert read_embedded_metadata(path) == {}
+    assert read_embedded_metadata(tmp_path / "bad.png") == {}
+
+
+def test_malformed_chunks_are_skipped(tmp_path: Path):
+    path = save_png(tmp_path / "a.png", {"workflow": json.dumps(WORKFLOW), "prompt": json.dumps(PROMPT)})
+    data = path.read_bytes()
+    # Replace the prompt's tEXt chunk with a zTXt one whose stream is not zlib
+    start = data.index(b"tEXtprompt") - 4
+    end = start + 12 + int.from_bytes(data[start:start + 4], "big")
+    bogus = b"prompt\x00\x00not zlib"
+    chunk = len(bogus).to_bytes(4, "big") + b"zTXt" + bogus + b"\x00" * 4
+    path.write_bytes(data[:start] + chunk + data[end:])
+
+    assert read_embedded_metadata(path) == {"workflow": WORKFLOW}
+
+    webp = tmp_path / "truncated.webp"
+    webp.write_bytes(b"RIFF\x00\x00\x00\x00WEBPEXIF\x08\x00\x00\x00II*\x00\xff\xff\x00\x00")
+    assert read_embedded_metadata(webp) == {}
+
+
+def test_has_workflow_follows_file_changes_and_stays_bounded(tmp_path: Path, monkeypatch):
+    cache = WorkflowCache(max_known=2)
+    paths = [save_png(tmp_path / f"{i}.png", {"workflow": json.dumps(WORKFLOW)}) for i in range(3)]
+    for path in paths:
+        cache.get(path)
+
+    # The oldest answer was evicted
+    assert [cache.has_workflow(path) for path in paths] == [None, True, True]
+
+    # Rereading a rewritten file replaces its answer rather than adding one
+    save_png(paths[2], {})
+    os.utime(paths[2], ns=(0, 10**9))
+    cache.get(paths[2])
+    assert cache.has_workflow(paths[2]) is False
+    assert cache.stats()["known"] == 2
+
+    # Listings never touch the disk
+    def no_stat(*args, **kwargs):
+        raise AssertionError("listing stat()ed a file")
+
+    monkeypatch.setattr(workflow_meta.os, "stat", no_stat)
+    names = [path.name for path in paths]
+    assert cache.has_workflows(tmp_path, names) == {"1.png": True, "2.png": False}
+
+
+def test_cache_tracks_has_workflow(tmp_path: Path):
+    path = save_png(tmp_path / "a.png", {"workflow": json.dumps(WORKFLOW)})
+    cache = WorkflowCache()
+
+    assert cache.has_workflow(path) is None
+    body = cache.get(path)
+    assert json.loads(body) == {"workflow": WORKFLOW}
+    assert cache.get(path) is body
+    assert cache.has_workflow(path) is True
+    assert cache.stats()["hits"] == 1
+
+
+@pytest.mark.asyncio
+async def test_workflow_route_and_listing(tmp_path, monkeypatch):
+    monkeypatch.setattr(routes, "get_parent_path", lambda: tmp_path)
+    monkeypatch.setattr(routes, "workflow_cache", WorkflowCache())
+    folder = tmp_path / "data" / "evals" / "sample"
+    folder.mkdir(parents=True)
+    save_png(folder / "with.png", {"workflow": json.dumps(WORKFLOW)})
+    save_png(folder / "without.png", {})
+
+    query = {"type": "evals", "folder": "sample", "filename": "with.png"}
+    response = await routes.view_workflow(QueryRequest(query))
+    assert json.loads(response.body) == {"workflow": WORKFLOW}
+
+    with pytest.raises(web.HTTPNotFound):
+        await routes.view_workflow(QueryRequest({**query, "filename": "without.png"}))
+
+    listing = json.loads((await routes.list_images(QueryRequest({"folder": "sample"}))).body)
+    flags = {image["filename"]: image.get("has_workflow") for image in listing["images"]}
+    assert flags == {"with.png": True, "without.png": False}
@@ -0,0 +1,80 @@
+import asyncio
+import json
+
+import pytest
+
+from extension.working_state import WorkingState
+
+
+@pytest.mark.asyncio
+async def test_burst_of_updates_is_written_once(tmp_path):
+    state = WorkingState(tmp_path / "working.json", delay=0.05, max_delay=1.0)
+
+    for i in range(10):
+        await state.update(nodes={"3": {"seed": {"old": 0, "new": i}}})
+    await state.update(remaps=[{"sourceNodeId": 3}])
+
+    assert not (tmp_path / "working.json").exists()
+    await asyncio.sleep(0.15)
+
+    saved = json.loads((tmp_path / "working.json").read_text())
+    assert saved["diff"] == {"3": {"seed": {"old": 0, "new": 9}}}
+    assert saved["remaps"] == [{"sourceNodeId": 3}]
+    assert saved["revision"] == 11
+    assert state.stats()["flushes"] == 1
+    assert not list(tmp_path.glob("*.tmp"))
+
+
+@pytest.mark.asyncio
+async def test_continuous_updates_flush_within_max_delay(tmp_path):
+    state = WorkingState(tmp_path / "working.json", delay=0.05, max_delay=0.1)
+
+    for i in range(8):
+        await state.update(diff={"n": i})
+        await asyncio.sleep(0.03)
+
+    assert (tmp_path / "working.json").exists()
+    await state.flush()
+    assert json.loads((tmp_path / "working.json").read_text())["diff"] == {"n": 7}
+
+
+@pytest.mark.asyncio
+async def test_state_survives_restart_and_node_updates_merge(tmp_path):
+    path = tmp_path / "working.json"
+    state = WorkingState(path)
+    await state.update(diff={"3": {"text": "cat"}, "4": {"steps": 20}})
+    await state.update(nodes={"4": None, "5": {"cfg": 7}})
+    assert await state.flush()
+    assert not await state.flush()
+
+    restored = await WorkingState(path).get()
+    assert restored["diff"] == {"3": {"text": "cat"}, "5": {"cfg": 7}}
+    assert restored["revision"] == 2
+
+
+@pytest.mark.asyncio
+async def test_working_routes(tmp_path, monkeypatch):
+    from extension import routes
+
+    state = WorkingState(tmp_path / "working.json")
+    monkeypatch.setattr(routes, "working_state", state)
+
+    class Request:
+        def __init__(self, payload=None):
+            self._payload = payload
+
+        async def json(self):
+            return self._payload
+
+    response = await routes.update_working_route(Request({"diff": {"3": {}}, "remaps": []}))
+    assert json.loads(response.body.decode())["revision"] == 1
+
+    response = await routes.update_working_route(Request({"remaps": "nope"}))
+    assert response.status == 400
+
+    response = await routes.get_working_route(Request())
+    assert json.loads(response.body.decode())["diff"] == {"3": {}}
+
+    await routes.clear_working_route(Request())
+    await routes.flush_working_state(None)
+    assert json.loads((tmp_path / "working.json").read_text())["diff"] == {}
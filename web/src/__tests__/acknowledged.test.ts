@@ -0,0 +1,59 @@
+import { afterEach, describe, expect, it, vi } from 'vitest';
+
+import { acknowledged } from '../eventHandlers/installHandlers';
+
+const ackBodies = (fetchMock: ReturnType<typeof vi.fn>) =>
+  fetchMock.mock.calls.map(([, init]) => JSON.parse(init.body));
+
+describe('acknowledged', () => {
+  afterEach(() => {
+    vi.unstubAllGlobals();
+  });
+
+  it('acknowledges events that ask for it once the handler finishes', async () => {
+    const fetchMock = vi.fn().mockResolvedValue({ ok: true });
+    vi.stubGlobal('fetch', fetchMock);
+    const calls: string[] = [];
+
+    await acknowledged(async () => {
+      calls.push('handled');
+    })({ detail: { count: 1, rebase_id: 'abc', rebase_ack: true } });
+
+    expect(calls).toEqual(['handled']);
+    expect(fetchMock).toHaveBeenCalledWith('/rebase/forward/ack', expect.anything());
+    expect(ackBodies(fetchMock)).toEqual([{ id: 'abc', ok: true }]);
+  });
+
+  it('sends the handler result along with the acknowledgement', async () => {
+    const fetchMock = vi.fn().mockResolvedValue({ ok: true });
+    vi.stubGlobal('fetch', fetchMock);
+
+    await acknowledged(async () => ({ prompt_ids: ['p1', 'p2'] }))({
+      detail: { count: 2, rebase_id: 'abc', rebase_ack: true },
+    });
+
+    expect(ackBodies(fetchMock)).toEqual([{ id: 'abc', ok: true, result: { prompt_ids: ['p1', 'p2'] } }]);
+  });
+
+  it('reports handler failures and rethrows', async () => {
+    const fetchMock = vi.fn().mockResolvedValue({ ok: true });
+    vi.stubGlobal('fetch', fetchMock);
+
+    await expect(
+      acknowledged(() => {
+        throw new Error('boom');
+      })({ detail: { rebase_id: 'abc', rebase_ack: true } })
+    ).rejects.toThrow('boom');
+
+    expect(ackBodies(fetchMock)).toEqual([{ id: 'abc', ok: false, error: 'Error: boom' }]);
+  });
+
+  it('does not acknowledge plain events', async () => {
+    const fetchMock = vi.fn();
+    vi.stubGlobal('fetch', fetchMock);
+
+    await acknowledged(() => {})({ detail: { count: 1 } });
+
+    expect(fetchMock).not.toHaveBeenCalled();
+  });
+});
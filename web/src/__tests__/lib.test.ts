@@ -73,6 +73,24 @@ describe('queuePrompts / handleGenerateImages', () => {
     vi.useRealTimers();
   });
 
+  it('resolves to the ids of the queued prompts', async () => {
+    const app = createAppStub();
+    let next = 0;
+    const api = { queuePrompt: vi.fn(async () => ({ prompt_id: `p${++next}` })) };
+    const original = api.queuePrompt;
+    app.queuePrompt.mockImplementation(() => api.queuePrompt(0, {}));
+    setAppInstance({ ...app, api } as any);
+
+    vi.useFakeTimers();
+    const promise = handleGenerateImages({ type: 'generateImages', detail: { count: 2 } });
+
+    await vi.runAllTimersAsync();
+
+    await expect(promise).resolves.toEqual({ prompt_ids: ['p1', 'p2'] });
+    expect(api.queuePrompt).toBe(original);
+    vi.useRealTimers();
+  });
+
   it('rejects invalid counts', () => {
     const app = createAppStub();
     setAppInstance(app as any);
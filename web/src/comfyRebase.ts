@@ -38,6 +38,20 @@ interface RemapStorage {
   remaps: FieldRemap[];
 }
 
+// Partial update of the server-side working state (/rebase/working)
+interface WorkingUpdate {
+  diff?: Record<string, DiffNodeData>;
+  remaps?: FieldRemap[];
+}
+
+interface WorkingState {
+  diff: Record<string, DiffNodeData>;
+  remaps: FieldRemap[];
+  revision: number;
+  // Seconds since the epoch of the last update, null if never updated
+  updated: number | null;
+}
+
 type NodeID = string | number;
 
 export class ComfyRebase implements Differ {
@@ -53,6 +67,10 @@ export class ComfyRebase implements Differ {
 
   private readonly WORKING_DIFF_KEY = 'comfyui-searchreplace-working-diff';
   private readonly WORKING_REMAPS_KEY = 'comfyui-searchreplace-working-remaps';
+  private readonly WORKING_UPDATED_KEY = 'comfyui-searchreplace-working-updated';
+  private readonly WORKING_SYNC_DELAY_MS = 250;
+  private pendingWorking: WorkingUpdate = {};
+  private workingTimer: ReturnType<typeof setTimeout> | null = null;
 
   constructor() {
     this.dropModal = new DropModal(this);
@@ -75,8 +93,7 @@ export class ComfyRebase implements Differ {
     };
 
 
-    this.restoreWorkingDiff();
-    this.restoreWorkingRemaps();
+    void this.restoreWorkingState();
   }
 
   copyNodeValues() {
@@ -400,16 +417,157 @@ export class ComfyRebase implements Differ {
   }
 
   private saveWorkingDiff() {
+    this.queueWorkingUpdate({ diff: Object.fromEntries(this.diffData) });
+  }
+
+  private saveWorkingRemaps() {
+    this.queueWorkingUpdate({ remaps: this.remaps });
+  }
+
+  // Batch rapid edits into one request; the server also debounces its disk writes
+  private queueWorkingUpdate(update: WorkingUpdate) {
+    Object.assign(this.pendingWorking, update);
+    if (this.workingTimer !== null) return;
+
+    this.workingTimer = setTimeout(() => {
+      this.workingTimer = null;
+      const pending = this.pendingWorking;
+      this.pendingWorking = {};
+      void this.sendWorkingUpdate(pending);
+    }, this.WORKING_SYNC_DELAY_MS);
+  }
+
+  private async sendWorkingUpdate(update: WorkingUpdate): Promise<boolean> {
     try {
-      if (this.diffData.size > 0) {
-        const diffObject = Object.fromEntries(this.diffData);
-        localStorage.setItem(this.WORKING_DIFF_KEY, JSON.stringify(diffObject));
-      } else {
-        // Clear localStorage if no diff data
-        localStorage.removeItem(this.WORKING_DIFF_KEY);
+      const response = await fetch('/rebase/working', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify(update),
+      });
+      if (!response.ok) {
+        throw new Error(`HTTP ${response.status}`);
+      }
+      // The server copy is now the newest; drop any local fallback for it
+      if (update.diff) localStorage.removeItem(this.WORKING_DIFF_KEY);
+      if (update.remaps) localStorage.removeItem(this.WORKING_REMAPS_KEY);
+      if (!this.hasLocalWorkingState()) {
+        localStorage.removeItem(this.WORKING_UPDATED_KEY);
+      }
+      return true;
+    } catch (error) {
+      console.warn('Failed to sync working state, keeping a local copy:', error);
+      this.saveWorkingLocally(update);
+      return false;
+    }
+  }
+
+  private async restoreWorkingState() {
+    let state: WorkingState | null = null;
+    try {
+      const response = await fetch('/rebase/working');
+      if (response.ok) {
+        state = await response.json();
       }
     } catch (error) {
-      console.warn('Failed to save working diff to localStorage:', error);
+      console.warn('Failed to fetch working state from server:', error);
+    }
+
+    const serverHasState =
+      state !== null &&
+      (Object.keys(state.diff).length > 0 || state.remaps.length > 0);
+
+    // The local copy is only written when a sync failed, so it can be newer
+    // than the server's. Copies from earlier versions have no timestamp and
+    // are only used when the server has nothing.
+    const localUpdated = Number(localStorage.getItem(this.WORKING_UPDATED_KEY));
+    const localIsNewer =
+      this.hasLocalWorkingState() &&
+      (!serverHasState ||
+        (localUpdated > 0 && localUpdated > (state!.updated ?? 0)));
+
+    if (localIsNewer) {
+      if (serverHasState) {
+        // Start from the server copy for whatever the local one lacks
+        this.diffData = new Map(Object.entries(state!.diff));
+        this.remaps = state!.remaps;
+      }
+      this.restoreWorkingDiff();
+      this.restoreWorkingRemaps();
+      if (state !== null) {
+        await this.sendWorkingUpdate({
+          diff: Object.fromEntries(this.diffData),
+          remaps: this.remaps,
+        });
+      }
+      return;
+    }
+
+    if (!serverHasState) {
+      return;
+    }
+
+    this.diffData = new Map(Object.entries(state!.diff));
+    this.remaps = state!.remaps;
+
+    if (this.diffData.size > 0) {
+      app.extensionManager.toast.add({
+        severity: 'info',
+        summary: 'Working diff restored',
+        detail: 'Previous diff restored from the server',
+        life: 3000,
+      });
+    }
+    if (this.remaps.length > 0) {
+      app.extensionManager.toast.add({
+        severity: 'info',
+        summary: 'Working remaps restored',
+        detail: `${this.remaps.length} field remap(s) restored from the server`,
+        life: 3000,
+      });
+    }
+  }
+
+  private hasLocalWorkingState(): boolean {
+    return (
+      localStorage.getItem(this.WORKING_DIFF_KEY) !== null ||
+      localStorage.getItem(this.WORKING_REMAPS_KEY) !== null
+    );
+  }
+
+  private saveWorkingLocally(update: WorkingUpdate) {
+    try {
+      // Compared with the server's 'updated' when restoring
+      localStorage.setItem(this.WORKING_UPDATED_KEY, String(Date.now() / 1000));
+    } catch (error) {
+      console.warn('Failed to save working state time to localStorage:', error);
+    }
+    if (update.diff) {
+      try {
+        if (Object.keys(update.diff).length > 0) {
+          localStorage.setItem(this.WORKING_DIFF_KEY, JSON.stringify(update.diff));
+        } else {
+          // Clear localStorage if no diff data
+          localStorage.removeItem(this.WORKING_DIFF_KEY);
+        }
+      } catch (error) {
+        console.warn('Failed to save working diff to localStorage:', error);
+      }
+    }
+    if (update.remaps) {
+      try {
+        if (update.remaps.length > 0) {
+          const remapsData: RemapStorage = { remaps: update.remaps };
+          localStorage.setItem(
+            this.WORKING_REMAPS_KEY,
+            JSON.stringify(remapsData)
+          );
+        } else {
+          // Clear localStorage if no remap data
+          localStorage.removeItem(this.WORKING_REMAPS_KEY);
+        }
+      } catch (error) {
+        console.warn('Failed to save working remaps to localStorage:', error);
+      }
     }
   }
 
@@ -441,23 +599,6 @@ export class ComfyRebase implements Differ {
     }
   }
 
-  private saveWorkingRemaps() {
-    try {
-      if (this.remaps.length > 0) {
-        const remapsData: RemapStorage = { remaps: this.remaps };
-        localStorage.setItem(
-          this.WORKING_REMAPS_KEY,
-          JSON.stringify(remapsData)
-        );
-      } else {
-        // Clear localStorage if no remap data
-        localStorage.removeItem(this.WORKING_REMAPS_KEY);
-      }
-    } catch (error) {
-      console.warn('Failed to save working remaps to localStorage:', error);
-    }
-  }
-
   private restoreWorkingRemaps() {
     try {
       const savedRemaps = localStorage.getItem(this.WORKING_REMAPS_KEY);
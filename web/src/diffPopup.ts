@@ -24,6 +24,7 @@ interface SavedDiff {
   filename: string;
   name: string;
   created: number;
+  versions?: number;
 }
 
 export class DiffPopup {
@@ -200,7 +201,8 @@ export class DiffPopup {
         data.diffs.forEach((diff: SavedDiff) => {
           const option = document.createElement('option');
           option.value = diff.filename;
-          option.textContent = `${diff.name} (${new Date(diff.created * 1000).toLocaleDateString()})`;
+          const versions = diff.versions && diff.versions > 1 ? `, v${diff.versions}` : '';
+          option.textContent = `${diff.name} (${new Date(diff.created * 1000).toLocaleDateString()}${versions})`;
           select.appendChild(option);
         });
       }
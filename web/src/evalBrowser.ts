@@ -4,6 +4,8 @@ import { shuffleArray } from './lib';
 interface ImageItem {
   filename: string;
   url: string;
+  thumb_url?: string;
+  workflow_url?: string;
   has_workflow?: boolean;
 }
 
@@ -326,7 +328,8 @@ export class EvalBrowser {
 
         // Create thumbnail
         const thumbnail = document.createElement('img');
-        thumbnail.src = img.url;
+        thumbnail.src = img.thumb_url ?? img.url;
+        thumbnail.loading = 'lazy';
         thumbnail.alt = img.filename;
         thumbnail.style.width = '100%';
         thumbnail.style.height = '150px';
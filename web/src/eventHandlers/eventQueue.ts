@@ -1,4 +1,4 @@
-export type EventHandler<TEvent> = (event: TEvent) => void | Promise<void>;
+export type EventHandler<TEvent> = (event: TEvent) => void | Promise<unknown>;
 
 type QueuedTask = () => Promise<void>;
 
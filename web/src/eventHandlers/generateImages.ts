@@ -15,7 +15,7 @@ export const handleGenerateImages = (event: GenerateImagesEvent) => {
       console.warn('Invalid count provided in generateImages event: ', count);
       return;
     }
-    return queuePrompts(count);
+    return queuePrompts(count).then((prompt_ids) => ({ prompt_ids }));
   } else {
     console.warn('Invalid count provided in generateImages event');
   }
@@ -6,13 +6,49 @@ import {
 import { EventQueue, EventHandler } from '@/eventHandlers/eventQueue';
 import { ComfyAppLike } from '@/lib';
 
+type AckRequest = {
+  detail?: { rebase_id?: string; rebase_ack?: boolean } | null;
+};
+
+// Tell the server a forwarded event has been handled, for /rebase/forward?wait=true
+export const sendAck = async (id: string, ok: boolean, error?: string, result?: unknown) => {
+  try {
+    await fetch('/rebase/forward/ack', {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ id, ok, error, result }),
+    });
+  } catch (e) {
+    console.warn('Failed to acknowledge event', id, e);
+  }
+};
+
+export const acknowledged =
+  <TEvent>(handler: EventHandler<TEvent>): EventHandler<TEvent> =>
+  async (event: TEvent) => {
+    const detail = (event as AckRequest)?.detail;
+    const id = detail?.rebase_ack ? detail.rebase_id : undefined;
+    if (!id) {
+      return handler(event);
+    }
+    let result: unknown;
+    try {
+      result = await handler(event);
+    } catch (error) {
+      void sendAck(id, false, String(error));
+      throw error;
+    }
+    // Whatever the handler returns (e.g. the queued prompt ids) goes back to the caller
+    void sendAck(id, true, undefined, result ?? undefined);
+  };
+
 export function installHandlers(app: ComfyAppLike) {
   const eventQueue = new EventQueue();
 
   const enqueue =
     <TEvent>(handler: EventHandler<TEvent>) =>
     (event: TEvent) => {
-      void eventQueue.enqueue(handler, event);
+      void eventQueue.enqueue(acknowledged(handler), event);
     };
 
   // Install event listeners for websocket automation
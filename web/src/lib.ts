@@ -40,15 +40,40 @@ export const setAppInstance = (app: ComfyAppLike | undefined) => {
 
 const wait = (ms: number) => new Promise((resolve) => setTimeout(resolve, ms));
 
-export const queuePrompts = async (count: number) => {
+type PromptApiLike = {
+  queuePrompt: (...args: any[]) => Promise<{ prompt_id?: string } | undefined>;
+};
+
+// app.queuePrompt only reports success, so the prompt ids are read off the
+// api.queuePrompt calls it makes while it runs
+export const queuePrompts = async (count: number): Promise<string[]> => {
   const app = resolveApp();
-  await wait(1000);
-  for (let i = 0; i < count; i++) {
-    await app.queuePrompt(0, 1);
-    if (i < count - 1) {
-      await wait(300);
+  const api = (app as unknown as { api?: PromptApiLike }).api;
+  const promptIds: string[] = [];
+  const original = api?.queuePrompt;
+  if (api && original) {
+    api.queuePrompt = async (...args: any[]) => {
+      const res = await original.apply(api, args);
+      if (res?.prompt_id) {
+        promptIds.push(res.prompt_id);
+      }
+      return res;
+    };
+  }
+  try {
+    await wait(1000);
+    for (let i = 0; i < count; i++) {
+      await app.queuePrompt(0, 1);
+      if (i < count - 1) {
+        await wait(300);
+      }
+    }
+  } finally {
+    if (api && original) {
+      api.queuePrompt = original;
     }
   }
+  return promptIds;
 };
 
 export const replaceNodeValue = (
@@ -91,10 +116,25 @@ export const enableNode = (node_id: number) => {
 export interface ImageItem {
   filename: string;
   url: string;
+  thumb_url?: string;
+  workflow_url?: string;
   has_workflow?: boolean;
 }
 
 export async function loadWorkflow(img: ImageItem): Promise<void> {
+  // Prefer the server-side extraction, which sends only the workflow JSON
+  if (img.workflow_url && img.has_workflow !== false) {
+    const res = await fetch(img.workflow_url);
+    if (res.ok) {
+      const { workflow } = await res.json();
+      if (workflow) {
+        await app.loadGraphData(workflow, true, true, img.filename);
+        console.debug('Workflow loaded from', img.filename);
+        return;
+      }
+    }
+  }
+
   const infoUrl = img.url;
   const res = await fetch(infoUrl);
 